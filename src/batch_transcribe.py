@@ -0,0 +1,172 @@
+# batch_transcribe.py
+# Offline batch transcription: runs the configured Whisper engine over directories or manifests of audio files
+#
+# Usage:
+#   python src/batch_transcribe.py <dir|manifest> [<dir|manifest> ...] -o transcripts.jsonl [-w 2] [--model tiny.en]
+#
+# A manifest is a .txt file with one audio path per line, or a .jsonl file whose lines hold a "path" (or "audio") key.
+# Results are appended to the output JSONL as soon as each file finishes; files already present in the output
+# are skipped on restart unless --no-resume is given.
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import log
+
+SCRIPT_NAME = "batch_transcribe.py"
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a', '.ogg', '.webm')
+MANIFEST_EXTENSIONS = ('.txt', '.jsonl')
+STATS_EVERY = 25  # Log throughput every N files
+
+_worker_model_name = None
+
+
+def read_manifest(manifest_path):
+    """Return the audio paths listed in a .txt or .jsonl manifest, resolved relative to the manifest"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if manifest_path.endswith('.jsonl'):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    log(f"Skipping malformed manifest line: {line[:80]}", "ERROR", script=SCRIPT_NAME)
+                    continue
+                line = entry.get('path') or entry.get('audio')
+                if not line:
+                    continue
+            paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+
+def collect_audio_files(inputs, recursive=True):
+    """Expand directories and manifests into a sorted, de-duplicated list of absolute audio paths"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(AUDIO_EXTENSIONS))
+                if not recursive:
+                    break
+        elif item.lower().endswith(MANIFEST_EXTENSIONS):
+            files.extend(read_manifest(item))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            log(f"Input not found: {item}", "ERROR", script=SCRIPT_NAME)
+    return sorted(set(os.path.abspath(f) for f in files))
+
+
+def load_completed(output_path):
+    """Return the set of paths already transcribed successfully in an existing output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial last line from an interrupted run
+            if entry.get('ok'):
+                done.add(entry.get('path'))
+    return done
+
+
+def _worker_init(model_name):
+    global _worker_model_name
+    from transcribe import load_whisper_model
+    _worker_model_name = model_name
+    load_whisper_model(model_name)
+
+
+def _transcribe_one(path):
+    """Transcribe a single file inside a worker process and return its JSONL record"""
+    start = time.perf_counter()
+    record = {"path": path, "ok": False}
+    try:
+        import whisper
+        from transcribe import decode_local, get_configured_model_name
+        audio = whisper.load_audio(path)
+        record["audio_s"] = round(len(audio) / whisper.audio.SAMPLE_RATE, 3)
+        record["text"] = decode_local(audio, _worker_model_name).strip()  # Raises on a failed decode, so it is retried
+        record["model"] = _worker_model_name or get_configured_model_name()
+        record["ok"] = True
+    except Exception as e:
+        record["error"] = f"{e}\n{traceback.format_exc()}"
+    record["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def log_throughput(done, total, audio_s, started):
+    wall = max(time.perf_counter() - started, 1e-6)
+    rtf = audio_s / wall
+    log(f"{done}/{total} files | {done / wall:.2f} files/s | {audio_s:.1f}s audio in {wall:.1f}s ({rtf:.2f}x realtime)", "TRANSCRIPTION")
+
+
+def run_batch(inputs, output_path, workers=1, model_name=None, resume=True, recursive=True):
+    """Transcribe every audio file found in inputs and stream the results to output_path"""
+    files = collect_audio_files(inputs, recursive=recursive)
+    if resume:
+        completed = load_completed(output_path)
+        skipped = len(files)
+        files = [f for f in files if f not in completed]
+        skipped -= len(files)
+        if skipped:
+            log(f"Resuming: {skipped} files already transcribed in {output_path}", "SYSTEM")
+    if not files:
+        log("Nothing to transcribe.", "SYSTEM")
+        return
+    workers = max(1, min(workers, len(files)))
+    log(f"Transcribing {len(files)} files with {workers} worker(s) (model: {model_name or 'from settings'})", "SYSTEM")
+    started = time.perf_counter()
+    done = failed = 0
+    audio_total = 0.0
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(model_name,)) as pool:
+        futures = [pool.submit(_transcribe_one, f) for f in files]
+        for future in as_completed(futures):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            done += 1
+            if record["ok"]:
+                audio_total += record.get("audio_s", 0.0)
+            else:
+                failed += 1
+                log(f"Failed to transcribe {record['path']}: {record.get('error', '').splitlines()[0]}", "ERROR", script=SCRIPT_NAME)
+            if done % STATS_EVERY == 0:
+                log_throughput(done, len(files), audio_total, started)
+    log_throughput(done, len(files), audio_total, started)
+    log(f"Batch complete: {done - failed} transcribed, {failed} failed. Results in {output_path}", "SYSTEM")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-transcribe directories or manifests of audio files to JSONL.")
+    parser.add_argument('inputs', nargs='+', help="Audio directories, manifest files (.txt/.jsonl) or single audio files")
+    parser.add_argument('-o', '--output', default='transcripts.jsonl', help="Output JSONL path (appended to)")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of worker processes, each loads its own model")
+    parser.add_argument('--model', default=None, help="Whisper model name (defaults to the transcription-precision setting)")
+    parser.add_argument('--no-resume', action='store_true', help="Re-transcribe files already present in the output")
+    parser.add_argument('--no-recursive', action='store_true', help="Do not descend into subdirectories")
+    args = parser.parse_args(argv)
+    try:
+        run_batch(args.inputs, args.output, workers=args.workers, model_name=args.model,
+                  resume=not args.no_resume, recursive=not args.no_recursive)
+    except KeyboardInterrupt:
+        log("Batch interrupted. Re-run the same command to resume.", "ERROR", script=SCRIPT_NAME)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+# command_selector.py
+# Relevance-based command schema subsetting
+# Scores every command in commands.json against the transcript with BM25 over its name, description,
+# argument names and a few spoken synonyms, and keeps only the top-k schemas plus the always-on ones.
+# The index is built once per commands.json change.
+#
+# Benchmark on the logged turns (token counts, schema recall and selection time; with --latency N, also the
+# end-to-end latency of N turns sent to the chat provider with the full and with the subset prompt):
+#   python src/command_selector.py [--top-k 3] [--log log.jsonl] [--latency 20 --model gpt-4.1]
+
+import re
+import math
+import json
+import time
+import argparse
+import threading
+import statistics
+from collections import Counter
+from utils import log, load_asset, get_asset_version, get_settings
+
+DEFAULT_TOP_K = 3
+ALWAYS_ON = ("speak", "exit")
+# Modules whose output only reaches the model through a follow-up reprompt
+NEEDS_REPROMPT = ("agenda", "weather", "news", "screenshot", "clipboard")
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Spoken words that do not appear in the schema text
+SYNONYMS = {
+    "spotify": "music song songs play playing pause resume skip next previous track playlist album artist volume louder quieter phone",
+    "agenda": "calendar schedule event events meeting meetings appointment appointments today tomorrow week busy free plan",
+    "weather": "weather temperature rain raining snow sunny forecast cold hot outside umbrella degrees wind",
+    "news": "news headlines articles article happening world politics finance stocks",
+    "screenshot": "screen screenshot monitor display wallpaper looking see",
+    "clipboard": "clipboard copy copied paste pasted",
+    "browse": "open website site youtube google browser link page",
+    "browsing": "website page click search fill form",
+    "settings": "setting settings voice speed slower faster name instructions silence memory precision alloy echo fable onyx nova shimmer",
+    "todo": "todo remember note feature idea implement list",
+    "reprompt": "file files read analyze look reprompt",
+    "exit": "bye goodbye thanks sleep done stop",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "and", "or", "for", "in", "on", "at", "is", "it", "my", "me", "you", "your",
+    "can", "could", "please", "what", "whats", "what's", "i", "do", "does", "be", "this", "that", "with", "just",
+    "string", "int", "bool", "boolean", "optional", "required", "e", "g", "use", "using", "from", "by", "as",
+}
+
+_index_lock = threading.Lock()
+_index_version = None
+_index = None
+
+
+def tokenize(text):
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    tokens = []
+    for word in words:
+        word = word.strip("'")
+        if not word or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _command_document(command):
+    args = command.get('args') or {}
+    parts = [command.get('name', ''), command.get('description', ''), " ".join(args.keys()),
+             " ".join(str(v) for v in args.values()), SYNONYMS.get(command.get('name'), '')]
+    return tokenize(" ".join(parts))
+
+
+def _get_index():
+    """Return the BM25 index over commands.json, rebuilt only when the file changes"""
+    global _index_version, _index
+    version = get_asset_version('commands.json')
+    with _index_lock:
+        if version == _index_version:
+            return _index
+    commands = load_asset('commands.json').get('commands', [])
+    docs = {cmd['name']: Counter(_command_document(cmd)) for cmd in commands}
+    doc_freq = Counter()
+    for terms in docs.values():
+        doc_freq.update(terms.keys())
+    n = len(docs)
+    index = {
+        "commands": commands,
+        "docs": docs,
+        "lengths": {name: sum(terms.values()) for name, terms in docs.items()},
+        "avg_length": sum(sum(t.values()) for t in docs.values()) / max(1, n),
+        "idf": {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()},
+    }
+    with _index_lock:
+        _index_version, _index = version, index
+    return index
+
+
+def score_commands(text):
+    """Return {command name: BM25 score} for a transcript"""
+    index = _get_index()
+    query = tokenize(text)
+    scores = {}
+    for name, terms in index["docs"].items():
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * index["lengths"][name] / index["avg_length"])
+        score = 0.0
+        for term in query:
+            tf = terms.get(term, 0)
+            if tf:
+                score += index["idf"][term] * tf * (BM25_K1 + 1) / (tf + length_norm)
+        scores[name] = score
+    return scores
+
+
+def get_top_k():
+    settings = get_settings() or {}
+    try:
+        return int(settings.get('command-subset-top-k', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        return DEFAULT_TOP_K
+
+
+def select_command_names(text, top_k=None):
+    """Return the names of the commands to send for this transcript, or None when subsetting is disabled"""
+    top_k = get_top_k() if top_k is None else top_k
+    if top_k <= 0:
+        return None
+    scores = score_commands(text)
+    ranked = [name for name, score in sorted(scores.items(), key=lambda kv: -kv[1]) if score > 0]
+    selected = set(ALWAYS_ON) | set(ranked[:top_k])
+    if selected & set(NEEDS_REPROMPT):
+        selected.add("reprompt")
+    return selected
+
+
+def select_commands(text, top_k=None):
+    """Return the command schemas (in commands.json order) relevant to this transcript"""
+    commands = _get_index()["commands"]
+    names = select_command_names(text, top_k)
+    if names is None:
+        return commands
+    return [cmd for cmd in commands if cmd['name'] in names]
+
+
+def _expected_modules(assistant_content):
+    try:
+        response = json.loads(assistant_content)
+        return {c.get('module') for c in response if isinstance(c, dict)}
+    except Exception:
+        return set()
+
+
+def benchmark(log_path, top_k):
+    """Measure prompt tokens and schema recall of the selector on logged (user, assistant) turns"""
+    from tokens import count_tokens
+    all_commands = _get_index()["commands"]
+    known = {cmd['name'] for cmd in all_commands}
+    full_tokens = count_tokens(json.dumps(all_commands, ensure_ascii=False))
+    turns = subset_total = hits = checked = 0
+    select_seconds = 0.0
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                messages = json.loads(line)["messages"]
+            except Exception:
+                continue
+            user_text = messages[0]["content"]
+            expected = _expected_modules(messages[1]["content"]) & known
+            start = time.perf_counter()
+            subset = select_commands(user_text, top_k)
+            select_seconds += time.perf_counter() - start
+            subset_total += count_tokens(json.dumps(subset, ensure_ascii=False))
+            turns += 1
+            if expected:
+                checked += 1
+                hits += expected <= {cmd['name'] for cmd in subset}
+    if not turns:
+        print("No turns found.")
+        return
+    mean_subset = subset_total / turns
+    print(f"Turns: {turns} (top-k {top_k})")
+    print(f"Command schema tokens: full {full_tokens:,} -> subset {mean_subset:,.0f} on average "
+          f"({(1 - mean_subset / full_tokens) * 100:.0f}% fewer input tokens per turn)")
+    print(f"Turns whose used modules were all selected: {hits}/{checked} ({hits / max(1, checked) * 100:.0f}%)")
+    print(f"Selection latency: {select_seconds / turns * 1000:.2f} ms per turn")
+
+
+def _logged_requests(log_path):
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)["messages"][0]["content"]
+            except Exception:
+                continue
+
+
+def _stream_timings(prompt, model):
+    """Return (seconds to the first content token, seconds to the last chunk) of a streamed completion,
+    or None if the request failed"""
+    from http_client import stream_chat_completion
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    for chunk in stream_chat_completion({"model": model, "messages": [{"role": "user", "content": prompt}]}):
+        chunks += 1
+        delta = ((chunk.get("choices") or [{}])[0]).get("delta") or {}
+        if first is None and delta.get("content"):
+            first = time.perf_counter() - start
+    if not chunks:
+        return None
+    total = time.perf_counter() - start
+    return (first if first is not None else total), total
+
+
+def benchmark_latency(log_path, top_k, samples, model):
+    """Send logged requests to the chat provider with the full prompt and with the command subset (alternating
+    which goes first) and compare median time to first token and to the end of the response"""
+    from prompt_builder import get_static_prefix, build_dynamic_sections, render_sections
+    from schema_compiler import get_compact_commands, get_schema_format
+    from tokens import count_tokens
+    full_prefix = get_static_prefix(include_commands=True)
+    subset_prefix = get_static_prefix(include_commands=False)
+    timings = {"full": [], "subset": []}
+    tokens = {"full": [], "subset": []}
+    for i, user_text in enumerate(_logged_requests(log_path)):
+        if i >= samples:
+            break
+        commands = select_commands(user_text, top_k)
+        if get_schema_format() == "compact":
+            commands = get_compact_commands(commands)
+        sections = build_dynamic_sections(user_text)
+        prompts = {"full": render_sections(sections, full_prefix),
+                   "subset": render_sections({"commands": commands, **sections}, subset_prefix)}
+        for variant in (("full", "subset") if i % 2 == 0 else ("subset", "full")):
+            result = _stream_timings(prompts[variant], model)
+            if result is not None:
+                timings[variant].append(result)
+                tokens[variant].append(count_tokens(prompts[variant]))
+    if not timings["full"] or not timings["subset"]:
+        print("No successful requests: is the chat provider reachable?")
+        return
+    print(f"End-to-end latency on {model} over {len(timings['full'])}/{len(timings['subset'])} turns (full/subset):")
+    for variant in ("full", "subset"):
+        first = statistics.median(t[0] for t in timings[variant])
+        total = statistics.median(t[1] for t in timings[variant])
+        print(f"  {variant:<6} {statistics.mean(tokens[variant]):>8,.0f} input tokens | "
+              f"first token p50 {first * 1000:7.0f} ms | full response p50 {total * 1000:7.0f} ms")
+    saved = (statistics.median(t[0] for t in timings["full"]) - statistics.median(t[0] for t in timings["subset"]))
+    print(f"First-token latency saved by the subset: {round(saved * 1000)} ms (p50)")
+
+
+if __name__ == "__main__":
+    import os
+    parser = argparse.ArgumentParser(description="Benchmark relevance-based command subsetting on logged turns.")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--log', default=os.path.join(os.path.dirname(__file__), '../log.jsonl'))
+    parser.add_argument('--latency', type=int, default=0, metavar='N',
+                        help="Also send N logged requests to the chat provider, full and subset prompt")
+    parser.add_argument('--model', default="gpt-4.1")
+    args = parser.parse_args()
+    benchmark(args.log, args.top_k)
+    if args.latency > 0:
+        benchmark_latency(args.log, args.top_k, args.latency, args.model)
@@ -1,9 +1,12 @@
 import importlib
 import json
 import os
+import re
 import sys
 import asyncio
-from utils import log, log_command_execution
+import threading
+from utils import log, log_command_execution, record_metric
+from schema_compiler import RESPONSE_KEY
 
 def load_commands():
     with open(os.path.join(os.path.dirname(__file__), '../assets/commands.json'), 'r', encoding='utf-8') as f:
@@ -18,41 +21,19 @@ if MODULES_PATH not in sys.path:
     sys.path.insert(0, MODULES_PATH)
 
 def execute_commands_from_json_response(response_text):
-    """Parse and execute commands from JSON response format"""
-    try:
-        # Try to parse the response as JSON
-        commands_list = json.loads(response_text.strip())
-        
-        if not isinstance(commands_list, list):
-            log("Response is not a JSON array. Falling back to legacy parsing", "ERROR", script="commands.py")
-            return execute_commands_from_response_block(response_text)
-        
-        for command_obj in commands_list:
-            if not isinstance(command_obj, dict):
-                log(f"Invalid command object: {command_obj}", "ERROR", script="commands.py")
-                continue
-                
-            module_name = command_obj.get('module')
-            args = command_obj.get('args', {})
-            
-            if not module_name:
-                log(f"Missing module name in command: {command_obj}", "ERROR", script="commands.py")
-                continue
-                
-            if module_name not in COMMANDS:
-                log(f"Unknown module: {module_name}", "ERROR", script="commands.py")
-                continue
-            
-            try:
-                execute_single_command(module_name, args)
-            except Exception as e:
-                log(f"Error executing command {module_name}: {e}", "ERROR", script="commands.py")
-                
-    except json.JSONDecodeError as e:
-        log(f"Failed to parse JSON response, falling back to legacy format: {e}", "ERROR", script="commands.py")
-        return execute_commands_from_response_block(response_text)
-    except Exception as e:
-        log(f"Error processing JSON commands: {e}", "ERROR", script="commands.py")
+    """Parse (repairing it if needed) and execute a JSON command response"""
+    commands_list, problem, _ = parse_command_response(response_text)
+    if not commands_list:
+        log(f"No executable commands in response ({problem}): {str(response_text)[:200]}", "ERROR", script="commands.py")
+        return
+    for command_obj in commands_list:
+        command = _validated_command(command_obj)
+        if not command:
+            continue
+        try:
+            execute_single_command(*command)
+        except Exception as e:
+            log(f"Error executing command {command[0]}: {e}", "ERROR", script="commands.py")
 
 def execute_single_command(module_name, args):
     """Execute a single command with given module name and arguments"""
@@ -78,39 +59,18 @@ def execute_single_command(module_name, args):
 
 async def execute_commands_from_json_response_async(response_text):
     """Async version of JSON command execution"""
-    try:
-        commands_list = json.loads(response_text.strip())
-        
-        if not isinstance(commands_list, list):
-            log("Response is not a JSON array. Falling back to legacy parsing", "ERROR", script="commands.py")
-            return await execute_commands_from_response_block_async(response_text)
-        
-        for command_obj in commands_list:
-            if not isinstance(command_obj, dict):
-                log(f"Invalid command object: {command_obj}", "ERROR", script="commands.py")
-                continue
-                
-            module_name = command_obj.get('module')
-            args = command_obj.get('args', {})
-            
-            if not module_name:
-                log(f"Missing module name in command: {command_obj}", "ERROR", script="commands.py")
-                continue
-                
-            if module_name not in COMMANDS:
-                log(f"Unknown module: {module_name}", "ERROR", script="commands.py")
-                continue
-            
-            try:
-                await execute_single_command_async(module_name, args)
-            except Exception as e:
-                log(f"Error executing async command {module_name}: {e}", "ERROR", script="commands.py")
-                
-    except json.JSONDecodeError as e:
-        log(f"Failed to parse JSON response, falling back to legacy format: {e}", "ERROR", script="commands.py")
-        return await execute_commands_from_response_block_async(response_text)
-    except Exception as e:
-        log(f"Error processing JSON commands: {e}", "ERROR", script="commands.py")
+    commands_list, problem, _ = parse_command_response(response_text)
+    if not commands_list:
+        log(f"No executable commands in response ({problem}): {str(response_text)[:200]}", "ERROR", script="commands.py")
+        return
+    for command_obj in commands_list:
+        command = _validated_command(command_obj)
+        if not command:
+            continue
+        try:
+            await execute_single_command_async(*command)
+        except Exception as e:
+            log(f"Error executing async command {command[0]}: {e}", "ERROR", script="commands.py")
 
 async def execute_single_command_async(module_name, args):
     """Execute a single command asynchronously"""
@@ -122,7 +82,8 @@ async def execute_single_command_async(module_name, args):
         log_command_execution(module_name, args)
         
         if module_key not in MODULE_CACHE:
-            MODULE_CACHE[module_key] = importlib.import_module(module_key)
+            # First import can be slow (e.g. API clients created at import time), keep it off the event loop
+            MODULE_CACHE[module_key] = await asyncio.to_thread(importlib.import_module, module_key)
         
         module = MODULE_CACHE[module_key]
         
@@ -137,87 +98,198 @@ async def execute_single_command_async(module_name, args):
     except Exception as e:
         log(f"Error executing async single command {module_name}: {e}", "ERROR")
 
-# Legacy functions for backward compatibility
-def execute_commands_from_response(line):
-    print(f"Processing command line: {line}")
-    line = line.strip()
-    if not line or not line.startswith('/'):
-        return
-    try:
-        cmd_name, params = parse_command(line)
-        if cmd_name not in COMMANDS:
-            log(f"Unknown command received: {cmd_name}", "ERROR")
-            return
-        execute_single_command(cmd_name, params)
-    except Exception as e:
-        log(f"Error executing command from line '{line}': {e}", "ERROR")
+class JSONArrayStreamParser:
+    """Incrementally extracts the objects of a JSON array as its text streams in.
+    feed() returns every object whose closing brace arrived in that chunk, so each command
+    can be dispatched while the rest of the array is still being generated.
+    The array may be bare or wrapped in the structured-output object {"commands": [...]}."""
 
-def execute_commands_from_response_block(response_block):
-    """Splits a multi-line response and processes each line as a command or thought."""
-    for line in response_block.split('\n'):
-        execute_commands_from_response(line)
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = None
+        self.array_started = False
+        self.array_closed = False
+        self.not_an_array = False
 
-async def execute_commands_from_response_block_async(response_block):
-    for line in response_block.split('\n'):
-        await execute_command_line_async(line)
+    def feed(self, chunk):
+        self.text += chunk
+        objects = []
+        while self.pos < len(self.text) and not (self.array_closed or self.not_an_array):
+            char = self.text[self.pos]
+            if not self.array_started:
+                # Skip anything before the array (whitespace, code fences); an object first means no array
+                if char == '[':
+                    self.array_started = True
+                    self.depth = 1
+                elif char == '{':
+                    array_pos = self._wrapped_array_start()
+                    if array_pos is None:
+                        break  # Not enough text yet to tell
+                    if array_pos < 0:
+                        self.not_an_array = True
+                    else:
+                        self.pos = array_pos
+                        continue
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '[{':
+                if char == '{' and self.depth == 1:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif char in ']}':
+                self.depth -= 1
+                if char == '}' and self.depth == 1 and self.object_start is not None:
+                    raw = self.text[self.object_start:self.pos + 1]
+                    self.object_start = None
+                    try:
+                        objects.append(json.loads(raw))
+                    except json.JSONDecodeError as e:
+                        log(f"Skipping malformed streamed command {raw[:120]}: {e}", "ERROR", script="commands.py")
+                elif self.depth == 0:
+                    self.array_closed = True
+            self.pos += 1
+        return objects
 
-async def execute_command_line_async(line):
-    line = line.strip()
-    if not line or not line.startswith('/'):
-        return
-    try:
-        cmd_name, params = parse_command(line)
-        if cmd_name not in COMMANDS:
-            log(f"Unknown command: {cmd_name}", "ERROR")
-            return
-        await execute_single_command_async(cmd_name, params)
-    except Exception as e:
-        log(f"Error executing command from line '{line}': {e}", "ERROR")
+    def _wrapped_array_start(self):
+        """Position of the '[' when the object at pos is the {"commands": [ wrapper, -1 when it is some other
+        object, None while the text so far could still be either"""
+        remaining = self.text[self.pos:]
+        compact = re.sub(r"\s+", "", remaining)
+        opening = '{"' + RESPONSE_KEY + '":['
+        if compact.startswith(opening):
+            return self.pos + remaining.index('[')
+        return None if opening.startswith(compact) else -1
 
-async def execute_commands_from_response_block_sync(response_block):
-    for line in response_block.split('\n'):
-        await execute_command_line_sync(line)
 
-async def execute_command_line_sync(line):
-    line = line.strip()
-    if not line or not line.startswith('/'):
-        return
+def _command_problem(command_obj):
+    """Return why a command object cannot be executed, or None"""
+    if not isinstance(command_obj, dict):
+        return f"malformed command {str(command_obj)[:80]}"
+    module_name = command_obj.get('module')
+    if not module_name:
+        return f"missing module name in {str(command_obj)[:80]}"
+    if module_name not in COMMANDS:
+        return f"unknown module '{module_name}'"
+    if not isinstance(command_obj.get('args') or {}, dict):
+        return f"args of '{module_name}' is not an object"
+    return None
+
+
+def _validated_command(command_obj):
+    """Return (module_name, args) for a well-formed command object, or None after logging why not.
+    Null args (unused optional args of a structured-output response) are dropped so module defaults apply."""
+    problem = _command_problem(command_obj)
+    if problem:
+        log(f"Skipping command: {problem}", "ERROR", script="commands.py")
+        return None
+    args = {key: value for key, value in (command_obj.get('args') or {}).items() if value is not None}
+    return command_obj['module'], args
+
+
+def _load_command_list(text):
+    """Return the command list of a bare JSON array or of the structured-output object; raise ValueError otherwise"""
+    value, _ = json.JSONDecoder().raw_decode(text)  # Ignores anything after the JSON value
+    if isinstance(value, dict) and isinstance(value.get(RESPONSE_KEY), list):
+        return value[RESPONSE_KEY]
+    if isinstance(value, dict) and value.get('module'):
+        return [value]  # A single command object
+    if not isinstance(value, list):
+        raise ValueError("not a JSON array of commands")
+    return value
+
+
+def repair_command_response(text):
+    """Best-effort local repair of a response that is not clean JSON: strips code fences and surrounding prose,
+    drops trailing commas and, for a truncated response, keeps the commands that were complete.
+    Returns the command list or None."""
+    text = re.sub(r"```(?:json)?", "", text or "").strip()
+    starts = [i for i in (text.find('['), text.find('{')) if i >= 0]
+    if not starts:
+        return None
+    text = text[min(starts):]
+    for candidate in (text, re.sub(r",\s*([\]}])", r"\1", text)):
+        try:
+            return _load_command_list(candidate)
+        except ValueError:
+            continue
+    parser = JSONArrayStreamParser()
+    objects = parser.feed(text)
+    return objects or None
+
+
+def parse_command_response(text):
+    """Return (command objects, problem, repaired) for an LLM response. problem is None when every command is
+    valid; repaired is True when the JSON had to be fixed locally first."""
+    if not text or not text.strip():
+        return [], "empty response", False
+    repaired = False
     try:
-        cmd_name, params = parse_command(line)
-        if cmd_name not in COMMANDS:
-            log(f"Unknown command: {cmd_name}", "ERROR")
-            return
-        await execute_single_command_async(cmd_name, params)
-    except Exception as e:
-        log(f"Error executing command from line '{line}': {e}", "ERROR")
-
-def parse_command(line):
-    import re
-    # Accept /moduleName(key1={value1},key2={value2})
-    match_with_param = re.match(r"/(\w+)\((.*)\)", line)
-    if match_with_param:
-        cmd_name = match_with_param.group(1)
-        params_str = match_with_param.group(2)
-        params = {}
-        # Find all key={value} pairs
-        for param_match in re.finditer(r"(\w+)=\{([^{}]*)\}", params_str):
-            key = param_match.group(1)
-            value = param_match.group(2)
-            # Type detection: try int, then float, else string
-            value_strip = value.strip()
-            # Try int
+        commands_list = _load_command_list(text.strip())
+    except ValueError as e:
+        commands_list = repair_command_response(text)
+        if commands_list is None:
+            return [], f"invalid JSON ({getattr(e, 'msg', e)})", False
+        repaired = True
+    if not commands_list:
+        return [], "no commands", repaired
+    problem = next((p for p in map(_command_problem, commands_list) if p), None)
+    return commands_list, problem, repaired
+
+
+_parse_stats_lock = threading.Lock()
+_parse_stats = {"responses": 0, "repaired": 0, "failed": 0}
+
+
+def record_parse_result(problem, repaired):
+    """Track how often LLM responses fail to parse or need a local repair"""
+    record_metric("llm_parse_failure", 1.0 if problem else 0.0)
+    record_metric("llm_parse_repaired", 1.0 if repaired and not problem else 0.0)
+    with _parse_stats_lock:
+        _parse_stats["responses"] += 1
+        if problem:
+            _parse_stats["failed"] += 1
+        elif repaired:
+            _parse_stats["repaired"] += 1
+        stats = dict(_parse_stats)
+    if problem or repaired:
+        rates = (f"parse failures {stats['failed']}/{stats['responses']} ({stats['failed'] / stats['responses']:.1%}), "
+                 f"repaired {stats['repaired']}/{stats['responses']}")
+        if problem:
+            log(f"Response failed to parse ({problem}); {rates}", "ERROR", script="commands.py")
+        else:
+            log(f"Response repaired locally; {rates}", "COMMAND")
+
+
+async def execute_commands_from_stream_async(deltas, on_first_command=None, fallback=True):
+    """Dispatch commands from a streamed JSON-array response as soon as each object closes.
+    deltas is an async iterator of text chunks. Returns the full response text.
+    Responses that turn out not to be a JSON array are repaired and run by execute_commands_from_json_response_async
+    unless fallback is False (the caller repairs or re-requests instead)."""
+    parser = JSONArrayStreamParser()
+    dispatched = 0
+    async for delta in deltas:
+        for command_obj in parser.feed(delta):
+            command = _validated_command(command_obj)
+            if not command:
+                continue
+            if dispatched == 0 and on_first_command:
+                on_first_command(command[0])
+            dispatched += 1
             try:
-                value_cast = int(value_strip)
-            except ValueError:
-                # Try float
-                try:
-                    value_cast = float(value_strip)
-                except ValueError:
-                    value_cast = value_strip
-            params[key] = value_cast
-        return cmd_name, params
-    match_no_param = re.match(r"/(\w+)\(\)", line)
-    if match_no_param:
-        cmd_name = match_no_param.group(1)
-        return cmd_name, {}
-    raise ValueError(f"Invalid command format: {line}")
+                await execute_single_command_async(*command)
+            except Exception as e:
+                log(f"Error executing streamed command {command[0]}: {e}", "ERROR", script="commands.py")
+    if fallback and not parser.array_started and parser.text.strip():
+        await execute_commands_from_json_response_async(parser.text)
+    return parser.text
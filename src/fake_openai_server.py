@@ -0,0 +1,277 @@
+# fake_openai_server.py
+# Local mock of the OpenAI API (the "mock" provider in assets/providers.json) with scripted completions and
+# injectable latency and errors, so the assistant can be run, load-tested (load_test.py) and benchmarked offline,
+# and resilience.py (deadlines, hedged requests, circuit breaker) exercised without spending tokens.
+#
+# Usage:
+#   python src/fake_openai_server.py [--port 5065] [--delay 0.3] [--slow-rate 0.2 --slow-delay 8]
+#                                    [--error-rate 0.1] [--hang-rate 0.05] [--chunk-delay 0.02]
+#                                    [--tts-delay 0.2] [--script responses.json]
+#   VOCAL_PROVIDER=mock python src/main.py
+#
+# A script is a JSON list of {"match": regex, "response": assistant content, "delay": optional seconds}; the
+# first entry whose regex matches the request's last user message is returned, otherwise the canned response.
+# When the request offers tools, an entry's "tool_calls" ([{"name", "arguments"}]) are returned instead, and
+# once the tool results are in the conversation its "after_tools" content (see tool_loop.py). A tool_choice
+# naming a function always gets a call to it. With a json_schema response_format (structured output), array
+# responses are wrapped in {"commands": [...]} like the real API's output.
+#
+# Endpoints:
+#   POST /v1/chat/completions  scripted or canned JSON command array, streamed as server-sent events when "stream" is true
+#   POST /v1/audio/speech      short silent WAV
+#   POST /v1/embeddings        deterministic hashed vectors
+#   GET  /v1/models            empty model list (used by connection pre-warming)
+#   GET  /stats                request and injected-fault counts
+
+import io
+import re
+import sys
+import json
+import math
+import time
+import wave
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import log
+
+SCRIPT_NAME = "fake_openai_server.py"
+DEFAULT_PORT = 5065
+HANG_SECONDS = 600
+STREAM_CHUNK_CHARS = 12
+EMBEDDING_DIMENSIONS = 256
+CANNED_RESPONSE = json.dumps([{"module": "speak", "args": {"text": "This answer comes from the fake server."}}])
+
+_options = argparse.Namespace(delay=0.0, slow_rate=0.0, slow_delay=8.0, error_rate=0.0, hang_rate=0.0,
+                              chunk_delay=0.02, tts_delay=0.0, response=CANNED_RESPONSE, script=[])
+_counts = {"requests": 0, "slow": 0, "errors": 0, "hangs": 0}
+_counts_lock = threading.Lock()
+
+
+def _silent_wav(seconds=0.3, sample_rate=24000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def _load_script(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    return [{**entry, "compiled": re.compile(entry.get('match', '.*'), re.IGNORECASE)} for entry in entries]
+
+
+def _last_user_text(body):
+    for message in reversed(body.get('messages') or []):
+        if message.get('role') != 'user':
+            continue
+        content = message.get('content')
+        if isinstance(content, list):
+            return " ".join(part.get('text', '') for part in content if isinstance(part, dict))
+        return str(content or '')
+    return ''
+
+
+def _scripted_response(body):
+    """Return (assistant content, tool calls or None, extra delay) for a chat request"""
+    text = _last_user_text(body)
+    # Prompts are JSON objects; match against the user's words when they can be found
+    match = re.search(r'"user_prompt":\s*"((?:[^"\\]|\\.)*)"', text)
+    if match:
+        text = json.loads(f'"{match.group(1)}"')
+    entry = next((entry for entry in _options.script if entry["compiled"].search(text)), {})
+    delay = float(entry.get('delay', 0.0))
+    messages = body.get('messages') or []
+    if messages and messages[-1].get('role') == 'tool':
+        return entry.get('after_tools', entry.get('response', _options.response)), None, delay
+    if body.get('tools'):
+        calls = entry.get('tool_calls')
+        forced = body.get('tool_choice')
+        if isinstance(forced, dict) and not calls:
+            calls = [{"name": forced.get('function', {}).get('name'), "arguments": {"action": "current"}}]
+        if calls:
+            return None, [{"id": f"call_{i}", "type": "function",
+                           "function": {"name": call['name'], "arguments": json.dumps(call.get('arguments', {}))}}
+                          for i, call in enumerate(calls)], delay
+    return entry.get('response', _options.response), None, delay
+
+
+def _structured(content):
+    try:
+        value = json.loads(content)
+    except json.JSONDecodeError:
+        return content
+    return json.dumps({"commands": value}) if isinstance(value, list) else content
+
+
+def _embedding(text):
+    """Deterministic unit vector from hashed words and word pairs, so similar texts get similar vectors"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    words = re.findall(r"\w+", text.lower())
+    for i in range(len(words)):
+        for n in (1, 2):
+            gram = " ".join(words[i:i + n])
+            digest = hashlib.md5(gram.encode('utf-8')).digest()
+            vector[int.from_bytes(digest[:4], 'little') % EMBEDDING_DIMENSIONS] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def _send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, body):
+        self._send_bytes(status, json.dumps(body).encode('utf-8'), 'application/json')
+
+    def _inject_faults(self):
+        """Apply the configured delay/hang/error. Returns False when an error response was sent."""
+        with _counts_lock:
+            _counts["requests"] += 1
+        roll = random.random()
+        if roll < _options.hang_rate:
+            with _counts_lock:
+                _counts["hangs"] += 1
+            time.sleep(HANG_SECONDS)
+        elif roll < _options.hang_rate + _options.error_rate:
+            with _counts_lock:
+                _counts["errors"] += 1
+            self._send_json(500, {"error": {"message": "injected failure", "type": "server_error"}})
+            return False
+        elif roll < _options.hang_rate + _options.error_rate + _options.slow_rate:
+            with _counts_lock:
+                _counts["slow"] += 1
+            time.sleep(_options.slow_delay)
+        time.sleep(_options.delay)
+        return True
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            self._send_json(200, {"object": "list", "data": []})
+        elif self.path.rstrip('/') == '/stats':
+            with _counts_lock:
+                self._send_json(200, dict(_counts))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip('/')
+        if path not in ('/v1/chat/completions', '/v1/audio/speech', '/v1/embeddings'):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        if not self._inject_faults():
+            return
+        if path == '/v1/audio/speech':
+            time.sleep(_options.tts_delay)
+            self._send_bytes(200, _silent_wav(), 'audio/wav')
+            return
+        if path == '/v1/embeddings':
+            inputs = body.get('input')
+            inputs = inputs if isinstance(inputs, list) else [inputs or '']
+            self._send_json(200, {
+                "object": "list",
+                "model": body.get('model'),
+                "data": [{"object": "embedding", "index": i, "embedding": _embedding(str(text))} for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+            return
+        content, tool_calls, delay = _scripted_response(body)
+        time.sleep(delay)
+        if content and (body.get('response_format') or {}).get('type') == 'json_schema':
+            content = _structured(content)
+        if body.get('stream'):
+            self._stream_chat(content, tool_calls)
+        else:
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self._send_json(200, {
+                "object": "chat.completion",
+                "model": body.get('model'),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+    def _stream_chat(self, text, tool_calls=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        text = text or ""
+        events = [{"choices": [{"index": 0, "delta": {"content": text[i:i + STREAM_CHUNK_CHARS]}}]}
+                  for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        for index, call in enumerate(tool_calls or []):
+            # Like the real API: id and name first, then the arguments in pieces
+            events.append({"choices": [{"index": 0, "delta": {"tool_calls": [
+                {"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]}}]})
+            arguments = call["function"]["arguments"]
+            events += [{"choices": [{"index": 0, "delta": {"tool_calls": [
+                {"index": index, "function": {"arguments": arguments[i:i + STREAM_CHUNK_CHARS]}}]}}]}
+                for i in range(0, len(arguments), STREAM_CHUNK_CHARS)]
+        try:
+            for event in events:
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                time.sleep(_options.chunk_delay)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled (e.g. the losing side of a hedged request)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass  # Requests are logged through utils.log instead of stderr
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    log(f"Fake OpenAI server listening on http://{host}:{port}/v1 (delay {_options.delay}s, slow {_options.slow_rate:.0%} "
+        f"x {_options.slow_delay}s, errors {_options.error_rate:.0%}, hangs {_options.hang_rate:.0%})", "SYSTEM")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log(f"Fake OpenAI server stopped. {_counts}", "SYSTEM")
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI API with injectable latency and failures.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds added before every response")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="Fraction of requests delayed by --slow-delay")
+    parser.add_argument('--slow-delay', type=float, default=8.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument('--tts-delay', type=float, default=0.0, help="Extra seconds before speech responses")
+    parser.add_argument('--response', default=CANNED_RESPONSE, help="Assistant content returned by chat completions")
+    parser.add_argument('--script', default=None, help="JSON list of {match, response, delay} scripted completions")
+    args = parser.parse_args(argv)
+    for key in ('delay', 'slow_rate', 'slow_delay', 'error_rate', 'hang_rate', 'chunk_delay', 'tts_delay', 'response'):
+        setattr(_options, key, getattr(args, key))
+    if args.script:
+        _options.script = _load_script(args.script)
+    serve(args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
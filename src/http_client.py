@@ -0,0 +1,357 @@
+# http_client.py
+# Shared pooled HTTP client for every OpenAI call (chat, TTS, summarization) and other provider requests
+# One requests.Session keeps TLS connections alive between turns, retries 429/5xx with backoff,
+# applies per-endpoint timeouts and measures each request's connect / TTFB / body latency.
+# Each role (chat, tts, summarization, embeddings) can use any OpenAI-compatible endpoint configured in
+# assets/providers.json, e.g. a LAN inference box or the local mock server (fake_openai_server.py).
+
+import os
+import json
+import time
+import socket
+import asyncio
+import functools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from dotenv import load_dotenv
+from utils import log, record_metric, load_asset
+
+load_dotenv()
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")  # Override to use a local fake server
+ROLES = ("chat", "tts", "summarization", "embeddings")
+ENDPOINT_ROLES = {"chat/completions": "chat", "audio/speech": "tts", "embeddings": "embeddings"}
+POOL_MAXSIZE = 10
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5  # Waits 0.5s, 1s, 2s between retries (or the server's Retry-After)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# (connect, read) timeouts in seconds per endpoint
+ENDPOINT_TIMEOUTS = {
+    "chat/completions": (3.05, 60),
+    "audio/speech": (3.05, 30),
+}
+DEFAULT_TIMEOUT = (3.05, 30)
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=POOL_MAXSIZE, thread_name_prefix="http")
+_connect_timing = threading.local()
+_request_retry = threading.local()  # Retry policy overriding the adapter's for the request running on this thread
+
+
+# --- Connection classes that time TCP+TLS setup ---
+class _TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = getattr(_connect_timing, 'seconds', 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    # requests passes max_retries to every urlopen call; reading it per thread lets a single request use another
+    # policy (see request) while sharing the same pooled connections
+    @property
+    def max_retries(self):
+        return getattr(_request_retry, 'policy', None) or self._default_retries
+
+    @max_retries.setter
+    def max_retries(self, value):
+        self._default_retries = value
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def _retry_policy(read_retries=MAX_RETRIES):
+    return Retry(
+        total=MAX_RETRIES,
+        read=read_retries,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+# Streamed POSTs (chat completions) are never re-sent after a read error: the first attempt may still be
+# generating, or have been cancelled on purpose (hedging), and a silent second request doubles the cost
+STREAM_RETRY = _retry_policy(read_retries=0)
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = _retry_policy()
+            adapter = _PooledAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def request(method, url, stream=False, timeout=DEFAULT_TIMEOUT, timings=None, label=None, **kwargs):
+    """Send a request through the pooled session and measure connect / TTFB / body time.
+    With stream=False the body is read before returning; with stream=True the caller consumes it.
+    If a timings dict is given it is filled with the breakdown in seconds."""
+    _connect_timing.seconds = 0.0
+    start = time.perf_counter()
+    _request_retry.policy = STREAM_RETRY if stream and method == "POST" else None
+    try:
+        response = get_session().request(method, url, stream=True, timeout=timeout, **kwargs)
+    finally:
+        _request_retry.policy = None
+    ttfb = time.perf_counter() - start
+    body = 0.0
+    if not stream:
+        body_start = time.perf_counter()
+        response.content  # Read the whole body so the connection goes back to the pool
+        body = time.perf_counter() - body_start
+    breakdown = {"connect": _connect_timing.seconds, "ttfb": ttfb, "body": body, "total": ttfb + body}
+    if timings is not None:
+        timings.update(breakdown)
+    label = label or url
+    record_metric(f"http_ttfb_s:{label}", ttfb)
+    log(f"{method} {label}: connect {breakdown['connect'] * 1000:.0f}ms"
+        f"{' (new connection)' if breakdown['connect'] else ' (reused)'}, "
+        f"TTFB {ttfb * 1000:.0f}ms, body {body * 1000:.0f}ms", "API")
+    return response
+
+
+def post(url, **kwargs):
+    """Pooled POST for non-OpenAI providers (e.g. ElevenLabs)"""
+    return request("POST", url, **kwargs)
+
+
+def get_provider(role="chat"):
+    """Return the endpoint configuration of a role: {"name", "base_url", "headers", "models"}"""
+    try:
+        config = load_asset('providers.json')
+    except Exception as e:
+        log(f"Could not read providers.json, using OpenAI: {e}", "ERROR", script="http_client.py")
+        config = {}
+    providers = config.get('providers') or {}
+    name = os.getenv('VOCAL_PROVIDER') or (config.get('roles') or {}).get(role, 'openai')
+    if name not in providers and name != 'openai':
+        log(f"Unknown provider '{name}' for role '{role}', using OpenAI", "ERROR", script="http_client.py")
+        name = 'openai'
+    provider = providers.get(name) or {"api_key_env": "OPENAI_API_KEY"}
+    base_url = provider.get('base_url') or OPENAI_BASE_URL
+    if name == 'openai':
+        base_url = os.getenv('OPENAI_BASE_URL', base_url)
+    api_key = os.getenv(provider['api_key_env'], '') if provider.get('api_key_env') else ''
+    return {
+        "name": name,
+        "base_url": base_url.rstrip('/'),
+        "headers": {"Authorization": f"Bearer {api_key}"} if api_key else {},
+        "models": provider.get('models') or {},
+    }
+
+
+def map_model(provider, model):
+    """Translate a requested model name to the one the provider serves"""
+    models = provider["models"]
+    return models.get(model, models.get('*', model))
+
+
+def send_openai_request(endpoint, payload, headers=None, stream=False, timeout=None, timings=None, role=None):
+    """Send request to the OpenAI-compatible endpoint configured for the role (derived from the endpoint by default)"""
+    try:
+        provider = get_provider(role or ENDPOINT_ROLES.get(endpoint, "chat"))
+        url = f"{provider['base_url']}/{endpoint}"
+        if headers is None:
+            headers = provider["headers"]
+        if payload.get("model"):
+            payload = {**payload, "model": map_model(provider, payload["model"])}
+        response = request(
+            "POST", url,
+            headers={**headers, "Content-Type": "application/json"},
+            json=payload,
+            stream=stream,
+            timeout=timeout or ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT),
+            timings=timings,
+            label=endpoint,
+        )
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        if stream:
+            return response
+        return response.json()
+    except Exception as e:
+        log(f"API request to {endpoint} failed: {e}\n{traceback.format_exc()}", "ERROR", script="http_client.py")
+        return None
+
+
+async def send_openai_request_async(endpoint, payload, **kwargs):
+    """Async variant of send_openai_request; the blocking I/O runs on the dedicated HTTP executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(send_openai_request, endpoint, payload, **kwargs))
+
+
+def chatgpt_text_to_text(*, prompt=None, role="chat", **kwargs):
+    """Send text to ChatGPT (or the role's configured provider) and get response"""
+    if prompt is not None:
+        payload = {
+            "model": kwargs.get("model", "gpt-4.1"),
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        payload.update({k: v for k, v in kwargs.items() if k not in ("model",)})
+    else:
+        payload = kwargs
+    return send_openai_request('chat/completions', payload, role=role)
+
+
+async def chatgpt_text_to_text_async(*, prompt=None, role="chat", **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(chatgpt_text_to_text, prompt=prompt, role=role, **kwargs))
+
+
+def abort_response(response):
+    """Close a streamed response from another thread. Shutting the socket down wakes a read blocked on it, which
+    a plain close() does not; the connection is discarded instead of going back to the pool."""
+    connection = getattr(response.raw, '_connection', None)  # urllib3 keeps it on unreleased streamed responses
+    sock = getattr(connection, 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+def stream_chat_completion(payload, on_response=None, **kwargs):
+    """Yield the parsed server-sent-event chunks of a streamed chat completion.
+    on_response, if given, receives the HTTP response as soon as it arrives (so another thread can abort it)."""
+    response = send_openai_request('chat/completions', {**payload, "stream": True}, stream=True, **kwargs)
+    if response is None:
+        return
+    if on_response is not None:
+        on_response(response)
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                yield json.loads(data)
+            except json.JSONDecodeError:
+                log(f"Skipping malformed stream chunk: {data[:120]}", "ERROR", script="http_client.py")
+    finally:
+        response.close()
+
+
+async def stream_chat_completion_async(payload, **kwargs):
+    """Async iterator over stream_chat_completion chunks; the HTTP read runs on the executor and keeps
+    reading ahead while the consumer is busy (e.g. dispatching commands)"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    stop = threading.Event()
+    response_lock = threading.Lock()
+    responses = []
+
+    def on_response(response):
+        with response_lock:
+            responses.append(response)
+            stopped = stop.is_set()
+        if stopped:  # Abandoned while waiting for the headers
+            abort_response(response)
+
+    def pump():
+        try:
+            for chunk in stream_chat_completion(payload, on_response=on_response, **kwargs):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            if not stop.is_set():
+                log(f"Chat stream failed: {e}\n{traceback.format_exc()}", "ERROR", script="http_client.py")
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    loop.run_in_executor(_executor, pump)
+    completed = False
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is finished:
+                completed = True
+                break
+            yield chunk
+    finally:
+        with response_lock:
+            stop.set()
+            pending = [] if completed else list(responses)
+        # Abandoned (cancelled, or closed before the end): close the connection so the pump thread is released
+        # now instead of staying blocked in a read until the next chunk or the read timeout
+        for response in pending:
+            abort_response(response)
+
+
+async def stream_chat_content_async(payload, tool_calls=None, **kwargs):
+    """Async iterator over the text deltas of a streamed chat completion.
+    If tool_calls (a dict) is given, streamed tool-call fragments are merged into it as
+    {index: {"id", "name", "arguments"}} and an empty delta is yielded for each, so callers waiting
+    for the first token also see a response that only calls tools."""
+    chunks = stream_chat_completion_async(payload, **kwargs)
+    try:
+        async for chunk in chunks:
+            for choice in chunk.get("choices") or []:
+                delta = choice.get("delta") or {}
+                content = delta.get("content")
+                if content:
+                    yield content
+                if tool_calls is not None and delta.get("tool_calls"):
+                    for fragment in delta["tool_calls"]:
+                        call = tool_calls.setdefault(fragment.get("index", 0), {"id": None, "name": "", "arguments": ""})
+                        function = fragment.get("function") or {}
+                        call["id"] = fragment.get("id") or call["id"]
+                        call["name"] += function.get("name") or ""
+                        call["arguments"] += function.get("arguments") or ""
+                    yield ""
+    finally:
+        await chunks.aclose()  # Closing this stream early closes the HTTP stream too
+
+
+def warm_connections(url, count=1, headers=None, label=None):
+    """Open (or confirm) `count` pooled keep-alive connections to url's host with parallel GETs.
+    Returns the seconds spent on new TCP+TLS handshakes (0 when every connection was already open)."""
+    def warm_one():
+        timings = {}
+        try:
+            request("GET", url, headers=headers, timeout=DEFAULT_TIMEOUT, timings=timings, label=label).close()
+        except Exception as e:
+            log(f"Connection warm-up to {label or url} failed: {e}", "ERROR", script="http_client.py")
+        return timings.get("connect", 0.0)
+    futures = [_executor.submit(warm_one) for _ in range(count)]
+    return sum(future.result() for future in futures)
@@ -0,0 +1,218 @@
+# intent_router.py
+# Local deterministic intent router that runs common commands without an LLM round trip
+# Transcripts are normalized and matched against the grammar in assets/intents.json. A matching intent
+# has its slots extracted and typed, and its commands are dispatched through commands.execute_single_command_async.
+# Anything else (or a slot out of range) goes to the LLM as before. The grammar is recompiled only when
+# intents.json changes.
+#
+# Offline hit rate and agreement with the logged LLM responses:
+#   python src/intent_router.py [--log log.jsonl]
+
+import re
+import json
+import time
+import argparse
+import threading
+from utils import log, load_asset, get_asset_version, get_settings, record_metric, get_metric_summary
+
+SLOT_TYPES = {"int": int, "float": float, "str": str}
+LLM_LATENCY_METRIC = "llm_first_command_s"  # Recorded by triggers.prompt_manager
+
+_grammar_lock = threading.Lock()
+_grammar_version = None
+_grammar = None
+_stats = {"hits": 0, "misses": 0}
+
+
+def _compile_grammar():
+    spec = load_asset('intents.json')
+    by_length = lambda phrases: sorted(phrases, key=len, reverse=True)
+    intents = []
+    for intent in spec.get('intents', []):
+        try:
+            patterns = [re.compile(p) for p in intent.get('patterns', [])]
+        except re.error as e:
+            log(f"Invalid pattern in intent '{intent.get('name')}': {e}", "ERROR", script="intent_router.py")
+            continue
+        intents.append({**intent, "compiled": patterns})
+    return {
+        "leading": by_length(spec.get('leading_fillers', [])),
+        "trailing": by_length(spec.get('trailing_fillers', [])),
+        "intents": intents,
+    }
+
+
+def _get_grammar():
+    """Return the compiled grammar, recompiled only when intents.json changes"""
+    global _grammar_version, _grammar
+    version = get_asset_version('intents.json')
+    with _grammar_lock:
+        if version == _grammar_version:
+            return _grammar
+    grammar = _compile_grammar()
+    with _grammar_lock:
+        _grammar_version, _grammar = version, grammar
+    log(f"Intent grammar compiled ({len(grammar['intents'])} intents)", "SYSTEM")
+    return grammar
+
+
+def normalize(text, grammar=None):
+    """Lowercase, drop punctuation (keeping decimals and apostrophes) and strip filler words at both ends"""
+    grammar = grammar or _get_grammar()
+    text = text.lower()
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    text = re.sub(r"[^a-z0-9.'% ]+", " ", text)
+    text = " ".join(text.split())
+    changed = True
+    while changed and text:
+        changed = False
+        for filler in grammar["leading"]:
+            if text == filler or text.startswith(filler + " "):
+                text = text[len(filler):].strip()
+                changed = True
+                break
+        for filler in grammar["trailing"]:
+            if text == filler or text.endswith(" " + filler):
+                text = text[:-len(filler)].strip()
+                changed = True
+                break
+    return text
+
+
+def _typed_slots(intent, match):
+    """Return the typed slot values, or None if a slot does not convert or is out of range"""
+    slots = {}
+    for name, value in match.groupdict().items():
+        if value is None:
+            continue
+        spec = intent.get('slots', {}).get(name, {})
+        try:
+            value = SLOT_TYPES.get(spec.get('type', 'str'), str)(value)
+        except ValueError:
+            return None
+        if 'min' in spec and value < spec['min'] or 'max' in spec and value > spec['max']:
+            return None
+        slots[name] = value
+    return slots
+
+
+def _fill(value, slots):
+    if isinstance(value, str):
+        whole = re.fullmatch(r"\{(\w+)\}", value)
+        if whole and whole.group(1) in slots:
+            return slots[whole.group(1)]
+        return value.format(**slots) if slots else value
+    if isinstance(value, dict):
+        return {k: _fill(v, slots) for k, v in value.items()}
+    return value
+
+
+def match_intent(text):
+    """Return (intent name, [(module, args), ...]) for a transcript, or None when the LLM should handle it"""
+    grammar = _get_grammar()
+    normalized = normalize(text, grammar)
+    if not normalized:
+        return None
+    for intent in grammar["intents"]:
+        for pattern in intent["compiled"]:
+            match = pattern.fullmatch(normalized)
+            if not match:
+                continue
+            slots = _typed_slots(intent, match)
+            if slots is None:
+                return None
+            commands = [(c['module'], _fill(c.get('args') or {}, slots)) for c in intent.get('commands', [])]
+            return intent['name'], commands
+    return None
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('intent-router', True))
+
+
+def get_stats():
+    total = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": _stats["hits"] / total if total else 0.0}
+
+
+async def route_intent(text, before_dispatch=None):
+    """Run the transcript's commands locally if it matches an intent. Returns True when the turn was handled.
+    before_dispatch, if given, is awaited after a match; when it returns False the commands are dropped."""
+    if not is_enabled():
+        return False
+    from commands import execute_single_command_async, COMMANDS
+    start = time.perf_counter()
+    try:
+        matched = match_intent(text)
+    except Exception as e:
+        log(f"Intent matching failed: {e}", "ERROR", script="intent_router.py")
+        matched = None
+    if matched is None or any(module not in COMMANDS for module, _ in matched[1]):
+        _stats["misses"] += 1
+        return False
+    name, commands = matched
+    _stats["hits"] += 1
+    if before_dispatch is not None:
+        matching = time.perf_counter() - start
+        if not await before_dispatch():
+            return True
+        start = time.perf_counter() - matching  # The wait is not part of the routing time
+    for module, args in commands:
+        await execute_single_command_async(module, args)
+    elapsed = time.perf_counter() - start
+    record_metric("intent_route_s", elapsed)
+    stats = get_stats()
+    llm = get_metric_summary(LLM_LATENCY_METRIC)
+    saved = f", ~{llm['p50'] - elapsed:.2f}s saved vs LLM p50" if llm else ""
+    log(f"Intent '{name}' handled locally in {elapsed * 1000:.0f}ms{saved} "
+        f"(hit rate {stats['hits']}/{stats['hits'] + stats['misses']}, {stats['hit_rate'] * 100:.0f}%)", "TIMING")
+    return True
+
+
+def _response_commands(content):
+    try:
+        response = json.loads(content)
+    except Exception:
+        return None
+    return [(c.get('module'), c.get('args') or {}) for c in response if isinstance(c, dict)]
+
+
+def benchmark(log_path):
+    """Replay logged transcripts: how many would be routed locally and whether the commands match the LLM's"""
+    turns = hits = agree = 0
+    match_seconds = 0.0
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                messages = json.loads(line)["messages"]
+            except Exception:
+                continue
+            turns += 1
+            start = time.perf_counter()
+            matched = match_intent(messages[0]["content"])
+            match_seconds += time.perf_counter() - start
+            if matched is None:
+                continue
+            hits += 1
+            expected = _response_commands(messages[1]["content"]) or []
+            # Spoken wording differs; compare the non-speak commands
+            ours = [c for c in matched[1] if c[0] != 'speak']
+            theirs = [c for c in expected if c[0] != 'speak']
+            same = ours == theirs
+            agree += same
+            print(f"{'=' if same else '!'} {matched[0]:<15} {messages[0]['content'].strip()[:70]}")
+    if not turns:
+        print("No turns found.")
+        return
+    print(f"Turns: {turns}, routed locally: {hits} ({hits / turns * 100:.0f}%), "
+          f"same commands as the LLM: {agree}/{hits}")
+    print(f"Matching latency: {match_seconds / turns * 1000:.3f} ms per turn")
+
+
+if __name__ == "__main__":
+    import os
+    parser = argparse.ArgumentParser(description="Replay logged turns through the intent router.")
+    parser.add_argument('--log', default=os.path.join(os.path.dirname(__file__), '../log.jsonl'))
+    args = parser.parse_args()
+    benchmark(args.log)
@@ -0,0 +1,73 @@
+# load_test.py
+# Load test / latency benchmark of the chat provider through the shared HTTP client
+# Sends streamed chat completions built from real prompts (prompt_builder) for the example utterances in
+# FINE_TUNING_TESTS/prompt_batch.txt at a fixed concurrency, and reports first-chunk and total latency
+# percentiles, throughput and failures. Point it at the mock server to run fully offline:
+#   python src/fake_openai_server.py --script assets/mock_script.json
+#   VOCAL_PROVIDER=mock python src/load_test.py --requests 200 --concurrency 8
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH = os.path.join(os.path.dirname(__file__), '../FINE_TUNING_TESTS/prompt_batch.txt')
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _one_request(prompt, model):
+    from http_client import stream_chat_completion
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    for _ in stream_chat_completion({"model": model, "messages": [{"role": "user", "content": prompt}]}):
+        if first is None:
+            first = time.perf_counter() - start
+        chunks += 1
+    return first, time.perf_counter() - start, chunks
+
+
+def run(batch_path, requests, concurrency, model):
+    from http_client import get_provider
+    from prompt_builder import build_prompt
+    from schema_compiler import load_examples
+    utterances = [user for user, _ in load_examples(batch_path)]
+    if not utterances:
+        print("No utterances found.")
+        return 1
+    prompts = [build_prompt(utterances[i % len(utterances)]) for i in range(requests)]
+    provider = get_provider("chat")
+    print(f"{requests} streamed requests to {provider['name']} ({provider['base_url']}), model {model}, "
+          f"concurrency {concurrency}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda prompt: _one_request(prompt, model), prompts))
+    wall = time.perf_counter() - start
+    ok = [r for r in results if r[0] is not None]
+    firsts = [r[0] for r in ok]
+    totals = [r[1] for r in ok]
+    print(f"Succeeded: {len(ok)}/{requests} in {wall:.1f}s ({len(ok) / wall:.1f} requests/s)")
+    if ok:
+        print(f"First chunk: p50 {_percentile(firsts, 0.5) * 1000:.0f}ms, p95 {_percentile(firsts, 0.95) * 1000:.0f}ms, "
+              f"max {max(firsts) * 1000:.0f}ms")
+        print(f"Full response: p50 {_percentile(totals, 0.5) * 1000:.0f}ms, p95 {_percentile(totals, 0.95) * 1000:.0f}ms")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the configured chat provider.")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--model', default="gpt-4.1-mini")
+    parser.add_argument('--batch', default=DEFAULT_BATCH)
+    args = parser.parse_args(argv)
+    return run(args.batch, args.requests, args.concurrency, args.model)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,11 +19,14 @@ def preload_libraries():
 def main():
     try:
         preload_libraries()
-        # Preload Whisper model for faster first transcription
+        # Load the memory-mapped Whisper model(s) and run a warm-up decode before announcing ready
         from transcribe import preload_whisper
         preload_whisper()
         # Start the async speech worker
         start_speech_worker()
+        # Synthesize the "I'm having trouble" fallback clip once, while the provider is reachable
+        from resilience import ensure_trouble_clip
+        threading.Thread(target=ensure_trouble_clip, daemon=True).start()
         from triggers import setup_triggers, run_triggers, stop_triggers
         setup_triggers(None)
         log("Trigger system initialized. Awaiting wake word.", "SYSTEM")
@@ -35,6 +38,11 @@ def main():
             log(f"Exception in run_triggers: {e}", "ERROR", script=SCRIPT_NAME)
         finally:
             stop_triggers()
+            try:
+                from memory import shutdown as shutdown_memory
+                shutdown_memory()  # Exchanges not summarized yet stay in memory.json for the next run
+            except Exception as e:
+                log(f"Error stopping memory maintenance: {e}", "ERROR", script=SCRIPT_NAME)
             # --- Wipe memory if permanent-memory is false ---
             try:
                 import json
@@ -44,6 +52,8 @@ def main():
                 if settings and not settings.get('permanent-memory', False):
                     with open(memory_path, 'w', encoding='utf-8') as f:
                         json.dump({"summary": ""}, f, indent=2)
+                    from vector_memory import clear as clear_vector_memory
+                    clear_vector_memory()
                     log("Memory wiped on shutdown (permanent-memory is false).", "SYSTEM")
             except Exception as e:
                 log(f"Error wiping memory on shutdown: {e}", "ERROR", script=SCRIPT_NAME)
@@ -56,6 +66,8 @@ def main():
                         file_path = os.path.join(temp_dir, filename)
                         if os.path.isfile(file_path):
                             os.remove(file_path)
+                    from temp_manifest import clear as clear_temp_manifest
+                    clear_temp_manifest()
                     log("Temp folder cleaned on shutdown.", "SYSTEM")
             except Exception as e:
                 log(f"Error cleaning temp folder: {e}", "ERROR", script=SCRIPT_NAME)
@@ -1,83 +1,82 @@
+# memory.py
+# Conversation memory maintenance, off the critical path of the turns
+# Every exchange is appended at once to the raw "recent" tail of memory.json, so the next prompt always has it.
+# Rewriting the compressed "summary" is an LLM call, so exchanges are buffered and summarized together, on a
+# background worker, only when memory-batch-turns are waiting, after IDLE_SECONDS without a new turn, or when the
+# assistant goes to sleep, with the (cheaper) memory-model. memory.json is replaced atomically, never half-written.
+# memory.json: {"summary": str, "recent": [{"user", "assistant"}...], "unsummarized": number of recent not in summary}
+
 import os
 import json
-import requests
+import time
+import tempfile
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from utils import log
+from utils import log, get_settings, record_metric
+from http_client import chatgpt_text_to_text
 
 load_dotenv()
 
-def send_openai_request(endpoint, payload, headers=None, stream=False):
-    """Send request to OpenAI API"""
-    try:
-        url = f"https://api.openai.com/v1/{endpoint}"
-        if headers is None:
-            headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
-        response = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=payload, stream=stream)
-        response.raise_for_status()
-        if stream:
-            return response
-        return response.json()
-    except Exception as e:
-        log(f"OpenAI API request failed: {e}\n{traceback.format_exc()}", "ERROR")
-        return None
-
-def chatgpt_text_to_text(*, prompt=None, **kwargs):
-    """Send text to ChatGPT and get response"""
-    if prompt is not None:
-        payload = {
-            "model": kwargs.get("model", "gpt-4.1"),
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        payload.update({k: v for k, v in kwargs.items() if k not in ("model",)})
-    else:
-        payload = kwargs
-    return send_openai_request('chat/completions', payload)
+MEMORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/memory.json'))
+DEFAULT_MEMORY_MODEL = "gpt-4.1-mini"
+DEFAULT_BATCH_TURNS = 4
+IDLE_SECONDS = 30      # Summarize once no turn happened for this long
+RAW_TAIL_TURNS = 3     # Exchanges kept verbatim after they are summarized
+MAX_UNSUMMARIZED = 20  # Oldest waiting exchanges are dropped past this (summaries keep failing)
 
 memory_prompt = '''
 You are a memory assistant for an AI voice assistant named "Computer". Your job is to maintain a short, compressed memory of conversations between Computer and Tristan.
 
-Read the previous memory, the most recent user question, and Computer's response. Then create a new, updated memory that:
+Read the previous memory and the recent interactions (oldest first). Then create a new, updated memory that:
 1. Is extremely concise (maximum 300 words)
 2. Prioritizes important facts, preferences, and context
 3. Removes redundant or low-value information
 4. Maintains temporal order of key events
 5. Formats in simple paragraph form
-6. Always includes the exact last query and response at the end for perfect context
 
 Previous memory: {previous_memory}
 
-Recent interaction:
-User: {user_question}
-Computer: {assistant_response}
+Recent interactions:
+{interactions}
 
-Provide ONLY the new compressed memory paragraph with no additional text or explanation. Always end the memory with the exact last exchange:
+Provide ONLY the new compressed memory paragraph with no additional text or explanation.
 '''
 
-def summarize_memory(memory, last_user_prompt, last_ai_answer):
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+_file_lock = threading.Lock()
+_timer = None
+_timer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flushing = threading.Event()  # A summary is queued or running
+_flush_requested = None        # Reason of a flush asked for while a summary was running (runs right after it)
+
+
+def summarize_memory(memory, exchanges, model=DEFAULT_MEMORY_MODEL):
     """
     Summarize the conversation memory using OpenAI API, keeping it concise and under 300 words.
     Args:
         memory (dict): The current memory/context dict (should contain 'summary' key).
-        last_user_prompt (str): The latest user prompt.
-        last_ai_answer (str): The latest AI response.
+        exchanges (list): The exchanges to fold in, as {"user", "assistant"} dicts, oldest first.
+        model (str): The model writing the summary.
     Returns:
         dict: The summarized memory as a JSON object with a single key 'summary'.
     """
     prev_summary = memory.get('summary', '') if isinstance(memory, dict) else str(memory)
+    interactions = "\n".join(f"User: {exchange['user']}\nComputer: {exchange['assistant']}" for exchange in exchanges)
     formatted_prompt = memory_prompt.format(
         previous_memory=prev_summary,
-        user_question=last_user_prompt,
-        assistant_response=last_ai_answer
+        interactions=interactions
     )
     messages = [
         {"role": "system", "content": formatted_prompt}
     ]
     payload = {
-        "model": "gpt-4.1",
+        "model": model,
         "messages": messages
     }
-    response = chatgpt_text_to_text(**payload)
+    response = chatgpt_text_to_text(role="summarization", **payload)
     if response and 'choices' in response and response['choices']:
         summary = response['choices'][0]['message']['content'].strip()
         return {
@@ -87,6 +86,132 @@ def summarize_memory(memory, last_user_prompt, last_ai_answer):
         "summary": ""
     }
 
+
+def _settings():
+    settings = get_settings() or {}
+    model = settings.get('memory-model') or DEFAULT_MEMORY_MODEL
+    try:
+        batch_turns = max(1, int(settings.get('memory-batch-turns', DEFAULT_BATCH_TURNS)))
+    except (TypeError, ValueError):
+        batch_turns = DEFAULT_BATCH_TURNS
+    return model, batch_turns
+
+
+def _read_locked():
+    try:
+        with open(MEMORY_PATH, 'r', encoding='utf-8') as f:
+            memory = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        memory = {}
+    if not isinstance(memory, dict):
+        memory = {"summary": str(memory)}
+    memory.setdefault("summary", "")
+    memory.setdefault("recent", [])
+    memory.setdefault("unsummarized", 0)
+    return memory
+
+
+def _write_locked(memory):
+    """Replace memory.json in one step, so a prompt being built never reads a partial file"""
+    unsummarized = min(memory["unsummarized"], MAX_UNSUMMARIZED)
+    memory["unsummarized"] = unsummarized
+    memory["recent"] = memory["recent"][-max(RAW_TAIL_TURNS, unsummarized):] if memory["recent"] else []
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(MEMORY_PATH))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(memory, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, MEMORY_PATH)
+
+
+def _summarize_pending(reason):
+    model, _ = _settings()
+    with _file_lock:
+        memory = _read_locked()
+        count = memory["unsummarized"]
+        pending = memory["recent"][-count:] if count else []
+    if not pending:
+        return
+    start = time.perf_counter()
+    try:
+        summary = summarize_memory(memory, pending, model).get("summary")
+    except Exception as e:
+        log(f"Memory summarization failed: {e}\n{traceback.format_exc()}", "ERROR", script="memory.py")
+        return
+    if not summary:
+        log("Memory summarization returned nothing; exchanges kept for the next attempt", "ERROR", script="memory.py")
+        return
+    with _file_lock:
+        memory = _read_locked()  # Exchanges recorded meanwhile stay unsummarized
+        memory["summary"] = summary
+        memory["unsummarized"] = max(0, memory["unsummarized"] - len(pending))
+        _write_locked(memory)
+    elapsed = time.perf_counter() - start
+    record_metric("memory_summary_s", elapsed)
+    record_metric("memory_turns_per_summary", len(pending))
+    log(f"Memory summarized ({len(pending)} exchanges, {reason}) with {model} in {elapsed:.1f}s", "CONTEXT")
+
+
+def _cancel_timer():
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+
+def _run_flush(reason):
+    """Summarize, then again for each flush requested meanwhile (exchanges recorded during the summary)"""
+    global _flush_requested
+    while True:
+        try:
+            _summarize_pending(reason)
+        except Exception as e:
+            log(f"Memory flush failed: {e}\n{traceback.format_exc()}", "ERROR", script="memory.py")
+        with _flush_lock:
+            reason, _flush_requested = _flush_requested, None
+            if reason is None:
+                _flushing.clear()
+                return
+
+
+def flush(reason="requested"):
+    """Summarize the waiting exchanges now, in the background. Returns False if a summary is already under way;
+    the flush then runs right after it."""
+    global _flush_requested
+    _cancel_timer()
+    with _flush_lock:
+        if _flushing.is_set():
+            _flush_requested = reason
+            return False
+        _flushing.set()
+    _executor.submit(_run_flush, reason)
+    return True
+
+
+def record_exchange(user_text, assistant_response):
+    """Add an exchange to the raw tail right away; summarize when enough are waiting or once the user is idle"""
+    global _timer
+    _, batch_turns = _settings()
+    with _file_lock:
+        memory = _read_locked()
+        memory["recent"].append({"user": user_text, "assistant": assistant_response})
+        memory["unsummarized"] += 1
+        _write_locked(memory)
+        waiting = memory["unsummarized"]
+    if waiting >= batch_turns and flush(f"{waiting} turns waiting"):
+        return
+    _cancel_timer()  # Exchanges recorded during a running summary are picked up once idle
+    with _timer_lock:
+        _timer = threading.Timer(IDLE_SECONDS, flush, args=("idle",))
+        _timer.daemon = True
+        _timer.start()
+
+
+def shutdown():
+    """Stop the idle timer and let a running summary finish (waiting exchanges stay in memory.json)"""
+    _cancel_timer()
+    _executor.shutdown(wait=True)
+
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) != 4:
@@ -95,7 +220,8 @@ if __name__ == "__main__":
     memory = sys.argv[1]
     last_user_prompt = sys.argv[2]
     last_ai_answer = sys.argv[3]
-    summary = summarize_memory(memory, last_user_prompt, last_ai_answer)
+    summary = summarize_memory(memory, [{"user": last_user_prompt, "assistant": last_ai_answer}],
+                               _settings()[0])
     if summary:
         print("--- Summarized Memory ---\n")
         print(summary)
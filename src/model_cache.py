@@ -0,0 +1,104 @@
+# model_cache.py
+# Memory-mapped Whisper weight cache for near-instant model loading
+# The first load of a model converts the downloaded checkpoint into a plain state_dict saved with torch.save.
+# Later loads open it with torch.load(mmap=True) and assign the mapped tensors straight into the model, so startup
+# skips deserialization and every process loading the same model shares one copy in the OS page cache.
+
+import os
+import time
+import traceback
+import numpy as np
+import torch
+import whisper
+from whisper.model import Whisper, ModelDimensions
+from utils import log
+
+CACHE_DIR = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'vocal_computer', 'whisper')
+CACHE_FORMAT_VERSION = 1
+WARMUP_SECONDS = 1.0
+
+
+def _cache_path(model_name):
+    return os.path.join(CACHE_DIR, f"{model_name}.v{CACHE_FORMAT_VERSION}.mmap.pt")
+
+
+def _build_cache(model_name, path):
+    """Load the model the regular way and write its weights in the mmap-friendly format"""
+    model = whisper.load_model(model_name, device="cpu")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = path + ".tmp"
+    torch.save({"dims": vars(model.dims), "model_state_dict": model.state_dict()}, temp_path)
+    os.replace(temp_path, path)
+    log(f"Cached Whisper {model_name} weights for memory-mapped loading at {path}", "SYSTEM")
+    return model
+
+
+def _restore_non_persistent_buffers(model, model_name):
+    """Recreate buffers that are not part of the state_dict (causal mask and alignment heads)"""
+    dims = model.dims
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-np.inf).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+    heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+    alignment_heads = getattr(whisper, '_ALIGNMENT_HEADS', {}).get(model_name)
+    if alignment_heads:
+        model.set_alignment_heads(alignment_heads)
+
+
+def _load_mapped(model_name, path):
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    dims = ModelDimensions(**checkpoint["dims"])
+    with torch.device("meta"):
+        model = Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    _restore_non_persistent_buffers(model, model_name)
+    if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+        raise RuntimeError("model has tensors that were not restored from the cache")
+    return model
+
+
+def load_model(model_name, device=None):
+    """Load a Whisper model from the mmap cache, building the cache on first use"""
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    path = _cache_path(model_name)
+    start = time.perf_counter()
+    try:
+        if os.path.exists(path):
+            model = _load_mapped(model_name, path)
+            source = "memory-mapped cache"
+        else:
+            model = _build_cache(model_name, path)
+            source = "checkpoint (cache built)"
+    except Exception as e:
+        log(f"Memory-mapped load of {model_name} failed, using whisper.load_model: {e}\n{traceback.format_exc()}", "ERROR", script="model_cache.py")
+        return whisper.load_model(model_name, device=device)
+    model = model.to(device)
+    log(f"Whisper {model_name} loaded from {source} in {time.perf_counter() - start:.2f}s", "SYSTEM")
+    return model
+
+
+def warm_up(model):
+    """Run a short silent decode so the first real transcription does not pay kernel/allocator warm-up"""
+    start = time.perf_counter()
+    try:
+        silence = np.zeros(int(whisper.audio.SAMPLE_RATE * WARMUP_SECONDS), dtype=np.float32)
+        model.transcribe(silence, fp16=next(model.parameters()).is_cuda)
+        log(f"Whisper warm-up decode finished in {time.perf_counter() - start:.2f}s", "SYSTEM")
+    except Exception as e:
+        log(f"Whisper warm-up failed: {e}", "ERROR", script="model_cache.py")
+
+
+def page_in(model):
+    """Touch one value per memory page of every CPU tensor so mapped weights evicted from the page cache
+    are read back now rather than during the next decode. Returns the seconds spent."""
+    start = time.perf_counter()
+    page_bytes = 4096
+    with torch.no_grad():
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            if tensor.device.type != "cpu" or tensor.is_sparse or tensor.numel() == 0:
+                continue
+            stride = max(1, page_bytes // tensor.element_size())
+            tensor.detach().reshape(-1)[::stride].sum()
+    return time.perf_counter() - start
@@ -0,0 +1,115 @@
+# model_router.py
+# Complexity-based model routing for the main prompt and reprompts
+# Each turn is scored locally from the transcript length, the commands command_selector predicts and whether
+# files are attached, then sent to the cheapest model of the ladder in assets/models.json that covers the score.
+# A response that fails validation (commands.parse_command_response) is retried one step up the ladder (escalation).
+# Per-tier latency, escalation rate and cost are logged and recorded as metrics.
+
+import threading
+from utils import log, load_asset, get_settings, record_metric, get_metric_summary
+from tokens import estimate_cost_cents as estimate_default_cost_cents
+
+# Extra complexity of a turn that will probably use each module (the highest one counts)
+MODULE_COMPLEXITY = {
+    "weather": 1,
+    "news": 1,
+    "screenshot": 1,
+    "clipboard": 1,
+    "settings": 1,
+    "reprompt": 1,
+    "agenda": 2,
+    "browsing": 3,
+}
+SHORT_TURN_WORDS = 10
+LONG_TURN_WORDS = 30
+FILES_COMPLEXITY = 3
+CONTEXT_COMPLEXITY = 1
+FALLBACK_MODEL = "gpt-4.1"
+
+_stats_lock = threading.Lock()
+_stats = {"turns": 0, "escalations": 0}
+
+
+def get_ladder():
+    try:
+        ladder = load_asset('models.json').get('ladder') or []
+    except Exception as e:
+        log(f"Could not read models.json: {e}", "ERROR", script="model_router.py")
+        ladder = []
+    return ladder or [{"model": FALLBACK_MODEL, "max_complexity": 99}]
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('model-routing', True))
+
+
+def score_complexity(user_text, context=None, has_files=False):
+    """Return (complexity score, predicted modules) for a turn, computed locally"""
+    from command_selector import select_command_names
+    words = len((user_text or "").split())
+    score = 0 if words <= SHORT_TURN_WORDS else 1 if words <= LONG_TURN_WORDS else 2
+    predicted = select_command_names(user_text or "", top_k=2) or set()
+    score += max((MODULE_COMPLEXITY.get(name, 0) for name in predicted), default=0)
+    if context:
+        score += CONTEXT_COMPLEXITY
+    if has_files:
+        score += FILES_COMPLEXITY
+    return score, predicted
+
+
+def choose_tier(user_text, context=None, has_files=False):
+    """Return the ladder index to start this turn at"""
+    ladder = get_ladder()
+    if not is_enabled():
+        return len(ladder) - 1
+    score, predicted = score_complexity(user_text, context, has_files)
+    tier = next((i for i, entry in enumerate(ladder) if score <= entry.get('max_complexity', 99)), len(ladder) - 1)
+    log(f"Turn complexity {score} (predicted: {', '.join(sorted(predicted)) or 'none'}) -> "
+        f"tier {tier} {ladder[tier]['model']}", "API")
+    return tier
+
+
+def get_model(tier):
+    ladder = get_ladder()
+    return ladder[min(tier, len(ladder) - 1)]['model']
+
+
+def next_tier(tier):
+    """Return the next tier up, or None when already at the top"""
+    return tier + 1 if tier + 1 < len(get_ladder()) else None
+
+
+def estimate_cost_cents(model, input_tokens=0, output_tokens=0):
+    entry = next((e for e in get_ladder() if e['model'] == model), None)
+    if not entry or 'input_cost_per_million' not in entry:
+        return estimate_default_cost_cents(input_tokens=input_tokens, output_tokens=output_tokens)
+    return ((input_tokens / 1_000_000) * entry['input_cost_per_million']
+            + (output_tokens / 1_000_000) * entry.get('output_cost_per_million', 0.0))
+
+
+def record_attempt(tier, latency, cost_cents=0.0, new_turn=True):
+    """Log one model call of a turn with its tier latency, cost and the running escalation rate"""
+    ladder = get_ladder()
+    entry = ladder[min(tier, len(ladder) - 1)]
+    model = entry['model']
+    record_metric(f"llm_latency_s:{model}", latency)
+    record_metric(f"llm_cost_cents:{model}", cost_cents)
+    with _stats_lock:
+        if new_turn:
+            _stats["turns"] += 1
+        turns, escalations = _stats["turns"], _stats["escalations"]
+    summary = get_metric_summary(f"llm_latency_s:{model}")
+    target = entry.get('target_latency_s')
+    over = f" (over its {target:.1f}s target)" if target and latency > target else ""
+    log(f"Tier {tier} {model}: {latency:.2f}s{over}, {cost_cents:.4f}¢, p50 {summary['p50']:.2f}s over "
+        f"{summary['count']} calls; escalations {escalations}/{turns} turns", "COST")
+
+
+def record_escalation(tier, reason):
+    record_metric("llm_escalation", 1.0)
+    with _stats_lock:
+        _stats["escalations"] += 1
+    target = next_tier(tier)
+    log(f"{get_model(tier)} output failed validation ({reason}); escalating to "
+        f"{get_model(target) if target is not None else 'nothing (top tier)'}", "ERROR", script="model_router.py")
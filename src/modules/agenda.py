@@ -9,7 +9,11 @@ from datetime import datetime, timedelta
 from dateutil import parser
 from dateutil.tz import gettz
 import traceback
-from utils import log
+from utils import log, get_cached_data, set_cached_data, invalidate_cached_data
+from temp_manifest import register_artifact
+
+LIST_CACHE_TTL = 120  # Seconds a listing is reused (prefetch.py warms today's events on wake); writes clear it
+WRITE_ACTIONS = ['add', 'create', 'modify', 'update', 'edit', 'delete', 'remove', 'move', 'clear']
 
 def run(action=None, **kwargs):
     """Main execution function for agenda operations"""
@@ -22,6 +26,9 @@ def run(action=None, **kwargs):
         # Combine action and kwargs into args dictionary for internal functions
         args = {'action': action, **kwargs}
         
+        if action in WRITE_ACTIONS:
+            invalidate_cached_data("agenda")
+        
         if action in ['list', 'today', 'week', 'month']:
             return list_events(args)
         elif action in ['add', 'create']:
@@ -201,10 +208,6 @@ def get_event_color_id(color_name):
 def list_events(args):
     """List calendar events"""
     try:
-        service = get_calendar_service()
-        if not service:
-            return "Failed to connect to Google Calendar."
-        
         calendar_id = os.getenv('GOOGLE_CALENDAR_ID', 'primary')
         action = args.get('action', 'today')
         
@@ -224,17 +227,23 @@ def list_events(args):
             start_time = now
             end_time = None
         
-        # Fetch events
-        events_result = service.events().list(
-            calendarId=calendar_id,
-            timeMin=start_time.isoformat() + 'Z',
-            timeMax=end_time.isoformat() + 'Z' if end_time else None,
-            maxResults=50,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        # Fetch events (or reuse a recent listing of the same range)
+        cache_key = (calendar_id, action, start_time.date().isoformat())
+        events = get_cached_data("agenda", cache_key, LIST_CACHE_TTL)
+        if events is None:
+            service = get_calendar_service()
+            if not service:
+                return "Failed to connect to Google Calendar."
+            events_result = service.events().list(
+                calendarId=calendar_id,
+                timeMin=start_time.isoformat() + 'Z',
+                timeMax=end_time.isoformat() + 'Z' if end_time else None,
+                maxResults=50,
+                singleEvents=True,
+                orderBy='startTime'
+            ).execute()
+            events = events_result.get('items', [])
+            set_cached_data("agenda", cache_key, events)
         
         if not events:
             return f"No events found for {action}."
@@ -264,6 +273,9 @@ def list_events(args):
             
             event_list.append(event_info)
         
+        if args.get('return_data'):
+            return {"range": action, "events": event_list}
+        
         # Save to temp file for AI to read
         filename = args.get('filename', f'calendar_{action}.txt')
         temp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../temp'))
@@ -273,6 +285,7 @@ def list_events(args):
         with open(temp_file, 'w', encoding='utf-8') as f:
             f.write(f"Calendar Events ({action}):\n\n")
             f.write('\n'.join(event_list))
+        register_artifact(temp_file, "agenda")
         
         log(f"Calendar events for {action} retrieved and saved to temp file.", "COMMAND")
         return f"Retrieved {len(events)} events for {action}. Events saved to {filename} for AI analysis."
@@ -645,6 +658,9 @@ def search_events(args):
             event_info = f"• {start_display}: {title} (ID: {event['id']})"
             event_list.append(event_info)
         
+        if args.get('return_data'):
+            return {"query": query, "events": event_list}
+        
         # Save to temp file
         filename = args.get('filename', f'calendar_search_{query.replace(" ", "_")}.txt')
         temp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../temp'))
@@ -654,6 +670,7 @@ def search_events(args):
         with open(temp_file, 'w', encoding='utf-8') as f:
             f.write(f"Search Results for '{query}':\n\n")
             f.write('\n'.join(event_list))
+        register_artifact(temp_file, "agenda")
         
         success_msg = f"Found {len(events)} events matching '{query}'. Results saved to {filename}."
         log(success_msg, "COMMAND")
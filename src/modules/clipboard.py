@@ -1,6 +1,7 @@
 import os
 import pyperclip
 from utils import log
+from temp_manifest import register_artifact
 
 def run(actionType=None, filename=None, text=None, **kwargs):
     script_name = "clipboard.py"
@@ -15,6 +16,7 @@ def run(actionType=None, filename=None, text=None, **kwargs):
             file_path = os.path.join(temp_dir, filename)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(clipboard_content)
+            register_artifact(file_path, "clipboard")
             return {"filename": file_path}
         except Exception as e:
             log(f"Failed to save clipboard: {e}", "ERROR", script=script_name)
@@ -4,10 +4,13 @@ import requests
 import traceback
 from datetime import datetime
 from dotenv import load_dotenv
-from utils import log
+from utils import log, get_cached_data, set_cached_data
+from temp_manifest import register_artifact
 
 load_dotenv()
 
+CACHE_TTL = 600  # Seconds a feed is reused (also lets prefetch.py warm the headlines before they are asked for)
+
 def send_news_api_request(service, endpoint=None, params=None, headers=None):
     """Send requests to news APIs"""
     try:
@@ -26,6 +29,11 @@ def send_news_api_request(service, endpoint=None, params=None, headers=None):
         else:
             url = service_urls[service]
         
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = get_cached_data("news", cache_key, CACHE_TTL)
+        if cached is not None:
+            return cached
+        
         default_headers = {
             "User-Agent": "VocalComputer/1.0 (contact: user@example.com)"
         }
@@ -37,9 +45,11 @@ def send_news_api_request(service, endpoint=None, params=None, headers=None):
         response.raise_for_status()
         
         if service == 'bbc':
-            return response.text  # RSS XML content
+            data = response.text  # RSS XML content
         else:
-            return response.json()  # JSON content
+            data = response.json()  # JSON content
+        set_cached_data("news", cache_key, data)
+        return data
         
     except Exception as e:
         log(f"News API request failed for {service}: {e}\n{traceback.format_exc()}", "ERROR")
@@ -63,7 +73,7 @@ def get_newsapi_headlines(api_key, params=None):
     headers = {"X-API-Key": api_key} if api_key else {}
     return send_news_api_request('newsapi', 'top-headlines', params, headers)
 
-def run(action=None, category=None, count=None, **kwargs):
+def run(action=None, category=None, count=None, return_data=False, **kwargs):
     """
     News module using free public APIs
     
@@ -73,6 +83,8 @@ def run(action=None, category=None, count=None, **kwargs):
     - business: Business news  
     - science: Science news
     - world: World news
+    
+    With return_data the articles are returned instead of saved to temp (tool calls, see tool_loop.py)
     """
     script_name = "news.py"
     
@@ -91,30 +103,40 @@ def run(action=None, category=None, count=None, **kwargs):
     try:
         if action == "headlines":
             news_data = get_top_headlines(count)
+            if return_data:
+                return news_data
             filename = kwargs.get('filename', 'top_headlines.json')
             save_news_to_temp(news_data, filename)
             return f"Top headlines retrieved and saved to {filename}."
             
         elif action in ["tech", "technology"]:
             news_data = get_category_news("technology", count)
+            if return_data:
+                return news_data
             filename = kwargs.get('filename', 'tech_news.json')
             save_news_to_temp(news_data, filename)
             return f"Technology news retrieved and saved to {filename}."
             
         elif action == "business":
             news_data = get_category_news("business", count)
+            if return_data:
+                return news_data
             filename = kwargs.get('filename', 'business_news.json')
             save_news_to_temp(news_data, filename)
             return f"Business news retrieved and saved to {filename}."
             
         elif action == "science":
             news_data = get_category_news("science", count)
+            if return_data:
+                return news_data
             filename = kwargs.get('filename', 'science_news.json')
             save_news_to_temp(news_data, filename)
             return f"Science news retrieved and saved to {filename}."
             
         elif action == "world":
             news_data = get_world_news(count)
+            if return_data:
+                return news_data
             filename = kwargs.get('filename', 'world_news.json')
             save_news_to_temp(news_data, filename)
             return f"World news retrieved and saved to {filename}."
@@ -363,6 +385,7 @@ def save_news_to_temp(news_data, filename):
         file_path = os.path.join(temp_dir, filename)
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(news_data, f, indent=2, ensure_ascii=False)
+        register_artifact(file_path, "news")
             
         
     except Exception as e:
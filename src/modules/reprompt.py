@@ -3,73 +3,32 @@ import os
 import json
 import asyncio
 import base64
-import requests
 import traceback
 from dotenv import load_dotenv
 from utils import log
-from commands import execute_commands_from_response_block_sync
+from http_client import chatgpt_text_to_text
+from commands import execute_single_command
 
 load_dotenv()
 
-def send_openai_request(endpoint, payload, headers=None, stream=False):
-    """Send request to OpenAI API"""
-    try:
-        url = f"https://api.openai.com/v1/{endpoint}"
-        if headers is None:
-            headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
-        response = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=payload, stream=stream)
-        response.raise_for_status()
-        if stream:
-            return response
-        return response.json()
-    except Exception as e:
-        log(f"OpenAI API request failed: {e}", "ERROR", script="reprompt.py")
-        return None
-
-def chatgpt_text_to_text(*, prompt=None, **kwargs):
-    """Send text to ChatGPT and get response"""
-    if prompt is not None:
-        payload = {
-            "model": kwargs.get("model", "gpt-4.1"),
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        payload.update({k: v for k, v in kwargs.items() if k not in ("model",)})
-    else:
-        payload = kwargs
-    return send_openai_request('chat/completions', payload)
+MAX_RESPONSE_REREQUESTS = 1  # Same-turn retries of an invalid top-tier response (as in triggers.py)
 
 def run(prompt=None, filenames=None, context=None, **kwargs):
     script_name = "reprompt.py"
-    from commands import execute_commands_from_response_block_sync
     if not prompt:
         log("Missing required argument: prompt", "ERROR", script="reprompt.py")
         return
-    # --- Load baseprompt, settings, commands, memory ---
+    # --- Build the prompt from cached baseprompt, settings, commands, memory ---
     try:
+        from prompt_builder import build_prompt
         base_dir = os.path.dirname(__file__)
-        with open(os.path.join(base_dir, '../../assets/baseprompt.json'), 'r', encoding='utf-8') as f:
-            baseprompt = json.load(f)
-        with open(os.path.join(base_dir, '../../assets/settings.json'), 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-        with open(os.path.join(base_dir, '../../assets/commands.json'), 'r', encoding='utf-8') as f:
-            commands = json.load(f).get('commands', [])
-        with open(os.path.join(base_dir, '../../assets/memory.json'), 'r', encoding='utf-8') as f:
-            memory = json.load(f)
-        baseprompt['settings'] = settings
-        baseprompt['commands'] = commands
-        baseprompt['memory'] = memory  # Load full memory.json as the memory key
-        baseprompt['user_prompt'] = prompt
-        if context is not None:
-            baseprompt['context'] = context
-        elif 'context' in baseprompt:
-            del baseprompt['context']
+        memory_context = build_prompt(prompt, context=context)
     except Exception as e:
         log(f"[reprompt.py]\n[ERROR]\nFailed to load baseprompt/settings/commands/memory: {e}", level="ERROR", script=script_name)
         return
     # --- Prepare user_content for API ---
     user_content = []
     # Add memory/context and prompt as text
-    memory_context = json.dumps(baseprompt, ensure_ascii=False)
     user_content.append({"type": "text", "text": memory_context + prompt})
     # Attach image as base64 data URI if provided
     file_list = []
@@ -85,8 +44,7 @@ def run(prompt=None, filenames=None, context=None, **kwargs):
         file_path = fname if os.path.isabs(fname) else os.path.abspath(os.path.join(base_dir, '../../temp', fname))
         ext = os.path.splitext(file_path)[1].lower()
         if not os.path.isfile(file_path):
-            error_cmd = f"/speak(text={{I couldn't find a file called {fname}}})"
-            execute_commands_from_response_block_sync(error_cmd)
+            execute_single_command("speak", {"text": f"I couldn't find a file called {fname}"})
             log(f"[reprompt.py] File not found: {file_path}. Reprompt blocked.", level="ERROR", script=script_name)
             return
         if ext in allowed_image_exts:
@@ -107,29 +65,57 @@ def run(prompt=None, filenames=None, context=None, **kwargs):
             except Exception as e:
                 log(f"[reprompt.py]\n[ERROR]\nFailed to read text file {file_path}: {e}", level="ERROR", script=script_name)
         else:
-            error_cmd = f"/speak(text={{The file type {ext} can not be retrieved}})"
-            execute_commands_from_response_block_sync(error_cmd)
+            execute_single_command("speak", {"text": f"The file type {ext} can not be retrieved"})
             log(f"[reprompt.py] File type not allowed: {file_path} ({ext}). Reprompt blocked.", level="ERROR", script=script_name)
             return
-    # --- Call the API ---
-    payload = {"model": "gpt-4.1", "messages": [{"role": "user", "content": user_content}]}
-    response = chatgpt_text_to_text(**payload)
-    # --- Process the response through commands.py ---
-    content = None
-    try:
-        if response and 'choices' in response and response['choices']:
-            content = response['choices'][0]['message']['content']
-    except Exception as e:
-        log(f"[reprompt.py]\n[ERROR]\nMalformed API response: {response}\n{e}", level="ERROR", script=script_name)
+    # --- Call the API (model picked by complexity, escalated if the output fails validation, re-requested once at the top tier) ---
+    import time
+    import model_router
+    from commands import parse_command_response, record_parse_result
+    from schema_compiler import get_response_format
+    response_format = get_response_format()
+    tier = model_router.choose_tier(prompt, context=context, has_files=bool(file_list))
+    new_turn = True
+    rerequests = 0
+    messages = [{"role": "user", "content": user_content}]
+    while True:
+        model = model_router.get_model(tier)
+        payload = {"model": model, "messages": messages}
+        if response_format:
+            payload["response_format"] = response_format
+        request_start = time.perf_counter()
+        response = chatgpt_text_to_text(**payload)
+        # --- Process the response through commands.py ---
+        content = None
+        try:
+            if response and 'choices' in response and response['choices']:
+                content = response['choices'][0]['message']['content']
+        except Exception as e:
+            log(f"[reprompt.py]\n[ERROR]\nMalformed API response: {response}\n{e}", level="ERROR", script=script_name)
+        usage = (response or {}).get('usage') or {}
+        cost_cents = model_router.estimate_cost_cents(model, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+        model_router.record_attempt(tier, time.perf_counter() - request_start, cost_cents, new_turn)
+        new_turn = False
+        if not response:
+            break
+        _, problem, repaired = parse_command_response(content)
+        record_parse_result(problem, repaired)
+        if problem is None:
+            break
+        if model_router.next_tier(tier) is not None:
+            model_router.record_escalation(tier, problem)
+            tier = model_router.next_tier(tier)
+        elif rerequests < MAX_RESPONSE_REREQUESTS:
+            rerequests += 1
+            log(f"Reprompt response failed validation ({problem}); re-requesting", "ERROR", script=script_name)
+            messages = messages + [{"role": "assistant", "content": content or ""},
+                                   {"role": "user", "content": f"That response was invalid ({problem}). "
+                                                               "Answer again with only the JSON commands."}]
+        else:
+            break
     if content:
-        # Use new JSON command processing
         from commands import execute_commands_from_json_response_async
         log(f"Processing reprompt AI response: {content}", "COMMAND")
-        if asyncio.iscoroutinefunction(execute_commands_from_json_response_async):
-            asyncio.run(execute_commands_from_json_response_async(content))
-        else:
-            # Fallback for sync execution
-            from commands import execute_commands_from_json_response
-            execute_commands_from_json_response(content)
+        asyncio.run(execute_commands_from_json_response_async(content))
         log("All reprompt commands executed. AI response complete.", "COMMAND")
     return content
@@ -1,6 +1,7 @@
 import mss
 import os
 from utils import log
+from temp_manifest import register_artifact
 from PIL import Image
 
 def run(monitorId=None, filename=None, **kwargs):
@@ -40,6 +41,7 @@ def run(monitorId=None, filename=None, **kwargs):
         screenshot = sct.grab(monitor)
         img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
         img.save(full_path)
+        register_artifact(full_path, "screenshot")
         return {
             'monitorId': monitor_id,
             'filename': full_path
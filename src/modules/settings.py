@@ -1,15 +1,18 @@
 import json
+import math
 import os
+import re
 from utils import log
 
 SETTINGS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../assets/settings.json'))
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")  # Not "nan" or "inf", which float() accepts but JSON cannot hold
 
 def run(key=None, value=None, **kwargs):
     """
-    Modifies the 'value' field of an existing setting in settings.json. Only existing settings can be changed; new settings cannot be added.
+    Modifies the 'value' field of an existing setting in settings.json. Only existing, non-internal settings can be changed; new settings cannot be added.
     Args:
         key (str): The setting-id to modify.
-        value (str|int|bool): The new value for the setting.
+        value (str|int|float|bool): The new value for the setting.
     """
     if key is None or value is None:
         log("/settings command called without both 'key' and 'value' arguments. No changes made.", "ERROR")
@@ -20,17 +23,20 @@ def run(key=None, value=None, **kwargs):
         found = False
         for s in settings:
             if s.get('setting-id') == key:
-                # Try to convert value to int or bool if possible
+                if s.get('internal'):
+                    log(f"/settings command attempted to modify internal setting '{key}'. No changes made.", "ERROR")
+                    return
+                # Try to convert value to int, float or bool if possible
                 if isinstance(value, str):
                     if value.lower() == 'true':
                         value = True
                     elif value.lower() == 'false':
                         value = False
-                    else:
-                        try:
-                            value = int(value)
-                        except ValueError:
-                            pass
+                    elif NUMBER_PATTERN.match(value.strip()):
+                        value = float(value) if '.' in value else int(value)
+                if isinstance(value, float) and not math.isfinite(value):
+                    log(f"/settings command attempted to set '{key}' to {value}. No changes made.", "ERROR")
+                    return
                 s['value'] = value
                 found = True
                 break
@@ -6,27 +6,12 @@ from utils import log
 from sounds import queue_speech
 import threading
 import time
-import requests
 import traceback
 from dotenv import load_dotenv
+from http_client import send_openai_request, post
 
 load_dotenv()
 
-def send_openai_request(endpoint, payload, headers=None, stream=False):
-    """Send request to OpenAI API"""
-    try:
-        url = f"https://api.openai.com/v1/{endpoint}"
-        if headers is None:
-            headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
-        response = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=payload, stream=stream)
-        response.raise_for_status()
-        if stream:
-            return response
-        return response.json()
-    except Exception as e:
-        log(f"OpenAI API request failed: {e}", "ERROR", script="speak.py")
-        return None
-
 def chatgpt_text_to_speech(text, voice="nova", speed=1.0, model="gpt-4o-mini-tts", response_format="mp3", stream=True, **kwargs):
     payload = {
         "model": model,
@@ -72,7 +57,7 @@ def elevenlabs_text_to_speech(
     }
     data.update(kwargs)
     try:
-        response = requests.post(url, json=data, headers=headers)
+        response = post(url, json=data, headers=headers, label="elevenlabs/text-to-speech")
         if response.status_code == 200:
             return response.content
         else:
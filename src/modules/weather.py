@@ -2,7 +2,11 @@ import json
 import os
 import requests
 import traceback
-from utils import log
+from utils import log, get_cached_data, set_cached_data
+from temp_manifest import register_artifact
+
+# Seconds a response is reused (also lets prefetch.py warm the data before the question is asked)
+CACHE_TTL = {'ipapi': 3600, 'nominatim': 86400, 'openmeteo': 600}
 
 def send_weather_api_request(service, endpoint=None, params=None):
     """Send requests to weather-related APIs"""
@@ -22,13 +26,20 @@ def send_weather_api_request(service, endpoint=None, params=None):
         else:
             url = service_urls[service]
         
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = get_cached_data("weather", cache_key, CACHE_TTL[service])
+        if cached is not None:
+            return cached
+        
         headers = {
             "User-Agent": "VocalComputer/1.0 (contact: user@example.com)"
         }
         
         response = requests.get(url, headers=headers, params=params, timeout=10)
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        set_cached_data("weather", cache_key, data)
+        return data
         
     except Exception as e:
         log(f"Weather API request failed for {service}: {e}\n{traceback.format_exc()}", "ERROR")
@@ -57,7 +68,7 @@ def api_get_weather_forecast(lat, lon, params=None):
     })
     return send_weather_api_request('openmeteo', 'forecast', params)
 
-def run(action=None, location=None, **kwargs):
+def run(action=None, location=None, return_data=False, **kwargs):
     """
     Weather module using free APIs and automatic location detection
     
@@ -65,6 +76,8 @@ def run(action=None, location=None, **kwargs):
     - current: Get current weather
     - forecast: Get 5-day forecast
     - today: Get today's weather summary
+    
+    With return_data the data is returned instead of saved to temp (tool calls, see tool_loop.py)
     """
     script_name = "weather.py"
     
@@ -86,12 +99,16 @@ def run(action=None, location=None, **kwargs):
         
         if action == "current":
             weather_data = get_current_weather(lat, lon, city)
+            if return_data:
+                return weather_data
             filename = kwargs.get('filename', 'current_weather.json')
             save_weather_to_temp(weather_data, filename)
             return f"Current weather data retrieved and saved to {filename}."
             
         elif action == "forecast":
             forecast_data = get_weather_forecast(lat, lon, city)
+            if return_data:
+                return forecast_data
             filename = kwargs.get('filename', 'weather_forecast.json')
             save_weather_to_temp(forecast_data, filename)
             return f"Weather forecast data retrieved and saved to {filename}."
@@ -106,6 +123,8 @@ def run(action=None, location=None, **kwargs):
                 "current": weather_data,
                 "today_forecast": forecast_data["daily"][0] if forecast_data.get("daily") else None
             }
+            if return_data:
+                return today_data
             save_weather_to_temp(today_data, filename)
             return f"Today's weather data retrieved and saved to {filename}."
             
@@ -281,6 +300,7 @@ def save_weather_to_temp(weather_data, filename):
         file_path = os.path.join(temp_dir, filename)
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(weather_data, f, indent=2, ensure_ascii=False)
+        register_artifact(file_path, "weather")
             
     except Exception as e:
         log(f"Error saving weather data: {e}", "ERROR", script="weather.py")
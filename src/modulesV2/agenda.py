@@ -7,6 +7,7 @@ import json
 from datetime import datetime, timedelta
 from dateutil import parser
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="list", return_data=False, **kwargs):
     """
@@ -441,6 +442,7 @@ def create_response(success, message, return_data, data=None):
         
         with open(os.path.join(temp_dir, filename), 'w', encoding='utf-8') as f:
             json.dump(file_data, f, indent=2)
+        register_artifact(os.path.join(temp_dir, filename), "agenda")
         
         log(message, "COMMAND")
         return f"Calendar operation completed. Data saved to {filename}"
@@ -7,6 +7,7 @@ import os
 import json
 from datetime import datetime
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="open", return_data=False, **kwargs):
     """
@@ -195,6 +196,7 @@ def save_to_temp(data, filename):
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
             
+        register_artifact(file_path, "browse")
         log(f"Browse data saved to {filename}", "INFO")
         
     except Exception as e:
@@ -7,6 +7,7 @@ import os
 import json
 from datetime import datetime
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="headlines", return_data=False, **kwargs):
     """
@@ -221,6 +222,7 @@ def create_response(success, message, return_data, data=None):
         
         with open(os.path.join(temp_dir, filename), 'w', encoding='utf-8') as f:
             json.dump(file_data, f, indent=2)
+        register_artifact(os.path.join(temp_dir, filename), "news")
         
         log(message, "COMMAND")
         return f"News operation completed. Data saved to {filename}"
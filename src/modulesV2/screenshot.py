@@ -8,6 +8,7 @@ import time
 from datetime import datetime
 from PIL import ImageGrab
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="capture", return_data=False, **kwargs):
     """
@@ -163,6 +164,7 @@ def create_response(success, message, return_data, data=None):
         
         with open(os.path.join(temp_dir, result_filename), 'w', encoding='utf-8') as f:
             json.dump(file_data, f, indent=2)
+        register_artifact(os.path.join(temp_dir, result_filename), "screenshot")
         
         log(message, "COMMAND")
         return f"Screenshot operation completed. Data saved to {result_filename}"
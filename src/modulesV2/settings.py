@@ -6,6 +6,7 @@ import os
 import json
 from datetime import datetime
 from utils import log, get_settings
+from temp_manifest import register_artifact
 
 def run(action="get", return_data=False, **kwargs):
     """
@@ -201,6 +202,7 @@ def create_response(success, message, return_data, data=None):
         
         with open(os.path.join(temp_dir, filename), 'w', encoding='utf-8') as f:
             json.dump(file_data, f, indent=2)
+        register_artifact(os.path.join(temp_dir, filename), "settings")
         
         log(message, "COMMAND")
         return f"Settings operation completed. Data saved to {filename}"
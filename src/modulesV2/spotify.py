@@ -8,6 +8,7 @@ import spotipy
 from datetime import datetime
 from spotipy.oauth2 import SpotifyOAuth
 from utils import log
+from temp_manifest import register_artifact
 
 # Spotify credentials from environment variables
 CLIENT_ID = os.getenv("SPOTIPY_CLIENT_ID")
@@ -376,6 +377,7 @@ def save_to_temp(data, filename):
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
             
+        register_artifact(file_path, "spotify")
         log(f"Spotify data saved to {filename}", "INFO")
         
     except Exception as e:
@@ -6,6 +6,7 @@ import os
 import json
 from datetime import datetime
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="add", return_data=False, **kwargs):
     """
@@ -228,6 +229,7 @@ def save_to_temp(data, filename):
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
             
+        register_artifact(file_path, "todo")
         log(f"TODO data saved to {filename}", "INFO")
         
     except Exception as e:
@@ -7,6 +7,7 @@ import json
 import requests
 from datetime import datetime
 from utils import log
+from temp_manifest import register_artifact
 
 def run(action="current", return_data=False, **kwargs):
     """
@@ -458,6 +459,7 @@ def save_to_temp(data, filename):
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
             
+        register_artifact(file_path, "weather")
         log(f"Weather data saved to {filename}", "INFO")
         
     except Exception as e:
@@ -0,0 +1,174 @@
+# prefetch.py
+# Predictive data prefetch on wake
+# The turn history (log.jsonl) has strong daily patterns: agenda and weather in the morning, Spotify in the evening.
+# The planner mines it for (weekday, hour) -> module frequencies; when the wake word is heard, start() fetches the
+# data the user is likely to ask about right now (weather, today's agenda, headlines) in the background, into the
+# modules' short-lived caches (see get_cached_data in utils.py), so the question is answered from warm data.
+# Print the plan for a given time:
+#   python src/prefetch.py [--log log.jsonl] [--at "2024-06-03 08:00"]
+
+import os
+import sys
+import time
+import json
+import argparse
+import importlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils import log, get_settings, record_metric
+
+HISTORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../log.jsonl'))
+# Modules worth fetching ahead of time, with the arguments of the call that warms their cache
+PREFETCHABLE = {
+    "weather": {"action": "today"},
+    "agenda": {"action": "today"},
+    "news": {"action": "headlines"},
+}
+MIN_SHARE = 0.2     # Fraction of the turns around this time that must use the module
+MIN_SUPPORT = 3.0   # Weighted number of turns around this time needed before trusting the share
+HOUR_WEIGHTS = {0: 1.0, 1: 0.5}  # Hour distance -> weight (turns further away are ignored)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+_history_lock = threading.Lock()
+_history_version = None
+_history = {}  # (weekday, hour) -> {"turns": n, "modules": {module: n}}
+_running = threading.Event()
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('predictive-prefetch', True))
+
+
+def _turn_modules(entry):
+    """Return the set of modules an assistant answer of log.jsonl ran"""
+    from commands import parse_command_response
+    for message in entry.get("messages", []):
+        if message.get("role") == "assistant":
+            commands, _, _ = parse_command_response(message.get("content") or "")
+            return {command.get("module") for command in commands if isinstance(command, dict) and command.get("module")}
+    return set()
+
+
+def _mine(path):
+    """Count turns and module uses per (weekday, hour) from the timestamped entries of the history"""
+    history = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                when = datetime.fromisoformat(entry["timestamp"])
+            except (ValueError, KeyError, TypeError):
+                continue  # Malformed, or logged before entries were timestamped
+            slot = history.setdefault((when.weekday(), when.hour), {"turns": 0, "modules": {}})
+            slot["turns"] += 1
+            for module in _turn_modules(entry):
+                slot["modules"][module] = slot["modules"].get(module, 0) + 1
+    return history
+
+
+def get_history(path=HISTORY_PATH):
+    """Return the mined history, re-reading the log only when it changed"""
+    global _history_version, _history
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    version = (path, stat.st_mtime_ns, stat.st_size)
+    with _history_lock:
+        if version == _history_version:
+            return _history
+    history = _mine(path)
+    with _history_lock:
+        _history_version, _history = version, history
+    return history
+
+
+def score_modules(history, when):
+    """Return ({module: share of the turns around this time that used it}, weighted turn count).
+    Turns on the same weekday count fully, on another day of the same kind (weekday/weekend) half."""
+    turns = 0.0
+    uses = {}
+    weekend = when.weekday() >= 5
+    for (weekday, hour), slot in history.items():
+        distance = min(abs(hour - when.hour), 24 - abs(hour - when.hour))
+        if distance not in HOUR_WEIGHTS:
+            continue
+        if weekday == when.weekday():
+            day_weight = 1.0
+        elif (weekday >= 5) == weekend:
+            day_weight = 0.5
+        else:
+            continue
+        weight = HOUR_WEIGHTS[distance] * day_weight
+        turns += weight * slot["turns"]
+        for module, count in slot["modules"].items():
+            uses[module] = uses.get(module, 0.0) + weight * count
+    if not turns:
+        return {}, 0.0
+    return {module: count / turns for module, count in uses.items()}, turns
+
+
+def plan(when=None, path=HISTORY_PATH):
+    """Return the prefetchable modules likely to be needed at this time, most likely first"""
+    shares, support = score_modules(get_history(path), when or datetime.now())
+    if support < MIN_SUPPORT:
+        return []
+    likely = [module for module in PREFETCHABLE if shares.get(module, 0.0) >= MIN_SHARE]
+    return sorted(likely, key=lambda module: -shares[module])
+
+
+def _fetch(module_name):
+    """Run the module's data path once; its result lands in the module's cache"""
+    from commands import COMMANDS, MODULE_CACHE
+    module_key = COMMANDS[module_name]['module'][:-3]
+    if module_key not in MODULE_CACHE:
+        MODULE_CACHE[module_key] = importlib.import_module(module_key)
+    MODULE_CACHE[module_key].run(**PREFETCHABLE[module_name], return_data=True)
+
+
+def _run():
+    try:
+        modules = plan()
+        if not modules:
+            return
+        start = time.perf_counter()
+        for module_name in modules:
+            try:
+                _fetch(module_name)
+            except Exception as e:
+                log(f"Prefetch of {module_name} failed: {e}", "ERROR", script="prefetch.py")
+        elapsed = time.perf_counter() - start
+        record_metric("prefetch_s", elapsed)
+        log(f"Prefetched {', '.join(modules)} in {elapsed * 1000:.0f}ms", "CONTEXT")
+    except Exception as e:
+        log(f"Prefetch planning failed: {e}", "ERROR", script="prefetch.py")
+    finally:
+        _running.clear()
+
+
+def start():
+    """Warm the likely-needed data in the background (non-blocking; ignored if a prefetch is still running)"""
+    if not is_enabled() or _running.is_set():
+        return
+    _running.set()
+    _executor.submit(_run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what would be prefetched on wake at a given time.")
+    parser.add_argument('--log', default=HISTORY_PATH)
+    parser.add_argument('--at', help="Local time, e.g. '2024-06-03 08:00' (default: now)")
+    args = parser.parse_args(argv)
+    when = datetime.fromisoformat(args.at) if args.at else datetime.now()
+    shares, support = score_modules(get_history(args.log), when)
+    print(f"{when:%A %H:%M}: {support:.1f} weighted turns around this time")
+    for module, share in sorted(shares.items(), key=lambda item: -item[1]):
+        marker = " (prefetched)" if module in plan(when, args.log) else ""
+        print(f"  {module:<12} {share:.0%}{marker}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
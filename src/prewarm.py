@@ -0,0 +1,103 @@
+# prewarm.py
+# Pipeline pre-warming at speech onset
+# As soon as the user starts talking we know a transcription, an LLM call and a TTS call follow within seconds.
+# start() runs the cold-start work in the background while the user is still speaking:
+#   - opens/refreshes pooled keep-alive connections to the chat and TTS endpoints
+#   - parses and caches the prompt assets (static prefix, memory, command index, intent grammar)
+#   - pages the Whisper weights back into memory
+# finish_turn() is called at end of speech and reports how much of that cost was taken off the critical path.
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import log, get_settings, load_asset, record_metric
+
+CONNECTION_REFRESH_SECONDS = 20  # Re-check connections idle for longer than this (servers drop idle keep-alives)
+CHAT_TTS_CONNECTIONS = 2         # The chat stream and the first TTS request run concurrently
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+_state_lock = threading.Lock()
+_turn = None  # {"started": perf_counter, "costs": {step: seconds}, "done": Event}
+_last_warm = {}  # host label -> time.time() of the last warm-up
+
+
+def _warm_connections(costs):
+    from http_client import warm_connections, get_provider
+    now = time.time()
+    chat, tts = get_provider("chat"), get_provider("tts")
+    if chat["base_url"] == tts["base_url"]:
+        targets = [(chat["name"], f"{chat['base_url']}/models", chat["headers"], CHAT_TTS_CONNECTIONS)]
+    else:
+        targets = [(provider["name"], f"{provider['base_url']}/models", provider["headers"], 1) for provider in (chat, tts)]
+    if (get_settings() or {}).get('emotional-voice', False):
+        targets.append(("elevenlabs", "https://api.elevenlabs.io/v1/models",
+                        {"xi-api-key": os.getenv('ELEVENLABS_API_KEY', '')}, 1))
+    seconds = 0.0
+    for name, url, headers, count in targets:
+        if now - _last_warm.get(name, 0) < CONNECTION_REFRESH_SECONDS:
+            continue
+        seconds += warm_connections(url, count=count, headers=headers, label=f"prewarm/{name}")
+        _last_warm[name] = time.time()
+    costs["connections"] = seconds
+
+
+def _warm_assets(costs):
+    start = time.perf_counter()
+    from prompt_builder import get_static_prefix
+    from command_selector import score_commands
+    from intent_router import normalize
+    get_static_prefix()
+    load_asset('memory.json')
+    score_commands("")
+    normalize("")
+    costs["assets"] = time.perf_counter() - start
+
+
+def _warm_model(costs):
+    start = time.perf_counter()
+    settings = get_settings() or {}
+    if not settings.get('transcription-workers'):
+        from transcribe import load_whisper_model, get_engine_model_names
+        from model_cache import page_in
+        for name in get_engine_model_names():
+            model = load_whisper_model(name)
+            if model is not None:
+                page_in(model)
+    costs["model"] = time.perf_counter() - start
+
+
+def _run(turn):
+    for step in (_warm_connections, _warm_assets, _warm_model):
+        try:
+            step(turn["costs"])
+        except Exception as e:
+            log(f"Pre-warm step {step.__name__} failed: {e}", "ERROR", script="prewarm.py")
+    turn["done"].set()
+
+
+def start():
+    """Kick off pre-warming for the turn that just started (non-blocking; ignored if one is still running)"""
+    global _turn
+    with _state_lock:
+        if _turn is not None and not _turn["done"].is_set():
+            return
+        _turn = {"started": time.perf_counter(), "costs": {}, "done": threading.Event()}
+        turn = _turn
+    _executor.submit(_run, turn)
+
+
+def finish_turn():
+    """Log and record the warm-up time that overlapped the user's speech for the current turn"""
+    global _turn
+    with _state_lock:
+        turn, _turn = _turn, None
+    if turn is None:
+        return 0.0
+    costs = dict(turn["costs"])  # Only the steps finished before end of speech were overlapped
+    saved = sum(costs.values())
+    record_metric("prewarm_saved_s", saved)
+    status = "" if turn["done"].is_set() else " (still running at end of speech)"
+    log(f"Pre-warm took ~{saved * 1000:.0f}ms off the turn{status}: "
+        + ", ".join(f"{step} {seconds * 1000:.0f}ms" for step, seconds in costs.items()), "TIMING")
+    return saved
@@ -0,0 +1,121 @@
+# prompt_builder.py
+# Assembles the main/reprompt prompt from cached assets
+# The prompt is the same JSON object as before, but its static part (guidelines, command schemas, settings)
+# is serialized once per asset change and always comes first, so provider-side prompt caching can reuse it.
+# Only the dynamic part (temp artifacts from temp_manifest.py, memory summary, recent exchanges, exchanges recalled
+# by vector_memory.py, context, time, user text) is serialized on every turn, after tokens.py has trimmed it to the prompt-token-budget
+# setting.
+# With command subsetting on (command-subset-top-k > 0), the commands leave the prefix and the relevant
+# schemas chosen by command_selector.py are sent first in the per-turn part, from cached serializations.
+# Command and settings schemas use the compact encoding from schema_compiler.py unless schema-format is "json".
+# session.py sends the full prompt once per conversation thread, then only the sections that changed.
+
+import json
+import time
+import threading
+from utils import log, load_asset, get_asset_version
+from tokens import count_tokens, apply_token_budget
+from command_selector import select_commands, get_top_k
+from schema_compiler import encode_schemas, get_compact_commands, get_schema_format
+from temp_manifest import select_for_prompt
+from vector_memory import recall_for_prompt
+
+DYNAMIC_KEYS = ("temp_folder", "memory", "recent", "recalled", "context", "unix_time", "user_prompt")
+STATIC_ASSETS = ("baseprompt.json", "commands.json", "settings.json")
+
+_prefix_lock = threading.Lock()
+_prefix_version = None
+_prefix_text = None
+_prefix_tokens = 0
+
+
+def _serialize_member(key, value):
+    return f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}"
+
+
+def get_static_prefix(include_commands=None):
+    """Return the cached opening of the prompt object: every baseprompt key except the dynamic ones.
+    The command schemas are included unless command subsetting is on (or include_commands says otherwise)."""
+    if include_commands is None:
+        include_commands = get_top_k() <= 0
+    return _get_static_prefix(include_commands=include_commands)[0]
+
+
+def _get_static_prefix(include_commands=True):
+    """Return (prefix text, prefix token count), rebuilding both only when a static asset changed"""
+    global _prefix_version, _prefix_text, _prefix_tokens
+    schema_format = get_schema_format()
+    version = tuple(get_asset_version(name) for name in STATIC_ASSETS) + (include_commands, schema_format)
+    with _prefix_lock:
+        if version == _prefix_version:
+            return _prefix_text, _prefix_tokens
+    baseprompt = load_asset('baseprompt.json')
+    static = {key: value for key, value in baseprompt.items() if key not in DYNAMIC_KEYS}
+    commands, settings = encode_schemas(schema_format)
+    if include_commands:
+        static['commands'] = commands
+    else:
+        static.pop('commands', None)
+    static['settings'] = settings
+    text = "{" + ", ".join(_serialize_member(key, value) for key, value in static.items())
+    tokens = count_tokens(text)
+    with _prefix_lock:
+        _prefix_version, _prefix_text, _prefix_tokens = version, text, tokens
+    log(f"Static prompt prefix rebuilt ({len(text):,} chars, {tokens:,} tokens)", "CONTEXT")
+    return text, tokens
+
+
+def build_dynamic_sections(user_text, context=None, commands=None):
+    """Return the per-turn prompt members in the order they are appended"""
+    sections = {}
+    if commands is not None:
+        sections["commands"] = commands
+    sections["temp_folder"] = select_for_prompt(user_text)  # Recent/relevant artifacts from the manifest, no listdir
+    memory = load_asset('memory.json')
+    # The summary only changes when memory.py folds a batch in; the raw tail of exchanges changes every turn
+    sections["memory"] = {"summary": memory.get("summary", "")}
+    sections["recent"] = memory.get("recent", [])
+    # Older exchanges relevant to this request, from the vector store (the newest are in the recent tail)
+    sections["recalled"] = recall_for_prompt(user_text, skip_latest=len(sections["recent"]))
+    if context is not None:
+        sections["context"] = context
+    sections["unix_time"] = int(time.time())
+    sections["user_prompt"] = user_text
+    return sections
+
+
+def build_sections_with_stats(user_text, context=None):
+    """Return (static prefix, dynamic sections, per-section token counts), the sections trimmed to the token budget"""
+    subsetting = get_top_k() > 0
+    prefix, prefix_tokens = _get_static_prefix(include_commands=not subsetting)
+    commands = select_commands(user_text) if subsetting else None
+    if commands is not None:
+        log(f"Commands selected for this turn: {', '.join(cmd['name'] for cmd in commands)}", "CONTEXT")
+        if get_schema_format() == "compact":
+            commands = get_compact_commands(commands)
+    sections = build_dynamic_sections(user_text, context, commands)
+    counts = apply_token_budget(sections, prefix_tokens)
+    counts = {"static_prefix": prefix_tokens, **counts}
+    counts["total"] = sum(counts.values())
+    log("Prompt tokens: " + " | ".join(f"{key} {value:,}" for key, value in counts.items()), "CONTEXT")
+    return prefix, sections, counts
+
+
+def render_sections(sections, prefix="{"):
+    """Serialize sections as the members of a prompt object opened by prefix"""
+    text = prefix
+    for key, value in sections.items():
+        text += ("" if text == "{" else ", ") + _serialize_member(key, value)
+    return text + "}"
+
+
+def build_prompt_with_stats(user_text, context=None):
+    """Return (prompt, per-section token counts). The prompt is the cached static prefix followed by the
+    dynamic sections, trimmed to the token budget."""
+    prefix, sections, counts = build_sections_with_stats(user_text, context)
+    return render_sections(sections, prefix), counts
+
+
+def build_prompt(user_text, context=None):
+    """Return the full prompt: cached static prefix followed by the serialized dynamic sections"""
+    return build_prompt_with_stats(user_text, context)[0]
@@ -0,0 +1,113 @@
+# remote_transcribe.py
+# Client engine for transcribe_server.py worker nodes on the LAN
+# Workers come from the transcription-workers setting (or the TRANSCRIPTION_WORKERS env var, comma-separated).
+# Each utterance goes to the least-loaded reachable worker; transcribe.py falls back to local decoding when none answers.
+# The workers' /health endpoints are polled in parallel, so ranking costs at most one HEALTH_TIMEOUT per utterance.
+
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from utils import log, get_settings, record_metric
+
+HEALTH_TIMEOUT = 0.3        # Seconds to wait for a worker's /health answer
+TRANSCRIBE_TIMEOUT = 30     # Seconds to wait for a remote decode
+DOWN_COOLDOWN = 30          # Seconds before retrying a worker that failed
+MAX_HEALTH_MISSES = 3       # Consecutive missed health polls before a worker is marked down (one only skips it)
+HEALTH_POLL_THREADS = 8     # Workers polled at the same time
+
+_pending = {}               # worker url -> requests sent by this process and not answered yet
+_down_until = {}            # worker url -> time.time() until which the worker is skipped
+_health_misses = {}         # worker url -> consecutive health polls it did not answer
+_lock = threading.Lock()
+_health_executor = ThreadPoolExecutor(max_workers=HEALTH_POLL_THREADS, thread_name_prefix="worker-health")
+
+
+def get_workers():
+    """Return the configured worker base URLs"""
+    settings = get_settings() or {}
+    workers = settings.get('transcription-workers') or os.getenv('TRANSCRIPTION_WORKERS', '')
+    if isinstance(workers, str):
+        workers = [w.strip() for w in workers.split(',')]
+    return [w.rstrip('/') for w in workers if w]
+
+
+def _mark_down(worker, reason):
+    with _lock:
+        _down_until[worker] = time.time() + DOWN_COOLDOWN
+    log(f"Transcription worker {worker} unavailable ({reason}). Skipping it for {DOWN_COOLDOWN}s.", "ERROR", script="remote_transcribe.py")
+
+
+def _worker_load(worker):
+    """Return the worker's reported in-flight count plus our own pending requests, or None if unreachable"""
+    try:
+        response = requests.get(f"{worker}/health", timeout=HEALTH_TIMEOUT)
+        response.raise_for_status()
+        reported = int(response.json().get('in_flight', 0))
+    except Exception as e:
+        with _lock:
+            misses = _health_misses.get(worker, 0) + 1
+            _health_misses[worker] = 0 if misses >= MAX_HEALTH_MISSES else misses
+        if misses >= MAX_HEALTH_MISSES:
+            _mark_down(worker, f"{misses} health polls missed, last: {e}")
+        else:
+            log(f"Transcription worker {worker} missed a health poll ({e}); skipped for this utterance", "TRANSCRIPTION")
+        return None
+    with _lock:
+        _health_misses[worker] = 0
+        return reported + _pending.get(worker, 0)
+
+
+def rank_workers(workers):
+    """Return reachable workers ordered from least to most loaded"""
+    now = time.time()
+    with _lock:
+        candidates = [worker for worker in workers if _down_until.get(worker, 0) <= now]
+    if not candidates:
+        return []
+    start = time.perf_counter()
+    loads = [(load, worker) for load, worker in zip(_health_executor.map(_worker_load, candidates), candidates)
+             if load is not None]
+    record_metric("worker_health_poll_s", time.perf_counter() - start)
+    return [worker for _, worker in sorted(loads)]
+
+
+def transcribe_remote(audio_path):
+    """Send an audio file to the least-loaded worker. Returns the text, or None if no worker could transcribe it."""
+    workers = get_workers()
+    if not workers or not isinstance(audio_path, str):
+        return None
+    try:
+        with open(audio_path, 'rb') as f:
+            audio_bytes = f.read()
+    except Exception as e:
+        log(f"Could not read audio for remote transcription: {e}", "ERROR", script="remote_transcribe.py")
+        return None
+    suffix = os.path.splitext(audio_path)[1] or '.wav'
+    for worker in rank_workers(workers):
+        with _lock:
+            _pending[worker] = _pending.get(worker, 0) + 1
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                f"{worker}/transcribe",
+                data=audio_bytes,
+                headers={"Content-Type": "application/octet-stream", "X-Audio-Suffix": suffix},
+                timeout=TRANSCRIBE_TIMEOUT,
+            )
+            response.raise_for_status()
+            body = response.json()
+            elapsed = time.perf_counter() - start
+            record_metric("remote_transcribe_s", elapsed)
+            log(f"Remote transcription by {worker} ({body.get('model')}) in {elapsed:.2f}s "
+                f"(decode {body.get('elapsed_s', 0):.2f}s)", "TRANSCRIPTION")
+            return body.get('text', '')
+        except Exception as e:
+            _mark_down(worker, f"{e}\n{traceback.format_exc()}")
+        finally:
+            with _lock:
+                _pending[worker] -= 1
+    log("No transcription worker reachable. Falling back to local decoding.", "TRANSCRIPTION")
+    return None
@@ -0,0 +1,249 @@
+# resilience.py
+# Tail-latency and failure handling for the LLM call of a turn
+#   - Deadlines: the first token must arrive within llm-first-token-deadline seconds and the whole response
+#     within llm-turn-deadline seconds, otherwise the turn is abandoned instead of hanging.
+#   - Hedging: if the first token has not arrived after the p95 of recent first-token latencies, a duplicate
+#     request is sent; the first stream to produce a token wins and the other one is cancelled (its connection
+#     is closed).
+#   - Circuit breaker: after repeated provider failures, requests fail immediately for a cool-down period and
+#     the user hears a cached "I'm having trouble" clip instead of silence.
+# Try it against the local fake server (see fake_openai_server.py):
+#   python src/fake_openai_server.py --slow-rate 0.3 --slow-delay 8 --error-rate 0.2
+#   VOCAL_PROVIDER=mock python src/main.py
+
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+from utils import log, get_settings, record_metric, get_metric_summary
+
+DEFAULT_FIRST_TOKEN_DEADLINE = 10.0
+DEFAULT_TURN_DEADLINE = 45.0
+DEFAULT_HEDGE_DELAY = 3.0       # Used until enough first-token samples exist
+MIN_HEDGE_SAMPLES = 20
+HEDGE_DELAY_BOUNDS = (0.5, 8.0)
+BREAKER_FAILURE_THRESHOLD = 3   # Consecutive failures that open the circuit
+BREAKER_COOLDOWN = 30.0         # Seconds before a trial request is let through
+FIRST_TOKEN_METRIC = "llm_first_token_s"  # Recorded by resilient_chat_stream for main-turn requests only
+
+TROUBLE_TEXT = "Sorry, I'm having trouble reaching my brain right now. Please try again in a moment."
+TROUBLE_CLIP_PATH = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'vocal_computer', 'trouble.mp3')
+TEMP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../temp'))
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open (one trial request) after the cool-down"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half-open"
+                self._trial_in_flight = False
+            if self.state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                log(f"Circuit '{self.name}' closed: provider is answering again", "API")
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+                log(f"Circuit '{self.name}' opened after {self.failures} failures; "
+                    f"failing fast for {self.cooldown:.0f}s", "ERROR", script="resilience.py")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name="openai"):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def _setting_seconds(key, default):
+    settings = get_settings() or {}
+    try:
+        return float(settings.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_hedge_delay():
+    """p95 of recent first-token latencies, so roughly one turn in twenty gets hedged. Header TTFBs would be
+    too low (headers come before the first token) and include summarization and reprompt requests."""
+    summary = get_metric_summary(FIRST_TOKEN_METRIC)
+    if not summary or summary["count"] < MIN_HEDGE_SAMPLES:
+        return DEFAULT_HEDGE_DELAY
+    low, high = HEDGE_DELAY_BOUNDS
+    return min(high, max(low, summary["p95"]))
+
+
+async def _cancel(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _abandon(stream, task):
+    """Cancel a losing attempt and close its stream, which closes its HTTP response and frees its pump thread"""
+    await _cancel(task)
+    await stream.aclose()
+
+
+async def _first_delta(attempts, deadline):
+    """Wait for the first attempt to produce a delta. attempts: list of (stream, pending __anext__ task).
+    Returns the winning (stream, first delta) and cancels the others, or None if all fail or the deadline
+    passes (attempts still pending are left in the list)."""
+    loop = asyncio.get_running_loop()
+    while attempts:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        done, _ = await asyncio.wait([task for _, task in attempts], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for stream, task in list(attempts):
+            if task not in done:
+                continue
+            attempts.remove((stream, task))
+            if task.exception() is None:
+                for other_stream, other in attempts:
+                    await _abandon(other_stream, other)
+                return stream, task.result()
+    return None
+
+
+async def resilient_chat_stream(payload, status=None):
+    """Async iterator over the text deltas of a chat completion with deadline, hedging and circuit breaker.
+    Ends early (yielding nothing more) on failure; status["error"] then says why.
+    Tool calls requested by the winning stream are collected in status["tool_calls"] (see tool_loop.py)."""
+    from http_client import stream_chat_content_async, get_provider
+    status = {} if status is None else status
+    breaker = get_breaker(get_provider("chat")["name"])
+    if not breaker.allow():
+        status["error"] = "circuit open"
+        log(f"Circuit '{breaker.name}' is open: skipping the request", "ERROR", script="resilience.py")
+        return
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first_token_deadline = start + _setting_seconds('llm-first-token-deadline', DEFAULT_FIRST_TOKEN_DEADLINE)
+    turn_deadline = start + _setting_seconds('llm-turn-deadline', DEFAULT_TURN_DEADLINE)
+    hedge_delay = get_hedge_delay()
+
+    tool_calls = {}  # stream -> the tool calls it streamed
+
+    def open_stream():
+        calls = {}
+        stream = stream_chat_content_async(payload, tool_calls=calls)
+        tool_calls[stream] = calls
+        return stream, asyncio.ensure_future(stream.__anext__())
+
+    attempts = [open_stream()]
+    winner = await _first_delta(attempts, min(first_token_deadline, start + hedge_delay))
+    if winner is None and attempts and loop.time() < first_token_deadline:
+        # The primary is still pending past the hedge delay: race a duplicate against it. A primary that already
+        # failed (HTTP error, empty stream) is not retried blindly, which would double the load on a failing provider.
+        attempts.append(open_stream())
+        hedge = attempts[-1][0]
+        log(f"No first token after {loop.time() - start:.2f}s (hedge delay {hedge_delay:.2f}s): sending hedged request", "API")
+        record_metric("llm_hedged", 1.0)
+        winner = await _first_delta(attempts, first_token_deadline)
+        if winner is not None:
+            log(f"{'Hedged' if winner[0] is hedge else 'Primary'} request won", "API")
+    if winner is None:
+        timed_out = bool(attempts)  # Attempts still pending at the deadline; none left means all of them failed
+        for stream, task in attempts:
+            await _abandon(stream, task)
+        breaker.record_failure()
+        if timed_out:
+            status["error"] = "no response before the first-token deadline"
+            log(f"No first token within {first_token_deadline - start:.1f}s: abandoning the request", "ERROR", script="resilience.py")
+        else:
+            status["error"] = "request failed"
+            log(f"Request failed after {loop.time() - start:.2f}s without a first token", "ERROR", script="resilience.py")
+        return
+    stream, delta = winner
+    status["tool_calls"] = tool_calls[stream]
+    breaker.record_success()
+    record_metric("llm_first_token_s", loop.time() - start)
+    yield delta
+    try:
+        while True:
+            timeout = turn_deadline - loop.time()
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+            try:
+                delta = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            yield delta
+    except asyncio.TimeoutError:
+        status["error"] = "turn deadline exceeded"
+        log(f"Response still streaming after {turn_deadline - start:.1f}s: cutting the turn short", "ERROR", script="resilience.py")
+    finally:
+        await stream.aclose()
+
+
+def ensure_trouble_clip():
+    """Synthesize the fallback clip once while the provider is healthy, so it can play when it is not"""
+    if os.path.exists(TROUBLE_CLIP_PATH):
+        return True
+    try:
+        from modules.speak import chatgpt_text_to_speech
+        response = chatgpt_text_to_speech(TROUBLE_TEXT)
+        if response is None:
+            return False
+        os.makedirs(os.path.dirname(TROUBLE_CLIP_PATH), exist_ok=True)
+        temp_path = TROUBLE_CLIP_PATH + ".tmp"
+        with open(temp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+        os.replace(temp_path, TROUBLE_CLIP_PATH)
+        log(f"Cached fallback clip at {TROUBLE_CLIP_PATH}", "SYSTEM")
+        return True
+    except Exception as e:
+        log(f"Could not cache the fallback clip: {e}", "ERROR", script="resilience.py")
+        return False
+
+
+def play_trouble_clip():
+    """Tell the user the provider is failing, without any network call"""
+    from sounds import queue_speech, play_sound_effect
+    if os.path.exists(TROUBLE_CLIP_PATH):
+        # The speech worker deletes what it plays, so queue a copy
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix='.mp3', dir=TEMP_DIR)
+        os.close(fd)
+        shutil.copyfile(TROUBLE_CLIP_PATH, path)
+        queue_speech(path, time.time())
+    else:
+        play_sound_effect(os.path.join(os.path.dirname(__file__), '../assets/close.wav'))
+    log("Played the provider-trouble fallback", "ERROR", script="resilience.py")
@@ -0,0 +1,176 @@
+# response_cache.py
+# Response cache for repeated queries ("what's the weather", "what's on my agenda today")
+# The command array the LLM produced is stored under the normalized transcript plus a hash of the context it
+# depends on (settings, date and, for conversational answers, the memory summary and hour). A hit replays the cached
+# array directly instead of calling the LLM. Each module has its own TTL; responses using a module without a TTL are
+# not cached, and neither are speak-only replies ("yes", "what time is it", "thanks"), which only make sense in the
+# moment and conversation they were given in. Any settings change clears the cache. Fuzzy matching on character
+# trigrams is optional.
+#
+# Plans that fetch data and reprompt (weather, news, agenda, screenshot...) still run the fetch on replay,
+# so their answer stays fresh; only the first LLM round trip is skipped.
+
+import json
+import time
+import hashlib
+import datetime
+import threading
+from utils import log, load_asset, get_asset_version, get_settings, record_metric
+from intent_router import normalize
+
+# Seconds a cached response using each module stays valid. Modules not listed are never cached.
+MODULE_TTLS = {
+    "speak": 3600,
+    "exit": 3600,
+    "weather": 900,
+    "news": 1800,
+    "agenda": 300,
+    "screenshot": 3600,
+    "clipboard": 3600,
+    "reprompt": 3600,
+    "browse": 3600,
+    "spotify": 3600,
+    "wait": 3600,
+}
+# Responses whose commands besides speak are only these modules re-read their data on replay and do not depend
+# on the memory summary
+MEMORY_FREE_MODULES = ("weather", "news", "agenda", "screenshot", "clipboard", "reprompt")
+FUZZY_THRESHOLD = 0.85
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_entries = {}  # key -> {"content", "expires", "text", "trigrams", "context"}
+_settings_version = None
+_stats = {"hits": 0, "misses": 0}
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _memory_summary():
+    """The summary text only changes when memory.py folds a batch in, unlike memory.json, rewritten every turn"""
+    try:
+        memory = load_asset('memory.json')
+    except (FileNotFoundError, ValueError):
+        return ""
+    return memory.get("summary", "") if isinstance(memory, dict) else str(memory)
+
+
+def _context_hash(with_memory):
+    parts = [get_asset_version('settings.json'), datetime.date.today().isoformat()]
+    if with_memory:
+        parts.extend([_memory_summary(), datetime.datetime.now().hour])
+    return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _check_settings_version():
+    """Drop every entry when settings.json changed since the last lookup"""
+    global _settings_version
+    version = get_asset_version('settings.json')
+    with _lock:
+        if version == _settings_version:
+            return
+        if _settings_version is not None and _entries:
+            log(f"Settings changed: response cache cleared ({len(_entries)} entries)", "CONTEXT")
+        _entries.clear()
+        _settings_version = version
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('response-cache', True))
+
+
+def is_fuzzy_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('response-cache-fuzzy', False))
+
+
+def _cache_policy(content):
+    """Return (ttl seconds, memory dependent) for a response, or None if it must not be cached"""
+    try:
+        response = json.loads(content)
+    except Exception:
+        return None
+    if not isinstance(response, list) or not response:
+        return None
+    modules = [c.get('module') for c in response if isinstance(c, dict)]
+    if len(modules) != len(response) or any(MODULE_TTLS.get(m, 0) <= 0 for m in modules):
+        return None
+    actions = [m for m in modules if m != "speak"]
+    if not actions:
+        return None  # A spoken-only answer depends on the moment and the conversation
+    ttl = min(MODULE_TTLS[m] for m in modules)
+    return ttl, not all(m in MEMORY_FREE_MODULES for m in actions)
+
+
+def lookup(user_text):
+    """Return the cached command array (JSON text) for this transcript, or None"""
+    if not is_enabled():
+        return None
+    _check_settings_version()
+    text = normalize(user_text)
+    if not text:
+        return None
+    now = time.time()
+    contexts = {_context_hash(False), _context_hash(True)}
+    with _lock:
+        for key in [k for k, e in _entries.items() if e["expires"] <= now]:
+            del _entries[key]
+        entry = None
+        for context in contexts:
+            entry = _entries.get((text, context))
+            if entry:
+                break
+        similarity = 1.0
+        if entry is None and is_fuzzy_enabled():
+            trigrams = _trigrams(text)
+            scored = [(_similarity(trigrams, e["trigrams"]), e) for e in _entries.values() if e["context"] in contexts]
+            if scored:
+                similarity, best = max(scored, key=lambda item: item[0])
+                entry = best if similarity >= FUZZY_THRESHOLD else None
+        if entry is None:
+            _stats["misses"] += 1
+        else:
+            _stats["hits"] += 1
+        hits, total = _stats["hits"], _stats["hits"] + _stats["misses"]
+    record_metric("response_cache_hit", 1.0 if entry else 0.0)
+    if entry is None:
+        return None
+    match = "exact" if similarity == 1.0 else f"fuzzy {similarity:.2f} with '{entry['text']}'"
+    log(f"Response cache hit ({match}), hit rate {hits}/{total}", "CONTEXT")
+    return entry["content"]
+
+
+def store(user_text, content):
+    """Cache an LLM response if every module it uses has a TTL"""
+    if not is_enabled() or not content:
+        return
+    policy = _cache_policy(content)
+    text = normalize(user_text)
+    if policy is None or not text:
+        return
+    ttl, with_memory = policy
+    _check_settings_version()
+    context = _context_hash(with_memory)
+    with _lock:
+        if len(_entries) >= MAX_ENTRIES:
+            del _entries[min(_entries, key=lambda k: _entries[k]["expires"])]
+        _entries[(text, context)] = {
+            "content": content,
+            "expires": time.time() + ttl,
+            "text": text,
+            "trigrams": _trigrams(text),
+            "context": context,
+        }
+
+
+def clear():
+    with _lock:
+        _entries.clear()
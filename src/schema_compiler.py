@@ -0,0 +1,281 @@
+# schema_compiler.py
+# Compact wire encoding for the command and settings schemas
+# commands.json and settings.json are compiled into one line per command / setting, e.g.
+#   screenshot(monitorId:int[0=main, 1=secondary], filename:str!): Capture monitor screenshot to /temp...
+#   voice-speed=1: Controls the speed of the assistant's voice (0.5 to 2.0).
+# The usage examples, module file names and JSON key names are dropped. Each compiled line is cached and only
+# rebuilt when its source file changes. The schema-format setting ("compact" or "json") picks the encoding.
+# Settings marked "internal" (performance tuning) are neither sent to the model nor changeable by it.
+# The same arg specs also compile to a JSON schema of the response, {"commands": [command, ...]}, sent as the
+# structured-output response format (structured-output setting) so the model cannot produce anything else.
+#
+# Benchmark on the FINE_TUNING_TESTS examples:
+#   python src/schema_compiler.py [--accuracy]
+
+import re
+import json
+import time
+import argparse
+import threading
+from utils import log, load_asset, get_asset_version, get_settings
+
+DEFAULT_SCHEMA_FORMAT = "compact"
+COMMANDS_HEADER = ('Format: module(arg:type, ...): description. "!" = required, a|b = allowed values, [...] = notes. '
+                   'Call as { "module": module, "args": { arg: value } }.')
+TYPE_ALIASES = {"string": "str", "integer": "int", "boolean": "bool"}
+JSON_SCHEMA_TYPES = {"string": "string", "str": "string", "int": "integer", "integer": "integer",
+                     "float": "number", "number": "number", "bool": "boolean", "boolean": "boolean"}
+RESPONSE_KEY = "commands"  # Structured output must be an object, so the command array is wrapped in this key
+# Setting description sentences kept besides the first one
+CONSTRAINT_SENTENCE = re.compile(r"\b(must|only|strictly)\b", re.IGNORECASE)
+
+_cache_lock = threading.Lock()
+_commands_version = None
+_command_lines = {}
+_settings_version = None
+_settings_lines = []
+_response_schema_version = None
+_response_schema = None
+
+
+def _compile_arg(name, spec):
+    """Turn an arg spec such as "string (required - file to save data)" into "filename:str![file to save data]" """
+    spec = str(spec).strip()
+    match = re.match(r"^([\w|]+)\s*(.*)$", spec)
+    if not match:
+        return f"{name}:{spec}"
+    base, rest = match.groups()
+    arg_type = "|".join(TYPE_ALIASES.get(t, t) for t in base.split("|"))
+    required = False
+    notes = []
+    for part in re.split(r"\s+-\s+", rest.replace("(", " ").replace(")", " ").strip()):
+        part = part.strip()
+        if not part or part.lower() == "optional":
+            continue
+        if part.lower() == "required":
+            required = True
+        elif re.fullmatch(r"\w+(\|\w+)+", part):
+            arg_type = part  # Enumerated values replace the base type
+        else:
+            notes.append(part)
+    compiled = f"{name}:{arg_type}{'!' if required else ''}"
+    if notes:
+        compiled += f"[{' - '.join(notes)}]"
+    return compiled
+
+
+def arg_json_schema(spec, nullable=False):
+    """JSON schema of an arg spec: its type, and its allowed values when they are listed ("string (get|set)").
+    With nullable, optional args also accept null (strict structured output requires every property)."""
+    spec = str(spec).strip()
+    match = re.match(r"^([\w|]+)\s*(.*)$", spec)
+    base, rest = match.groups() if match else ("string", spec)
+    types = list(dict.fromkeys(JSON_SCHEMA_TYPES.get(t, "string") for t in base.split("|")))
+    values = re.search(r"\(\s*(\w+(?:\|\w+)+)\s*(?:\)|\s-\s)", rest)
+    enum = values.group(1).split("|") if values and types == ["string"] else None
+    if nullable and not re.search(r"\brequired\b(?!\s+for)", rest, re.IGNORECASE):
+        types.append("null")
+        enum = enum + [None] if enum else None
+    schema = {"type": types[0] if len(types) == 1 else types}
+    if enum:
+        schema["enum"] = enum
+    return schema
+
+
+def compile_command_schema(command):
+    """Strict JSON schema of one command object: the module name and all of its args (optional ones nullable)"""
+    args = command.get('args') or {}
+    return {
+        "type": "object",
+        "properties": {
+            "module": {"type": "string", "enum": [command['name']]},
+            "args": {
+                "type": "object",
+                "properties": {name: arg_json_schema(spec, nullable=True) for name, spec in args.items()},
+                "required": list(args),
+                "additionalProperties": False,
+            },
+        },
+        "required": ["module", "args"],
+        "additionalProperties": False,
+    }
+
+
+def get_response_schema():
+    """Return the JSON schema of a whole response, rebuilt only when commands.json changes.
+    It always covers every command, so the provider compiles and caches a single schema."""
+    global _response_schema_version, _response_schema
+    version = get_asset_version('commands.json')
+    with _cache_lock:
+        if version == _response_schema_version:
+            return _response_schema
+    commands = load_asset('commands.json').get('commands', [])
+    schema = {
+        "type": "object",
+        "properties": {RESPONSE_KEY: {"type": "array", "items": {"anyOf": [compile_command_schema(c) for c in commands]}}},
+        "required": [RESPONSE_KEY],
+        "additionalProperties": False,
+    }
+    with _cache_lock:
+        _response_schema_version, _response_schema = version, schema
+    log(f"Compiled the response schema for {len(commands)} commands", "CONTEXT")
+    return schema
+
+
+def get_response_format():
+    """Return the response_format for chat requests, or None when structured output is off"""
+    settings = get_settings() or {}
+    if not settings.get('structured-output', True):
+        return None
+    return {"type": "json_schema", "json_schema": {"name": "commands", "strict": True, "schema": get_response_schema()}}
+
+
+def compile_command(command):
+    args = ", ".join(_compile_arg(name, spec) for name, spec in (command.get('args') or {}).items())
+    return f"{command['name']}({args}): {command.get('description', '').strip()}"
+
+
+def _condense_description(description):
+    sentences = re.split(r"(?<=[.!?])\s+", description.strip())
+    kept = sentences[:1] + [s for s in sentences[1:] if CONSTRAINT_SENTENCE.search(s)]
+    return " ".join(kept)
+
+
+def compile_setting(setting):
+    value = json.dumps(setting.get('value'), ensure_ascii=False)
+    return f"{setting['setting-id']}={value}: {_condense_description(setting.get('description', ''))}"
+
+
+def _get_command_lines():
+    """Return {command name: compiled line}, recompiled only when commands.json changes"""
+    global _commands_version, _command_lines
+    version = get_asset_version('commands.json')
+    with _cache_lock:
+        if version == _commands_version:
+            return _command_lines
+    lines = {cmd['name']: compile_command(cmd) for cmd in load_asset('commands.json').get('commands', [])}
+    with _cache_lock:
+        _commands_version, _command_lines = version, lines
+    log(f"Compiled {len(lines)} command schemas to the compact format", "CONTEXT")
+    return lines
+
+
+def get_compact_commands(commands=None):
+    """Return the compact encoding (header + one line per command) of the given schemas, or of every command"""
+    lines = _get_command_lines()
+    if commands is None:
+        return [COMMANDS_HEADER] + list(lines.values())
+    return [COMMANDS_HEADER] + [lines.get(cmd['name']) or compile_command(cmd) for cmd in commands]
+
+
+def get_user_settings():
+    """Return the settings of settings.json the user may change (internal tuning settings are left out)"""
+    return [s for s in load_asset('settings.json') if 'setting-id' in s and not s.get('internal')]
+
+
+def get_compact_settings():
+    """Return the compact encoding of the user settings, recompiled only when settings.json changes"""
+    global _settings_version, _settings_lines
+    version = get_asset_version('settings.json')
+    with _cache_lock:
+        if version == _settings_version:
+            return _settings_lines
+    lines = [compile_setting(s) for s in get_user_settings()]
+    with _cache_lock:
+        _settings_version, _settings_lines = version, lines
+    return lines
+
+
+def get_schema_format():
+    settings = get_settings() or {}
+    schema_format = settings.get('schema-format', DEFAULT_SCHEMA_FORMAT)
+    return schema_format if schema_format in ("compact", "json") else DEFAULT_SCHEMA_FORMAT
+
+
+def encode_schemas(schema_format, commands=None):
+    """Return (commands value, settings value) for the prompt in the given format"""
+    if commands is None:
+        commands = load_asset('commands.json').get('commands', [])
+    if schema_format == "compact":
+        return get_compact_commands(commands), get_compact_settings()
+    return commands, get_user_settings()
+
+
+def load_examples(path):
+    """Return [(user text, expected assistant JSON or None)] from a prompt_batch.txt style file"""
+    examples = []
+    pending_user = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("# User:"):
+                pending_user = line[len("# User:"):].strip()
+            elif line.startswith("# Assistant:") and pending_user is not None:
+                examples.append((pending_user, line[len("# Assistant:"):].strip()))
+                pending_user = None
+            elif line and not line.startswith("#"):
+                examples.append((line, None))
+    return examples
+
+
+def _normalize_response(text):
+    try:
+        response = json.loads(text)
+    except Exception:
+        return None
+    if not isinstance(response, list):
+        return None
+    # Spoken wording is free; compare the modules and their non-speech arguments
+    return [(c.get('module'), json.dumps({k: v for k, v in (c.get('args') or {}).items() if c.get('module') != 'speak'},
+                                         sort_keys=True))
+            for c in response if isinstance(c, dict)]
+
+
+def _benchmark_prompt(user_text, schema_format):
+    commands, settings = encode_schemas(schema_format)
+    prompt = {
+        "guidelines": load_asset('baseprompt.json').get('guidelines', []),
+        "commands": commands,
+        "settings": settings,
+        "user_prompt": user_text,
+    }
+    return json.dumps(prompt, ensure_ascii=False)
+
+
+def benchmark(batch_path, accuracy=False):
+    """Compare the token cost of both encodings and, with accuracy=True, the model's exact-match rate on the examples"""
+    from tokens import count_tokens
+    examples = load_examples(batch_path)
+    print(f"Examples: {len(examples)} ({sum(1 for _, e in examples if e)} with an expected response)")
+    token_counts = {}
+    for schema_format in ("json", "compact"):
+        start = time.perf_counter()
+        commands, settings = encode_schemas(schema_format)
+        elapsed = time.perf_counter() - start
+        token_counts[schema_format] = (count_tokens(json.dumps(commands, ensure_ascii=False)),
+                                       count_tokens(json.dumps(settings, ensure_ascii=False)))
+        print(f"{schema_format:>7}: commands {token_counts[schema_format][0]:,} tokens, "
+              f"settings {token_counts[schema_format][1]:,} tokens (encoded in {elapsed * 1000:.2f} ms)")
+    full, compact = sum(token_counts["json"]), sum(token_counts["compact"])
+    print(f"Schema tokens per prompt: {full:,} -> {compact:,} ({(1 - compact / full) * 100:.0f}% fewer)")
+    if not accuracy:
+        return
+    from http_client import chatgpt_text_to_text
+    scored = [(user, expected) for user, expected in examples if expected]
+    for schema_format in ("json", "compact"):
+        matches = 0
+        for user_text, expected in scored:
+            response = chatgpt_text_to_text(prompt=_benchmark_prompt(user_text, schema_format), temperature=0)
+            content = response["choices"][0]["message"]["content"] if response else ""
+            matches += _normalize_response(content) == _normalize_response(expected)
+        print(f"{schema_format:>7}: {matches}/{len(scored)} responses match the expected commands "
+              f"({matches / max(1, len(scored)) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    import os
+    parser = argparse.ArgumentParser(description="Benchmark the compact schema encoding against the JSON one.")
+    parser.add_argument('--batch', default=os.path.join(os.path.dirname(__file__), '../FINE_TUNING_TESTS/prompt_batch.txt'))
+    parser.add_argument('--accuracy', action='store_true', help="Also query the model on each example (needs OPENAI_API_KEY)")
+    args = parser.parse_args()
+    benchmark(args.batch, args.accuracy)
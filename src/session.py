@@ -0,0 +1,124 @@
+# session.py
+# Conversation thread of an awake period
+# The first LLM turn after waking sends the full prompt (static prefix, commands, memory, temp files...). Later turns
+# continue the same locally kept thread of messages and add one user message holding only what changed: the new
+# request and time, the command schemas and recent exchanges not sent yet, and temp files or the memory summary when
+# they differ. Exchanges of the thread itself are already in it as messages, so they are never sent again. The
+# earlier messages are an unchanged prefix, so the provider's prompt cache serves them instead of a rebuilt context.
+# The thread restarts with the full prompt on wake, after a failed or invalid response, when the static prompt
+# changes, and when it grows past MAX_THREAD_TURNS or the prompt-token-budget.
+
+import json
+import threading
+from utils import log, get_settings, record_metric
+
+MAX_THREAD_TURNS = 8
+ALWAYS_SENT = ("unix_time", "user_prompt")
+ITEMIZED = ("commands", "recent")  # List sections whose new items alone are sent
+
+_lock = threading.Lock()
+_generation = 0   # Bumped on every reset, so a turn started on an old thread is not recorded into a new one
+_thread = []      # user/assistant messages of the current thread
+_thread_tokens = 0
+_prefix = None    # Static prefix the thread was opened with
+_sent = {}        # section -> serialized value last sent in the thread
+_sent_items = set()  # Serialized command schemas and exchanges already in the thread
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('conversation-thread', True))
+
+
+def reset(reason):
+    """Drop the thread: the next turn sends the full context"""
+    global _generation, _thread, _thread_tokens, _prefix, _sent, _sent_items
+    with _lock:
+        if _thread:
+            log(f"Conversation thread reset ({reason}) after {len(_thread) // 2} turns", "CONTEXT")
+        _generation += 1
+        _thread, _thread_tokens, _prefix, _sent, _sent_items = [], 0, None, {}, set()
+
+
+def _serialized(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _delta_sections(sections):
+    """Return the sections that changed since they were last sent in the thread (caller holds _lock)"""
+    delta = {}
+    for key, value in sections.items():
+        if key in ITEMIZED:
+            new_items = [item for item in value if _serialized(item) not in _sent_items]
+            if new_items:
+                delta[key] = new_items
+        elif key in ALWAYS_SENT or _sent.get(key) != _serialized(value):
+            delta[key] = value
+    return delta
+
+
+def begin_turn(user_text):
+    """Return (messages, turn) for this request. messages ends with the new user message; turn holds the
+    token counts (input_tokens is what is sent, full_tokens what a full prompt would be) for record_turn."""
+    from prompt_builder import build_sections_with_stats, render_sections
+    from tokens import count_tokens, get_token_budget
+    prefix, sections, token_counts = build_sections_with_stats(user_text)
+    full_tokens = token_counts["total"]
+    with _lock:
+        continued = bool(is_enabled() and _thread and prefix == _prefix and len(_thread) // 2 < MAX_THREAD_TURNS)
+        if continued:
+            delta = _delta_sections(sections)
+            content = render_sections(delta)
+            new_tokens = count_tokens(content)
+            continued = _thread_tokens + new_tokens <= get_token_budget()
+        thread = list(_thread) if continued else []
+        thread_tokens = _thread_tokens if continued else 0
+        generation = _generation
+    if not continued:
+        if _thread:
+            reset("thread too long" if prefix == _prefix else "static prompt changed")
+            generation = _generation
+        content = render_sections(sections, prefix)
+        new_tokens = full_tokens
+    message = {"role": "user", "content": content}
+    saved = full_tokens - new_tokens
+    record_metric("session_input_tokens_saved", saved)
+    if continued:
+        log(f"Conversation turn {len(thread) // 2 + 1}: {new_tokens:,} new input tokens instead of a "
+            f"{full_tokens:,}-token full prompt ({thread_tokens:,} tokens of thread reused)", "CONTEXT")
+    turn = {
+        "generation": generation,
+        "user_text": user_text,
+        "message": message,
+        "prefix": prefix,
+        "sections": sections,
+        "token_counts": token_counts,
+        "input_tokens": thread_tokens + new_tokens,
+        "new_tokens": new_tokens,
+        "full_tokens": full_tokens,
+        "continued": continued,
+    }
+    return thread + [message], turn
+
+
+def record_turn(turn, content):
+    """Append the request and its (canonical) answer to the thread, so the next turn can continue it"""
+    global _thread, _thread_tokens, _prefix
+    if not is_enabled():
+        return
+    from tokens import count_tokens
+    reply_tokens = count_tokens(content)
+    with _lock:
+        if turn["generation"] != _generation:
+            return  # The thread was reset while this turn ran
+        if not _thread:
+            _prefix = turn["prefix"]
+        _thread = _thread + [turn["message"], {"role": "assistant", "content": content}]
+        _thread_tokens += turn["new_tokens"] + reply_tokens
+        for key, value in turn["sections"].items():
+            if key in ITEMIZED:
+                _sent_items.update(_serialized(item) for item in value)
+            elif key not in ALWAYS_SENT:
+                _sent[key] = _serialized(value)
+        # The exchange memory.py adds to the recent tail is this very request and answer
+        _sent_items.add(_serialized({"user": turn["user_text"], "assistant": content}))
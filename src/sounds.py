@@ -11,12 +11,14 @@ import threading
 import asyncio
 import time
 from collections import deque
+from utils import log, record_metric
 
 # Global variables
 IS_ASSISTANT_SPEAKING = False
 speech_channel = None
 highest_speech_key = 0
 speech_path_queue = deque()
+turn_start_time = None  # perf_counter() at the end of the user's utterance, cleared once its first audio plays
 
 SOUND_EFFECT_CHANNEL = pygame.mixer.Channel(0)
 SPEECH_CHANNEL_INDEX = 1
@@ -26,6 +28,11 @@ def play_sound_effect(path):
     sound = pygame.mixer.Sound(path)
     SOUND_EFFECT_CHANNEL.play(sound)
 
+# Mark the end of user speech so the first playback after it reports time-to-first-audio
+def mark_turn_start():
+    global turn_start_time
+    turn_start_time = time.perf_counter()
+
 # Speech gateway: manages queue and timestamp logic
 def queue_speech(path, timestamp):
     global highest_speech_key, speech_path_queue
@@ -39,7 +46,7 @@ def queue_speech(path, timestamp):
 
 # Async worker for speech playback
 async def speech_worker():
-    global IS_ASSISTANT_SPEAKING, speech_channel, speech_path_queue
+    global IS_ASSISTANT_SPEAKING, speech_channel, speech_path_queue, turn_start_time
     while True:
         if speech_path_queue:
             path, _ = speech_path_queue.popleft()
@@ -47,6 +54,11 @@ async def speech_worker():
             speech_channel = pygame.mixer.Channel(SPEECH_CHANNEL_INDEX)
             sound = pygame.mixer.Sound(path)
             speech_channel.play(sound)
+            if turn_start_time is not None:
+                ttfa = time.perf_counter() - turn_start_time
+                turn_start_time = None
+                record_metric("time_to_first_audio_s", ttfa)
+                log(f"Time to first audio: {ttfa:.2f}s after end of user speech", "TIMING")
             # Delete the file after playing
             try:
                 if os.path.exists(path):
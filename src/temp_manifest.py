@@ -0,0 +1,133 @@
+# temp_manifest.py
+# In-memory index of the artifacts in /temp (data files, screenshots, clipboard dumps)
+# Modules register what they write (register_artifact) instead of the prompt listing the folder on every turn.
+# The folder is scanned once, for files left over from a previous run; after that the prompt's temp_folder
+# section comes from this index: only recent or relevant entries, newest first, capped by count and tokens,
+# each with its producer module, size and age. Speech clips are transient and never listed.
+
+import os
+import re
+import time
+import threading
+from utils import log, get_settings
+
+TEMP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../temp'))
+TRANSIENT_EXTENSIONS = ('.mp3', '.wav')  # Speech clips, deleted by the speech worker once played
+RECENT_SECONDS = 30 * 60                 # Entries this recent are listed even when the request does not mention them
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_TOKENS = 150
+
+_lock = threading.Lock()
+_entries = None  # file name -> {"module", "size", "modified"}
+
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def _load_locked():
+    """Scan the folder once, for the files written before this run"""
+    global _entries
+    if _entries is not None:
+        return
+    _entries = {}
+    try:
+        with os.scandir(TEMP_DIR) as scan:
+            for item in scan:
+                if item.is_file() and not item.name.lower().endswith(TRANSIENT_EXTENSIONS):
+                    stat = item.stat()
+                    _entries[item.name] = {"module": None, "size": stat.st_size, "modified": stat.st_mtime}
+    except FileNotFoundError:
+        pass
+    log(f"Temp manifest loaded ({len(_entries)} existing artifacts)", "CONTEXT")
+
+
+def register_artifact(path, module):
+    """Record a file a module just wrote to /temp"""
+    name = os.path.basename(path)
+    try:
+        size = os.path.getsize(os.path.join(TEMP_DIR, name))
+    except OSError:
+        size = 0
+    with _lock:
+        _load_locked()
+        _entries[name] = {"module": module, "size": size, "modified": time.time()}
+
+
+def forget_artifact(name):
+    with _lock:
+        if _entries is not None:
+            _entries.pop(os.path.basename(name), None)
+
+
+def clear():
+    """Forget every entry (the folder was emptied)"""
+    global _entries
+    with _lock:
+        _entries = {}
+
+
+def get_entries():
+    with _lock:
+        _load_locked()
+        return {name: dict(meta) for name, meta in _entries.items()}
+
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _format_age(seconds):
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m ago"
+    if seconds < 86400:
+        return f"{seconds / 3600:.0f}h ago"
+    return f"{seconds / 86400:.0f}d ago"
+
+
+def _limits():
+    settings = get_settings() or {}
+    try:
+        max_entries = int(settings.get('temp-manifest-max-entries', DEFAULT_MAX_ENTRIES))
+        max_tokens = int(settings.get('temp-manifest-max-tokens', DEFAULT_MAX_TOKENS))
+    except (TypeError, ValueError):
+        max_entries, max_tokens = DEFAULT_MAX_ENTRIES, DEFAULT_MAX_TOKENS
+    return max_entries, max_tokens
+
+
+def select_for_prompt(user_text=None):
+    """Return the temp_folder lines for this turn: entries that are recent or share a word with the request,
+    most relevant and newest first, within the entry and token caps"""
+    from tokens import count_tokens
+    max_entries, max_tokens = _limits()
+    if max_entries <= 0:
+        return []
+    words = _words(user_text)
+    now = time.time()
+    candidates = []
+    for name, meta in get_entries().items():
+        relevance = len(words & (_words(name) | _words(meta["module"])))
+        if relevance or now - meta["modified"] < RECENT_SECONDS:
+            candidates.append((relevance, meta["modified"], name, meta))
+    candidates.sort(reverse=True)
+    lines = []
+    tokens = 0
+    for _, modified, name, meta in candidates:
+        if len(lines) >= max_entries:
+            break
+        if not os.path.exists(os.path.join(TEMP_DIR, name)):
+            forget_artifact(name)  # Deleted behind our back
+            continue
+        details = ", ".join(part for part in (meta["module"], _format_size(meta["size"]), _format_age(now - modified)) if part)
+        line = f"{name} ({details})"
+        line_tokens = count_tokens(line)
+        if tokens + line_tokens > max_tokens:
+            break
+        lines.append(line)
+        tokens += line_tokens
+    return lines
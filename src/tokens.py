@@ -0,0 +1,119 @@
+# tokens.py
+# Process-wide cached tokenizer and prompt token-budget enforcement
+# Sections are trimmed lowest-priority first (temp listing, recalled exchanges, memory summary, recent exchanges,
+# reprompt context) until the prompt fits the prompt-token-budget setting. The static prefix and the user's words
+# are never trimmed.
+
+import json
+import functools
+from utils import log, get_settings
+
+DEFAULT_MODEL = "gpt-4.1"
+DEFAULT_TOKEN_BUDGET = 12000
+TRIM_PRIORITY = ("temp_folder", "recalled", "memory", "recent", "context")  # Trimmed first -> last
+
+# Cost calculation (as of 2024/2025 pricing) - converted to cents per million tokens
+INPUT_COST_PER_MILLION = 200.0   # 200¢ per million input tokens ($2.00)
+OUTPUT_COST_PER_MILLION = 800.0  # 800¢ per million output tokens ($8.00)
+
+CHARS_PER_TOKEN = 4  # Rough estimate used only when tiktoken is unavailable
+
+
+class _ApproximateEncoding:
+    """Character-based stand-in so budgets still work without tiktoken"""
+    def encode(self, text):
+        return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    """Return the tiktoken encoding for a model, created once per process"""
+    try:
+        import tiktoken
+    except ImportError:
+        log("tiktoken not installed. Token counts are approximate.", "ERROR", script="tokens.py")
+        return _ApproximateEncoding()
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    return len(get_encoding(model).encode(text))
+
+
+def _serialized(value):
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def count_section_tokens(sections, model=DEFAULT_MODEL):
+    """Return {section: token count} for a dict of prompt sections"""
+    return {key: count_tokens(_serialized(value), model) for key, value in sections.items()}
+
+
+def _keep_last_tokens(text, max_tokens, model):
+    """Keep the end of a text (the most recent part for memory summaries)"""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return "..." + encoding.decode(tokens[-max_tokens:])
+
+
+def shrink_section(value, max_tokens, model=DEFAULT_MODEL):
+    """Return a smaller version of a section value that fits in max_tokens"""
+    if isinstance(value, list):
+        items = list(value)
+        while items and count_tokens(_serialized(items), model) > max_tokens:
+            items.pop(0)  # Drop the oldest entries first
+        return items
+    if isinstance(value, str):
+        return _keep_last_tokens(value, max_tokens, model)
+    if isinstance(value, dict):
+        # Shrink the longest text field (e.g. memory "summary") by what the dict is over budget
+        shrunk = dict(value)
+        text_keys = [k for k, v in shrunk.items() if isinstance(v, str)]
+        if not text_keys:
+            return {}
+        longest = max(text_keys, key=lambda k: len(shrunk[k]))
+        overflow = count_tokens(_serialized(shrunk), model) - max_tokens
+        keep = count_tokens(shrunk[longest], model) - overflow
+        shrunk[longest] = _keep_last_tokens(shrunk[longest], keep, model)
+        return shrunk
+    return value
+
+
+def get_token_budget():
+    settings = get_settings() or {}
+    try:
+        return int(settings.get('prompt-token-budget', DEFAULT_TOKEN_BUDGET))
+    except (TypeError, ValueError):
+        return DEFAULT_TOKEN_BUDGET
+
+
+def apply_token_budget(sections, fixed_tokens, budget=None, model=DEFAULT_MODEL):
+    """Trim low-priority sections in place until fixed_tokens + sections fit the budget.
+    Returns the per-section token counts after trimming."""
+    budget = get_token_budget() if budget is None else budget
+    counts = count_section_tokens(sections, model)
+    for key in TRIM_PRIORITY:
+        overflow = fixed_tokens + sum(counts.values()) - budget
+        if overflow <= 0:
+            break
+        if key not in sections:
+            continue
+        before = counts[key]
+        sections[key] = shrink_section(sections[key], max(0, before - overflow), model)
+        counts[key] = count_tokens(_serialized(sections[key]), model)
+        log(f"Prompt over token budget ({budget:,}): trimmed '{key}' from {before:,} to {counts[key]:,} tokens", "CONTEXT")
+    return counts
+
+
+def estimate_cost_cents(input_tokens=0, output_tokens=0):
+    return (input_tokens / 1_000_000) * INPUT_COST_PER_MILLION + (output_tokens / 1_000_000) * OUTPUT_COST_PER_MILLION
@@ -0,0 +1,279 @@
+# tool_loop.py
+# Native tool calling for data queries (weather, news, agenda)
+# Without it a data query takes the file round trip from commands.json: the model calls the module with a
+# filename, then reprompt, which rebuilds and resends the whole prompt with the file attached.
+# When command_selector predicts a data module, the turn instead offers that module as an OpenAI tool. The
+# module returns its data in-process (run(return_data=True), no temp file) and the result goes back as a
+# "tool" message in the same conversation. The follow-up request repeats the first one byte for byte up to
+# the tool messages, so provider-side prompt caching covers everything but the new tokens.
+# Every tool turn logs its round-trip time and the uncached tokens saved against a reprompt; the live
+# comparison of both paths on "what's the weather" turns (works against fake_openai_server.py too):
+#   python src/tool_loop.py [--runs 5] [--model gpt-4.1-mini]
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import importlib
+import threading
+from utils import log, get_settings, get_asset_version, load_asset, record_metric, log_command_execution
+from schema_compiler import arg_json_schema
+
+# Data modules offered as tools: the args and read-only actions the tool exposes
+DATA_TOOLS = {
+    "weather": {"args": ("action", "location"), "actions": ("current", "forecast", "today")},
+    "news": {"args": ("action", "count"), "actions": ("headlines", "tech", "business", "science", "world")},
+    "agenda": {"args": ("action", "query"), "actions": ("today", "week", "month", "list", "search")},
+}
+MAX_TOOL_ROUNDS = 2
+TOOL_INSTRUCTIONS = ("Tools: reading weather, news or the agenda is available as a function tool in this turn. "
+                     "Call the tool to get live data; its result comes back in this conversation. Do not use the "
+                     "filename and reprompt pattern for these modules. Once you have the data, answer with the JSON "
+                     "command array as usual, starting with speak.")
+BENCHMARK_UTTERANCES = ("What's the weather?", "What's the weather like today?", "Is it going to rain this week?")
+BENCHMARK_CONTEXT = "Tristan asked about the weather after downloading current conditions"
+
+_tools_lock = threading.Lock()
+_tools_version = None
+_tool_definitions = {}
+
+
+def is_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('tool-calling', True))
+
+
+def get_tool_definitions():
+    """Return {name: OpenAI tool definition} built from commands.json, rebuilt only when it changes"""
+    global _tools_version, _tool_definitions
+    version = get_asset_version('commands.json')
+    with _tools_lock:
+        if version == _tools_version:
+            return _tool_definitions
+    commands = {cmd['name']: cmd for cmd in load_asset('commands.json').get('commands', [])}
+    definitions = {}
+    for name, spec in DATA_TOOLS.items():
+        command = commands.get(name)
+        if not command:
+            continue
+        args = command.get('args') or {}
+        properties = {arg: {**arg_json_schema(args[arg]), "description": str(args[arg])} for arg in spec["args"] if arg in args}
+        properties["action"] = {"type": "string", "enum": list(spec["actions"])}
+        description = command.get('description', '').split(". ")[0].rstrip(".") + ". Returns the data."
+        definitions[name] = {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description,
+                "parameters": {"type": "object", "properties": properties, "required": ["action"]},
+            },
+        }
+    with _tools_lock:
+        _tools_version, _tool_definitions = version, definitions
+    return definitions
+
+
+def select_tools(user_text):
+    """Return the tool definitions to offer for this transcript (empty when no data module is predicted)"""
+    if not is_enabled():
+        return []
+    from command_selector import select_command_names, get_top_k
+    predicted = select_command_names(user_text or "", top_k=max(get_top_k(), 2)) or set()
+    definitions = get_tool_definitions()
+    tools = [definitions[name] for name in DATA_TOOLS if name in predicted and name in definitions]
+    if tools:
+        log(f"Offering tools: {', '.join(tool['function']['name'] for tool in tools)}", "CONTEXT")
+    return tools
+
+
+def instructions_message():
+    return {"role": "system", "content": TOOL_INSTRUCTIONS}
+
+
+def run_tool(name, arguments):
+    """Run a data module in-process and return its result serialized for a tool message"""
+    from commands import COMMANDS, MODULE_CACHE
+    if name not in DATA_TOOLS or name not in COMMANDS:
+        return json.dumps({"error": f"unknown tool {name}"})
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError as e:
+        return json.dumps({"error": f"invalid arguments ({e.msg})"})
+    args = {key: value for key, value in args.items() if key in DATA_TOOLS[name]["args"]}
+    log_command_execution(name, args)
+    module_key = COMMANDS[name]['module'][:-3]
+    try:
+        if module_key not in MODULE_CACHE:
+            MODULE_CACHE[module_key] = importlib.import_module(module_key)
+        result = MODULE_CACHE[module_key].run(**args, return_data=True)
+    except Exception as e:
+        log(f"Tool {name} failed: {e}", "ERROR", script="tool_loop.py")
+        return json.dumps({"error": str(e)})
+    if result is None:
+        return json.dumps({"error": "no data available"})
+    return result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
+class ToolTurn:
+    """Tool rounds of one turn, with the tokens and time they save compared to a reprompt"""
+
+    def __init__(self, user_text, token_counts):
+        self.user_text = user_text
+        self.token_counts = token_counts
+        self.rounds = 0
+        self.tools_used = []
+        self.new_tokens = 0
+        self.result_tokens = 0
+        self.started = None
+        self.finished = False
+
+    def can_call(self):
+        return self.rounds < MAX_TOOL_ROUNDS
+
+    async def run_calls(self, content, tool_calls):
+        """Run the streamed tool calls; return the assistant and tool messages to append to the conversation"""
+        from tokens import count_tokens
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.rounds += 1
+        calls = [tool_calls[index] for index in sorted(tool_calls)]
+        for i, call in enumerate(calls):
+            call["id"] = call["id"] or f"call_{self.rounds}_{i}"
+        assistant = {
+            "role": "assistant",
+            "content": content or None,
+            "tool_calls": [{"id": call["id"], "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]}} for call in calls],
+        }
+        results = await asyncio.gather(*(asyncio.to_thread(run_tool, call["name"], call["arguments"]) for call in calls))
+        messages = [assistant] + [{"role": "tool", "tool_call_id": call["id"], "content": result}
+                                  for call, result in zip(calls, results)]
+        self.tools_used += [call["name"] for call in calls]
+        result_tokens = sum(count_tokens(result) for result in results)
+        self.result_tokens += result_tokens
+        self.new_tokens += count_tokens(json.dumps(messages, ensure_ascii=False))
+        log(f"Tool round {self.rounds}: {', '.join(call['name'] for call in calls)} returned {result_tokens:,} tokens "
+            f"in {time.perf_counter() - self.started:.2f}s", "COMMAND")
+        return messages
+
+    def reprompt_equivalent_tokens(self):
+        """Uncached input a reprompt would have sent: the dynamic prompt again, the data file and the
+        filename/reprompt commands the model writes first"""
+        from tokens import count_tokens
+        dynamic = self.token_counts.get("total", 0) - self.token_counts.get("static_prefix", 0)
+        commands = [{"module": name, "args": {"action": "current", "filename": f"{name}_data.json"}} for name in self.tools_used]
+        commands.append({"module": "reprompt", "args": {"prompt": self.user_text, "filenames": ",".join(
+            f"{name}_data.json" for name in self.tools_used), "context": BENCHMARK_CONTEXT}})
+        return dynamic + self.result_tokens + count_tokens(json.dumps(commands))
+
+    def finish(self, answered_at=None):
+        """Log and record the round-trip time from the tool call to the answer and the tokens saved"""
+        if not self.rounds or self.finished:
+            return
+        self.finished = True
+        round_trip = (answered_at or time.perf_counter()) - self.started
+        reprompt_tokens = self.reprompt_equivalent_tokens()
+        record_metric("tool_round_trip_s", round_trip)
+        record_metric("tool_tokens_saved", reprompt_tokens - self.new_tokens)
+        log(f"Tool loop ({', '.join(self.tools_used)}): answered {round_trip:.2f}s after the tool call; follow-up sent "
+            f"{self.new_tokens:,} new tokens vs ~{reprompt_tokens:,} uncached for a reprompt "
+            f"({reprompt_tokens - self.new_tokens:,} saved)", "COST")
+
+
+def _message_content(response):
+    try:
+        return response['choices'][0]['message']
+    except (KeyError, IndexError, TypeError):
+        return {}
+
+
+def _reprompt_path(user_text, model):
+    """The legacy flow: commands with a filename, the module writes a temp file, reprompt resends everything"""
+    import os
+    from http_client import chatgpt_text_to_text
+    from prompt_builder import build_prompt_with_stats
+    from tokens import count_tokens
+    from temp_manifest import forget_artifact
+    start = time.perf_counter()
+    prompt, counts = build_prompt_with_stats(user_text)
+    first = _message_content(chatgpt_text_to_text(model=model, messages=[{"role": "user", "content": prompt}]))
+    output_tokens = count_tokens(first.get('content') or "")
+    import commands  # Puts the modules directory on sys.path
+    weather = importlib.import_module(commands.COMMANDS['weather']['module'][:-3])
+    weather.run(action="current", filename="tool_loop_benchmark.json")
+    path = os.path.join(os.path.dirname(__file__), '../temp/tool_loop_benchmark.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = f"\n--- File: tool_loop_benchmark.json ---\n{f.read()}\n"
+        os.remove(path)
+        forget_artifact(path)
+    except OSError:
+        data = ""
+    reprompt, reprompt_counts = build_prompt_with_stats(user_text, context=BENCHMARK_CONTEXT)
+    content = [{"type": "text", "text": reprompt + user_text}, {"type": "text", "text": data}]
+    second = _message_content(chatgpt_text_to_text(model=model, messages=[{"role": "user", "content": content}]))
+    extra_tokens = count_tokens(user_text + data)
+    input_tokens = counts["total"] + reprompt_counts["total"] + extra_tokens
+    # Only the static prefix is shared between the two prompts; the reprompt's dynamic part differs
+    uncached = input_tokens - counts["static_prefix"] - reprompt_counts["static_prefix"]
+    return {"seconds": time.perf_counter() - start, "input": input_tokens, "uncached": uncached,
+            "output": output_tokens + count_tokens(second.get('content') or "")}
+
+
+def _tool_path(user_text, model):
+    """The tool loop: the data comes back as a tool message in the same conversation"""
+    from http_client import chatgpt_text_to_text
+    from prompt_builder import build_prompt_with_stats
+    from tokens import count_tokens
+    start = time.perf_counter()
+    prompt, counts = build_prompt_with_stats(user_text)
+    messages = [instructions_message(), {"role": "user", "content": prompt}]
+    tools = [get_tool_definitions()["weather"]]
+    first_input = count_tokens(json.dumps(messages) + json.dumps(tools))
+    first = _message_content(chatgpt_text_to_text(model=model, messages=messages, tools=tools))
+    output_tokens = count_tokens(json.dumps(first.get('tool_calls') or "") + (first.get('content') or ""))
+    input_tokens, uncached = first_input, first_input - counts["static_prefix"]
+    if first.get('tool_calls'):
+        calls = first['tool_calls']
+        messages.append({"role": "assistant", "content": first.get('content'), "tool_calls": calls})
+        for call in calls:
+            result = run_tool(call['function']['name'], call['function'].get('arguments'))
+            messages.append({"role": "tool", "tool_call_id": call['id'], "content": result})
+        new_tokens = count_tokens(json.dumps(messages[2:], ensure_ascii=False))
+        second = _message_content(chatgpt_text_to_text(model=model, messages=messages, tools=tools))
+        input_tokens += first_input + new_tokens
+        uncached += new_tokens
+        output_tokens += count_tokens(second.get('content') or "")
+    return {"seconds": time.perf_counter() - start, "input": input_tokens, "uncached": uncached, "output": output_tokens}
+
+
+def benchmark(runs=3, model="gpt-4.1-mini"):
+    results = {"reprompt": [], "tool loop": []}
+    for _ in range(runs):
+        for utterance in BENCHMARK_UTTERANCES:
+            results["reprompt"].append(_reprompt_path(utterance, model))
+            results["tool loop"].append(_tool_path(utterance, model))
+    print(f"{runs * len(BENCHMARK_UTTERANCES)} weather turns per path, model {model}")
+    means = {}
+    for path, samples in results.items():
+        means[path] = {key: sum(s[key] for s in samples) / len(samples) for key in ("seconds", "input", "uncached", "output")}
+        m = means[path]
+        print(f"  {path:10s} {m['seconds']:.2f}s, {m['input']:,.0f} input tokens ({m['uncached']:,.0f} uncached), "
+              f"{m['output']:,.0f} output tokens")
+    old, new = means["reprompt"], means["tool loop"]
+    print(f"Saved per turn: {old['seconds'] - new['seconds']:.2f}s, {old['uncached'] - new['uncached']:,.0f} uncached "
+          f"input tokens, {old['output'] - new['output']:,.0f} output tokens")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the tool loop with the reprompt round trip on weather turns.")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--model', default="gpt-4.1-mini")
+    args = parser.parse_args(argv)
+    benchmark(args.runs, args.model)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
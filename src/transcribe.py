@@ -1,21 +1,33 @@
 # transcribe.py
 # Handles audio-to-text using OpenAI Whisper (tiny.en)
+# With transcription-cascade enabled, every utterance is decoded with tiny.en first and only re-decoded
+# with the configured (larger, already resident) model when tiny's confidence is too low.
 
 import os
 from dotenv import load_dotenv
 import tempfile
+import threading
+import time
 import whisper
 import traceback
-from utils import log
+from utils import log, get_settings, record_metric, get_metric_summary
 
 load_dotenv()
 
-_model = None
-_model_name = None
+_models = {}
+_models_lock = threading.Lock()
 
-def load_whisper_model():
-    global _model, _model_name
-    from utils import get_settings
+MODEL_MAP = {1: 'tiny.en', 2: 'small.en', 3: 'medium.en'}
+CASCADE_FAST_MODEL = 'tiny.en'
+CASCADE_LOGPROB_THRESHOLD = -0.6    # Accept tiny.en if its average token log-probability is at least this
+CASCADE_NO_SPEECH_THRESHOLD = 0.5   # ...and no segment is more likely silence than this
+
+# Seconds of decode time per second of audio, per model (EMA), used to estimate latency saved
+_decode_rate = {}
+DECODE_RATE_ALPHA = 0.3
+
+def get_configured_model_name():
+    """Return the Whisper model name selected by the transcription-precision setting"""
     settings = get_settings() or {}
     precision = settings.get('transcription-precision', 2)
     try:
@@ -23,24 +35,114 @@ def load_whisper_model():
     except Exception:
         precision = 2
     precision = max(1, min(3, precision))
-    model_map = {1: 'tiny.en', 2: 'small.en', 3: 'medium.en'}
-    model_name = model_map.get(precision, 'small.en')
+    return MODEL_MAP.get(precision, 'small.en')
+
+def is_cascade_enabled():
+    settings = get_settings() or {}
+    return bool(settings.get('transcription-cascade', False)) and get_configured_model_name() != CASCADE_FAST_MODEL
+
+def load_whisper_model(model_name=None):
+    """Return a resident Whisper model, loading it on first use. Several models can stay loaded at once."""
+    if model_name is None:
+        model_name = get_configured_model_name()
     try:
-        if _model is None or _model_name != model_name:
-            _model = whisper.load_model(model_name)
-            _model_name = model_name
-        return _model
+        with _models_lock:
+            if model_name not in _models:
+                from model_cache import load_model
+                _models[model_name] = load_model(model_name)
+            return _models[model_name]
     except Exception as e:
         log(f"Error loading Whisper model: {e}\n{traceback.format_exc()}", "ERROR")
         return None
 
-def transcribe_audio(audio_path):
-    try:
-        model = load_whisper_model()
+def _decode(model_name, audio):
+    """Run one Whisper decode and return (result, elapsed seconds)"""
+    model = load_whisper_model(model_name)
+    if not model:
+        return None, 0.0
+    start = time.perf_counter()
+    result = model.transcribe(audio)
+    elapsed = time.perf_counter() - start
+    audio_s = len(audio) / whisper.audio.SAMPLE_RATE
+    if audio_s > 0:
+        rate = elapsed / audio_s
+        previous = _decode_rate.get(model_name)
+        _decode_rate[model_name] = rate if previous is None else previous + DECODE_RATE_ALPHA * (rate - previous)
+    return result, elapsed
+
+def _confidence(result):
+    """Return (length-weighted avg_logprob, max no_speech_prob) over the decoded segments"""
+    segments = result.get("segments") or []
+    if not segments:
+        return None, 1.0
+    weights = [max(1, len(seg.get("tokens", []))) for seg in segments]
+    avg_logprob = sum(seg.get("avg_logprob", -10.0) * w for seg, w in zip(segments, weights)) / sum(weights)
+    no_speech = max(seg.get("no_speech_prob", 0.0) for seg in segments)
+    return avg_logprob, no_speech
+
+def transcribe_cascade(audio):
+    """Decode with tiny.en, escalating to the configured model only when confidence is low"""
+    settings = get_settings() or {}
+    logprob_threshold = float(settings.get('cascade-logprob-threshold', CASCADE_LOGPROB_THRESHOLD))
+    no_speech_threshold = float(settings.get('cascade-no-speech-threshold', CASCADE_NO_SPEECH_THRESHOLD))
+    large_model = get_configured_model_name()
+    audio_s = len(audio) / whisper.audio.SAMPLE_RATE
+
+    result, fast_elapsed = _decode(CASCADE_FAST_MODEL, audio)
+    avg_logprob, no_speech = _confidence(result or {})
+    accepted = (result is not None and avg_logprob is not None
+                and avg_logprob >= logprob_threshold and no_speech <= no_speech_threshold)
+    if accepted:
+        large_rate = _decode_rate.get(large_model)
+        record_metric("cascade_escalated", 0)
+        if large_rate is None:
+            # The warm-up decode of silence says nothing about real utterances: no estimate until one was decoded
+            saved_text = f"no {large_model} decode yet to estimate the time saved"
+        else:
+            saved = large_rate * audio_s - fast_elapsed
+            record_metric("cascade_saved_s", saved)
+            saved_text = f"~{saved:.2f}s saved vs {large_model}"
+        log(f"Cascade accepted {CASCADE_FAST_MODEL} (logprob {avg_logprob:.2f}, no_speech {no_speech:.2f}) "
+            f"in {fast_elapsed:.2f}s, {saved_text}", "TRANSCRIPTION")
+    else:
+        result, large_elapsed = _decode(large_model, audio)
+        record_metric("cascade_escalated", 1)
+        record_metric("cascade_saved_s", -fast_elapsed)
+        confidence = f"logprob {avg_logprob:.2f}, " if avg_logprob is not None else ""
+        log(f"Cascade escalated to {large_model} ({confidence}no_speech {no_speech:.2f}): "
+            f"{fast_elapsed:.2f}s + {large_elapsed:.2f}s", "TRANSCRIPTION")
+    escalations = get_metric_summary("cascade_escalated")
+    saved_total = get_metric_summary("cascade_saved_s")
+    saved_text = f"{saved_total['total']:.2f}s saved in total" if saved_total else "time saved not measured yet"
+    log(f"Cascade stats: escalation rate {escalations['mean'] * 100:.0f}% over {escalations['count']} turns, "
+        f"{saved_text}", "TRANSCRIPTION")
+    return result
+
+def decode_local(audio_path, model_name=None):
+    """Decode a file path or a 16 kHz float32 audio array on this machine and return the text.
+    Unlike transcribe_audio, a failed decode raises instead of returning an empty transcript."""
+    if model_name is None and is_cascade_enabled():
+        audio = whisper.load_audio(audio_path) if isinstance(audio_path, str) else audio_path
+        result = transcribe_cascade(audio)
+    else:
+        model = load_whisper_model(model_name)
         if not model:
-            return ""
+            raise RuntimeError(f"Whisper model {model_name or get_configured_model_name()} could not be loaded")
         result = model.transcribe(audio_path)
-        return result.get("text", "")
+    if result is None:
+        raise RuntimeError("Whisper decode failed")
+    return result.get("text", "")
+
+def transcribe_audio(audio_path, model_name=None, remote=True):
+    """Transcribe a file path or a 16 kHz float32 audio array.
+    File paths go to remote transcription workers first when any are configured (remote=False forces local)."""
+    try:
+        if remote and model_name is None:
+            from remote_transcribe import transcribe_remote
+            text = transcribe_remote(audio_path)
+            if text is not None:
+                return text
+        return decode_local(audio_path, model_name)
     except Exception as e:
         log(f"Error transcribing audio: {e}\n{traceback.format_exc()}", "ERROR")
         return ""
@@ -54,9 +156,23 @@ async def async_transcribe(audio_path):
         log(f"Error in async_transcribe: {e}\n{traceback.format_exc()}", "ERROR")
         return ""
 
+def get_engine_model_names():
+    """Return the Whisper models the configured engine decodes with"""
+    names = [get_configured_model_name()]
+    if is_cascade_enabled():
+        names.append(CASCADE_FAST_MODEL)
+    return names
+
 def preload_whisper():
+    """Load (memory-mapped) and warm up every model the configured engine uses, then announce readiness"""
     try:
-        model = load_whisper_model()
+        from model_cache import warm_up
+        model = None
+        for name in get_engine_model_names():
+            model = load_whisper_model(name)
+            if not model:
+                break
+            warm_up(model)
         if model:
             log("Whisper model preloaded and ready.", "SYSTEM")
         else:
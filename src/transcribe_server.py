@@ -0,0 +1,115 @@
+# transcribe_server.py
+# Transcription worker node: serves the local transcribe.py engine over HTTP for remote_transcribe.py clients
+#
+# Usage:
+#   python src/transcribe_server.py [--host 0.0.0.0] [--port 5055] [--model small.en]
+#
+# Endpoints:
+#   POST /transcribe   body = audio file bytes (wav/mp3/...), returns {"text", "elapsed_s", "model"}, or a 500
+#                      when the decode fails, so the client moves on to another worker or decodes locally
+#   GET  /health       returns {"status": "ok", "in_flight", "model"}
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import log
+
+SCRIPT_NAME = "transcribe_server.py"
+DEFAULT_PORT = 5055
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+_model_name = None
+_requested_model = None  # None decodes with the configured engine (including the cascade)
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_decode_lock = threading.Lock()  # One Whisper model instance decodes one utterance at a time
+
+
+class TranscribeHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, {"status": "ok", "in_flight": _in_flight, "model": _model_name})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        global _in_flight
+        if self.path.rstrip('/') != '/transcribe':
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._send_json(400, {"error": "missing or oversized audio body"})
+            return
+        audio_bytes = self.rfile.read(length)
+        suffix = self.headers.get('X-Audio-Suffix', '.wav')
+        with _in_flight_lock:
+            _in_flight += 1
+        temp_path = None
+        try:
+            from transcribe import decode_local
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+                f.write(audio_bytes)
+                temp_path = f.name
+            start = time.perf_counter()
+            with _decode_lock:
+                text = decode_local(temp_path, _requested_model)
+            elapsed = time.perf_counter() - start
+            self._send_json(200, {"text": text, "elapsed_s": round(elapsed, 3), "model": _model_name})
+        except Exception as e:
+            log(f"Error serving transcription: {e}\n{traceback.format_exc()}", "ERROR", script=SCRIPT_NAME)
+            self._send_json(500, {"error": str(e)})
+        finally:
+            with _in_flight_lock:
+                _in_flight -= 1
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def log_message(self, format, *args):
+        pass  # Requests are logged through utils.log instead of stderr
+
+
+def serve(host='0.0.0.0', port=DEFAULT_PORT, model_name=None):
+    global _model_name, _requested_model
+    from transcribe import load_whisper_model, get_configured_model_name
+    _requested_model = model_name
+    _model_name = model_name or get_configured_model_name()
+    if not load_whisper_model(_model_name):
+        log(f"Could not load Whisper model {_model_name}. Worker not started.", "ERROR", script=SCRIPT_NAME)
+        return
+    server = ThreadingHTTPServer((host, port), TranscribeHandler)
+    log(f"Transcription worker ({_model_name}) listening on http://{host}:{port}", "SYSTEM")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("Transcription worker stopped.", "SYSTEM")
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Whisper transcription over HTTP for remote clients.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model', default=None, help="Whisper model name (defaults to the transcription-precision setting)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.model)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,9 +8,13 @@ import numpy as np
 import time
 import os
 import traceback
+import json
 from dotenv import load_dotenv
-from utils import log, get_settings, log_finetune_example, log_cost_summary, log_command_execution
-from sounds import play_sound_effect, IS_ASSISTANT_SPEAKING, interrupt_speech
+from utils import log, get_settings, log_finetune_example, log_cost_summary, log_command_execution, record_metric
+from sounds import play_sound_effect, IS_ASSISTANT_SPEAKING, interrupt_speech, mark_turn_start
+import prewarm
+import prefetch
+import session
 import collections
 
 load_dotenv()
@@ -27,6 +31,7 @@ SILENCE_CHUNKS = int(16000 / 1024 * 3.5)  # ~3.5 seconds of silence, increased f
 FRAME_DURATION_MS = 30
 SAMPLE_RATE = 16000
 CHANNELS = 1
+MAX_RESPONSE_REREQUESTS = 1  # Same-turn retries of an invalid top-tier response
 
 porcupine = None
 pa = None
@@ -39,6 +44,18 @@ should_exit = False
 on_transcription_callback = None
 IS_ASSISTANT_AWAKE = False
 
+# Event-loop responsiveness during turns: the loop must keep reading audio (and catch barge-in) while a turn runs
+LAG_PROBE_INTERVAL = 0.005  # Seconds between lag probes
+_turns_in_flight = 0
+_turn_max_lag = 0.0
+_audio_executor = None
+
+# Utterance coalescing: a turn's commands are held for a short window after its endpoint. Speech starting within
+# the window supersedes the turn (its LLM request is cancelled) and the next utterance is sent merged with it.
+DEFAULT_COALESCE_WINDOW = 1.5  # Seconds after endpoint
+_last_turn = None        # Most recent turn: {"window_end", "text" future, "superseded" event, "committed", "llm_task"}
+_superseded_turn = None  # Turn whose text the next utterance starts with
+
 import asyncio
 
 
@@ -102,14 +119,126 @@ def rms(data):
     return np.sqrt(mean_square)
 
 
+async def _loop_lag_monitor():
+    """Measure how late the event loop wakes up while a turn is in flight"""
+    global _turn_max_lag
+    loop = asyncio.get_running_loop()
+    while not should_exit:
+        expected = loop.time() + LAG_PROBE_INTERVAL
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        if _turns_in_flight:
+            _turn_max_lag = max(_turn_max_lag, loop.time() - expected)
+
+
+def _turn_started():
+    global _turns_in_flight, _turn_max_lag
+    if not _turns_in_flight:
+        _turn_max_lag = 0.0
+    _turns_in_flight += 1
+
+
+def _turn_finished():
+    global _turns_in_flight
+    _turns_in_flight = max(0, _turns_in_flight - 1)
+    if _turns_in_flight:
+        return
+    lag_ms = _turn_max_lag * 1000
+    record_metric("loop_lag_ms", lag_ms)
+    if lag_ms > FRAME_DURATION_MS:
+        log(f"Event loop stalled {lag_ms:.1f} ms during the turn (budget: one {FRAME_DURATION_MS} ms audio frame)", "ERROR", script="triggers.py")
+    else:
+        log(f"Event loop max lag during turn: {lag_ms:.1f} ms (budget {FRAME_DURATION_MS} ms)", "TIMING")
+
+
+def _coalesce_window():
+    try:
+        return max(0.0, float(get_settings().get('utterance-coalesce-window', DEFAULT_COALESCE_WINDOW)))
+    except (TypeError, ValueError):
+        return DEFAULT_COALESCE_WINDOW
+
+
+def _new_turn():
+    """Create the turn of an utterance that just ended, merging it with the turn it superseded"""
+    global _last_turn, _superseded_turn
+    turn = {
+        "window_end": time.monotonic() + _coalesce_window(),
+        "text": asyncio.get_running_loop().create_future(),
+        "superseded": asyncio.Event(),
+        "committed": False,
+        "llm_task": None,
+        "merge_from": _superseded_turn,
+    }
+    _last_turn, _superseded_turn = turn, None
+    return turn
+
+
+def _on_speech_onset():
+    """New speech inside the previous turn's window: hold that turn back so both parts go out as one request"""
+    global _superseded_turn
+    turn = _last_turn
+    if turn is None or turn["committed"] or turn["superseded"].is_set() or time.monotonic() >= turn["window_end"]:
+        return
+    turn["superseded"].set()
+    _superseded_turn = turn
+    if turn["llm_task"] is not None and not turn["llm_task"].done():
+        turn["llm_task"].cancel()
+        log("Follow-up speech within the coalescing window: cancelled the in-flight request to merge both parts", "TRIGGER")
+    else:
+        log("Follow-up speech within the coalescing window: holding the previous utterance to merge it", "TRIGGER")
+
+
+async def _hold_for_window(turn):
+    """Wait out the turn's coalescing window. Returns False if follow-up speech superseded the turn."""
+    if turn is None or turn["committed"]:
+        return True
+    remaining = turn["window_end"] - time.monotonic()
+    if remaining > 0:
+        try:
+            await asyncio.wait_for(turn["superseded"].wait(), remaining)
+        except asyncio.TimeoutError:
+            pass
+    if turn["superseded"].is_set():
+        return False
+    turn["committed"] = True
+    return True
+
+
+async def _gated_deltas(deltas, turn):
+    """Pass a response stream through once the turn's coalescing window has passed; the request itself is already
+    running, so the window overlaps generation instead of delaying it"""
+    try:
+        first = True
+        async for delta in deltas:
+            if first:
+                first = False
+                if not await _hold_for_window(turn):
+                    return
+            yield delta
+    finally:
+        await deltas.aclose()
+
+
+async def _read_audio(num_frames):
+    """Read from the microphone on a dedicated thread so the event loop stays free for turn tasks"""
+    global _audio_executor
+    if _audio_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_audio_executor, lambda: stream.read(num_frames, exception_on_overflow=False))
+
+
 async def _main_trigger_loop():
     global should_exit, IS_ASSISTANT_AWAKE
+    asyncio.create_task(_loop_lag_monitor())
     while not should_exit:
         try:
             if not IS_ASSISTANT_AWAKE:
                 mode = await _sleep_mode()
                 if mode == "awake":
                     IS_ASSISTANT_AWAKE = True
+                    session.reset("new awake period")
+                    prefetch.start()
             if IS_ASSISTANT_AWAKE:
                 await _awake_loop()
         except Exception as e:
@@ -154,7 +283,7 @@ async def _awake_loop():
     auto_convo_end = get_settings().get('auto-conversation-end')
     while IS_ASSISTANT_AWAKE:
         try:
-            pcm = stream.read(chunk_size, exception_on_overflow=False)
+            pcm = await _read_audio(chunk_size)
             volume = rms(pcm)
             rms_history.append(volume)
             avg_rms = sum(rms_history) / len(rms_history) if rms_history else 0
@@ -167,6 +296,9 @@ async def _awake_loop():
                 if not speech_detected:
                     frames = list(buffer_frames)
                     log("User speech detected. Listening for command.", "TRIGGER")
+                    _on_speech_onset()
+                    # Handshakes, asset parsing and model page-in overlap with the user still talking
+                    prewarm.start()
                 frames.append(pcm)
                 speech_detected = True
                 last_speech_time = now
@@ -179,13 +311,15 @@ async def _awake_loop():
                     buffer_frames.append(pcm)
             if speech_detected and silence_chunks > SILENCE_CHUNKS:
                 log("End of user speech detected. Preparing for transcription.", "TRIGGER")
+                mark_turn_start()
+                prewarm.finish_turn()
                 frames_to_process = frames.copy()
                 frames = []
                 buffer_frames.clear()
                 silence_chunks = 0
                 speech_detected = False
                 last_speech_time = time.time()
-                asyncio.create_task(_handle_speech_end(frames_to_process))
+                asyncio.create_task(_handle_speech_end(frames_to_process, _new_turn()))
             # Check for inactivity timeout, but only if auto-conversation-end is enabled
             auto_convo_end = get_settings().get('auto-conversation-end', False)
             if auto_convo_end:
@@ -194,6 +328,7 @@ async def _awake_loop():
                     play_sound_effect(os.path.join(os.path.dirname(__file__), '../assets/close.wav'))
                     log(f"No activity detected for {silence_delay} seconds. Returning to sleep mode.", "TRIGGERS")
                     IS_ASSISTANT_AWAKE = False
+                    _flush_memory("sleep")
                     break
             await asyncio.sleep(0.01)
         except Exception as e:
@@ -201,160 +336,218 @@ async def _awake_loop():
             await asyncio.sleep(1)
 
 
-async def _handle_speech_end(frames):
+async def _handle_speech_end(frames, turn=None):
     if not frames:
         return
+    _turn_started()
+    text = ""
     try:
-        audio_path = _save_frames_to_wav(frames)
+        audio_path = await asyncio.to_thread(_save_frames_to_wav, frames)
         from transcribe import async_transcribe
         text = await async_transcribe(audio_path)
         log(f"Transcription complete. Result: '{text}'", "TRANSCRIPTION")
         if not text or not text.strip() or len(text.strip()) < 2 or text.strip().lower() in ["uh", "um", "", "..."]:
+            text = ""
+        if turn is not None and turn["merge_from"] is not None:
+            earlier = await turn["merge_from"]["text"]
+            if earlier:
+                text = f"{earlier} {text}".strip()
+                record_metric("utterances_coalesced", 1.0)
+                log(f"Coalesced with the previous utterance: '{text}'", "TRANSCRIPTION")
+        if turn is not None:
+            turn["text"].set_result(text)
+        if not text:
             return
+        if turn is not None and turn["superseded"].is_set():
+            return  # The follow-up utterance sends this text with its own
         if on_transcription_callback:
             on_transcription_callback(text)
         play_sound_effect(os.path.join(os.path.dirname(__file__), '../assets/pop.wav'))
-        # Only await prompt_manager, do not create multiple tasks
-        await prompt_manager(text)
+        # Common commands (pause, next song, volume, voice speed, sleep...) skip the LLM entirely
+        from intent_router import route_intent
+        if await route_intent(text, before_dispatch=lambda: _hold_for_window(turn)):
+            return
+        # The request starts now; its commands wait for the coalescing window (see _gated_deltas)
+        if turn is None:
+            await prompt_manager(text)
+            return
+        turn["llm_task"] = asyncio.create_task(prompt_manager(text, turn))
+        try:
+            await turn["llm_task"]
+        except asyncio.CancelledError:
+            if not turn["superseded"].is_set():
+                raise
+            log(f"Request for '{text}' cancelled: merged into the follow-up utterance", "API")
     except Exception as e:
         log(f"Error during speech end handling: {e}\n{traceback.format_exc()}", "ERROR")
+    finally:
+        if turn is not None and not turn["text"].done():
+            turn["text"].set_result(text or "")
+        _turn_finished()
 
 
-async def prompt_manager(user_text):
+async def prompt_manager(user_text, turn=None):
+    """Run one LLM turn. With a coalescing turn, nothing is executed before its window has passed."""
+    global TOTAL_COST_CENTS, TOTAL_TOKEN_COST_CENTS
     try:
-        import requests
-        import json, os
-        from dotenv import load_dotenv
-        load_dotenv()
-        
-        def send_openai_request(endpoint, payload, headers=None, stream=False):
-            """Send request to OpenAI API"""
+        from resilience import resilient_chat_stream, play_trouble_clip
+        from commands import (execute_commands_from_stream_async, execute_commands_from_json_response_async,
+                              parse_command_response, record_parse_result)
+        from schema_compiler import get_response_format
+        from tokens import count_tokens
+        import response_cache
+        import model_router
+        import tool_loop
+
+        # A repeated query replays the command array cached from an earlier LLM response
+        cached = await asyncio.to_thread(response_cache.lookup, user_text)
+        if cached:
+            if not await _hold_for_window(turn):
+                return
+            await execute_commands_from_json_response_async(cached)
+            _remember_exchange(user_text, cached)
+            return
+
+        # Asset reads, JSON serialization and tokenization run off the event loop so audio keeps flowing.
+        # Within an awake period the conversation thread continues: only what changed since the last turn is new.
+        try:
+            messages, session_turn = await asyncio.to_thread(session.begin_turn, user_text)
+            token_counts = session_turn["token_counts"]
+            input_tokens = session_turn["input_tokens"]
+        except Exception as e:
+            log(f"Prompt assembly failed: {e}\n{traceback.format_exc()}", "ERROR", script="triggers.py")
+            return
+
+        # Data queries get their modules as tools: results come back as tool messages in this conversation
+        tools = await asyncio.to_thread(tool_loop.select_tools, user_text)
+        tool_turn = tool_loop.ToolTurn(user_text, token_counts)
+        if tools:
+            messages.insert(len(messages) - 1, tool_loop.instructions_message())
+
+        # Cheap models take the simple turns; output failing validation is repaired locally, retried one tier up
+        # or, at the top tier, re-requested once with the reason
+        response_format = get_response_format()
+        tier = model_router.choose_tier(user_text)
+        new_turn = True
+        dispatched = False
+        rerequests = 0
+        commands_list = None
+        while True:
+            model = model_router.get_model(tier)
+            top_tier = model_router.next_tier(tier) is None
+            input_cost_cents = model_router.estimate_cost_cents(model, input_tokens=input_tokens)
+            log(f"API request ({model}): {input_tokens:,} input tokens ({input_cost_cents:.4f}¢)", "COST")
+            payload = {
+                "model": model,
+                "messages": messages
+            }
+            if response_format:
+                payload["response_format"] = response_format
+            if tools:
+                payload["tools"] = tools
+                if not tool_turn.can_call():
+                    payload["tool_choice"] = "none"
+            log("Sending streaming request to OpenAI API", "API")
+            request_start = time.perf_counter()
+            first_command_latency = []
+            def on_first_command(module_name):
+                elapsed = time.perf_counter() - request_start
+                first_command_latency.append(elapsed)
+                record_metric("llm_first_command_s", elapsed)
+                log(f"First command '{module_name}' dispatched {elapsed:.2f}s after request", "TIMING")
+            # Commands run as soon as each object of the JSON array closes, so speak starts before the rest is generated.
+            # The stream is bounded by deadlines, hedged when slow and skipped while the provider's circuit is open.
+            # A response that is not a JSON array is validated (and repaired) below instead of by the dispatcher.
+            stream_status = {}
+            deltas = resilient_chat_stream(payload, stream_status)
+            if turn is not None:
+                deltas = _gated_deltas(deltas, turn)
+            content = await execute_commands_from_stream_async(deltas, on_first_command, fallback=False)
+            if turn is not None and turn["superseded"].is_set():
+                return  # Merged into the follow-up utterance's turn
+            latency = first_command_latency[0] if first_command_latency else time.perf_counter() - request_start
+            if stream_status.get("error") and not content:
+                log(f"LLM request failed ({stream_status['error']})", "ERROR", script="triggers.py")
+                session.reset("request failed")
+                await asyncio.to_thread(play_trouble_clip)
+                return
+            output_cost_cents = 0.0
             try:
-                url = f"https://api.openai.com/v1/{endpoint}"
-                if headers is None:
-                    headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY', '')}"}
-                response = requests.post(url, headers={**headers, "Content-Type": "application/json"}, json=payload, stream=stream)
-                response.raise_for_status()
-                if stream:
-                    return response
-                return response.json()
+                if content:
+                    # Calculate output token cost
+                    output_tokens = await asyncio.to_thread(count_tokens, content)
+                    output_cost_cents = model_router.estimate_cost_cents(model, output_tokens=output_tokens)
+                    log(f"API response: {output_tokens:,} output tokens ({output_cost_cents:.4f}¢)", "COST")
             except Exception as e:
-                log(f"OpenAI API request failed: {e}", "ERROR", script="triggers.py")
-                return None
-
-        def chatgpt_text_to_text(*, prompt=None, **kwargs):
-            """Send text to ChatGPT and get response"""
-            if prompt is not None:
-                payload = {
-                    "model": kwargs.get("model", "gpt-4.1"),
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-                payload.update({k: v for k, v in kwargs.items() if k not in ("model",)})
+                log(f"Output token calculation failed: {e}", "ERROR", script="triggers.py")
+            # Update global trackers
+            TOTAL_TOKEN_COST_CENTS += input_cost_cents + output_cost_cents
+            TOTAL_COST_CENTS = TOTAL_TOKEN_COST_CENTS + TOTAL_TTS_COST_CENTS
+            log_cost_summary(TOTAL_COST_CENTS, TOTAL_TOKEN_COST_CENTS, TOTAL_TTS_COST_CENTS)
+            model_router.record_attempt(tier, latency, input_cost_cents + output_cost_cents, new_turn)
+            new_turn = False
+            dispatched = dispatched or bool(first_command_latency)
+            if stream_status.get("tool_calls"):
+                # Same model, same conversation: only the tool call and its results are new input
+                tool_messages = await tool_turn.run_calls(content, stream_status["tool_calls"])
+                messages.extend(tool_messages)
+                input_tokens += await asyncio.to_thread(count_tokens, json.dumps(tool_messages, ensure_ascii=False))
+                continue
+            tool_turn.finish(request_start + first_command_latency[0] if first_command_latency else None)
+            parsed, problem, repaired = parse_command_response(content)
+            record_parse_result(problem, repaired)
+            if problem is None:
+                if not first_command_latency:
+                    # Valid once repaired, or not streamed as an array: none of it has run yet
+                    await execute_commands_from_json_response_async(json.dumps(parsed))
+                commands_list = parsed
+                break
+            if dispatched:
+                # Commands that already ran cannot be taken back, so a partly valid response is kept
+                log(f"Response failed validation ({problem}) after commands ran; not retried", "ERROR", script="triggers.py")
+                break
+            if not top_tier:
+                model_router.record_escalation(tier, problem)
+                tier = model_router.next_tier(tier)
+            elif rerequests < MAX_RESPONSE_REREQUESTS:
+                rerequests += 1
+                log(f"Response failed validation ({problem}); re-requesting", "ERROR", script="triggers.py")
+                messages.extend([{"role": "assistant", "content": content or ""},
+                                 {"role": "user", "content": f"That response was invalid ({problem}). "
+                                                             "Answer again with only the JSON commands."}])
             else:
-                payload = kwargs
-            return send_openai_request('chat/completions', payload)
-        
-        # Load baseprompt, settings, commands, and memory
-        with open(os.path.join(os.path.dirname(__file__), '../assets/baseprompt.json'), 'r', encoding='utf-8') as f:
-            baseprompt = json.load(f)
-        with open(os.path.join(os.path.dirname(__file__), '../assets/settings.json'), 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-        with open(os.path.join(os.path.dirname(__file__), '../assets/commands.json'), 'r', encoding='utf-8') as f:
-            commands = json.load(f).get('commands', [])
-        with open(os.path.join(os.path.dirname(__file__), '../assets/memory.json'), 'r', encoding='utf-8') as f:
-            memory = json.load(f)
-        baseprompt['settings'] = settings
-        baseprompt['commands'] = commands
-        baseprompt['memory'] = memory  # Load full memory.json as the memory key
-        baseprompt['user_prompt'] = user_text
-        import time
-        baseprompt['unix_time'] = int(time.time())
-        # Add temp_folder file list
-        temp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../temp'))
-        try:
-            temp_files = [f for f in os.listdir(temp_dir) if os.path.isfile(os.path.join(temp_dir, f))]
-        except Exception:
-            temp_files = []
-        baseprompt['temp_folder'] = temp_files
-        # Remove any context logic here; context is only for reprompt
-        prompt = json.dumps(baseprompt, ensure_ascii=False)
-        
-        # Calculate token costs before sending request
+                break
+        if not content:
+            log("No response received from OpenAI API", "ERROR", script="triggers.py")
+        if not commands_list:
+            session.reset("invalid response")
+        else:
+            # The canonical JSON array is what gets logged for fine-tuning, cached, summarized and kept in the thread
+            content = json.dumps(commands_list, ensure_ascii=False)
+            await asyncio.to_thread(session.record_turn, session_turn, content)
+            await asyncio.to_thread(log_finetune_example, user_text, content)
+            if not tool_turn.rounds:  # An answer built from live data must not be replayed
+                response_cache.store(user_text, content)
+            _remember_exchange(user_text, content)
+    except Exception as e:
+        log(f"Error in prompt_manager: {e}", "ERROR", script="triggers.py")
+
+
+def _remember_exchange(user_text, content):
+    """Add the exchange to memory (the summary is rewritten later, in batches) and to the long-term vector store"""
+    async def record():
         try:
-            import tiktoken
-            encoding = tiktoken.encoding_for_model("gpt-4")
-            input_tokens = len(encoding.encode(prompt))
-            
-            # Cost calculation (as of 2024/2025 pricing) - converted to cents
-            input_cost_per_million = 200.0  # 200¢ per million input tokens ($2.00)
-            output_cost_per_million = 800.0  # 800¢ per million output tokens ($8.00)
-            
-            input_cost_cents = (input_tokens / 1_000_000) * input_cost_per_million
-            
-            log(f"API request: {input_tokens:,} input tokens ({input_cost_cents:.4f}¢)", "COST")
-            
+            import memory
+            await asyncio.to_thread(memory.record_exchange, user_text, content)
         except Exception as e:
-            log(f"Token estimation failed: {e}", "ERROR", script="triggers.py")
-            input_tokens = 0
-            input_cost_cents = 0.0
-        
-        payload = {
-            "model": "gpt-4.1",
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        log("Sending request to OpenAI API", "API")
-        response = chatgpt_text_to_text(prompt=prompt)
-        content = None
+            log(f"Error recording the exchange in memory: {e}", "ERROR", script="triggers.py")
         try:
-            if response and 'choices' in response and response['choices']:
-                content = response['choices'][0]['message']['content']
-                
-                # Calculate output token cost and update global tracking
-                global TOTAL_COST_CENTS, TOTAL_TOKEN_COST_CENTS
-                try:
-                    output_tokens = len(encoding.encode(content))
-                    output_cost_cents = (output_tokens / 1_000_000) * output_cost_per_million
-                    total_request_cost = input_cost_cents + output_cost_cents
-                    
-                    log(f"API response: {output_tokens:,} output tokens ({output_cost_cents:.4f}¢)", "COST")
-                    
-                    # Update global trackers
-                    TOTAL_TOKEN_COST_CENTS += total_request_cost
-                    TOTAL_COST_CENTS = TOTAL_TOKEN_COST_CENTS + TOTAL_TTS_COST_CENTS
-                    
-                    # Log cost summary
-                    log_cost_summary(TOTAL_COST_CENTS, TOTAL_TOKEN_COST_CENTS, TOTAL_TTS_COST_CENTS)
-                    
-                except Exception as e:
-                    log(f"Output token calculation failed: {e}", "ERROR", script="triggers.py")
-                    
+            import vector_memory
+            if vector_memory.get_top_k() > 0:
+                await asyncio.to_thread(vector_memory.add_exchange, user_text, content)
         except Exception as e:
-            log(f"Malformed API response: {response}", "ERROR", script="triggers.py")
-        if content:
-            # Log user/assistant pair for fine-tuning
-            log_finetune_example(user_text, content)
-            # Summarize memory immediately (async, non-blocking)
-            try:
-                import asyncio
-                from memory import summarize_memory
-                async def summarize_and_save():
-                    import json, os
-                    mem_path = os.path.join(os.path.dirname(__file__), '../assets/memory.json')
-                    with open(mem_path, 'r', encoding='utf-8') as f:
-                        old_mem = json.load(f)
-                    summary_obj = await asyncio.to_thread(summarize_memory, old_mem, user_text, content)
-                    if summary_obj:
-                        with open(mem_path, 'w', encoding='utf-8') as f:
-                            json.dump(summary_obj, f, indent=2, ensure_ascii=False)
-                asyncio.create_task(summarize_and_save())
-                log("Memory summarization started", "CONTEXT")
-            except Exception as e:
-                log(f"Error starting memory summarization: {e}", "ERROR", script="triggers.py")
-            # Use new JSON command processing
-            from commands import execute_commands_from_json_response_async
-            await execute_commands_from_json_response_async(content)
-    except Exception as e:
-        log(f"Error in prompt_manager: {e}", "ERROR", script="triggers.py")
+            log(f"Error storing the exchange in vector memory: {e}", "ERROR", script="triggers.py")
+    asyncio.create_task(record())
 
 
 def _save_frames_to_wav(frames):
@@ -364,7 +557,7 @@ def _save_frames_to_wav(frames):
         temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
         wf = wave.open(temp_wav.name, 'wb')
         wf.setnchannels(CHANNELS)
-        wf.setsampwidth(pyaudio.PyAudio().get_sample_size(pyaudio.paInt16))
+        wf.setsampwidth(pyaudio.get_sample_size(pyaudio.paInt16))
         wf.setframerate(SAMPLE_RATE)
         wf.writeframes(b''.join(frames))
         wf.close()
@@ -380,9 +573,18 @@ async def _inactivity_timer():
     await asyncio.sleep(silence_delay)
 
 
+def _flush_memory(reason):
+    try:
+        import memory
+        memory.flush(reason)
+    except Exception as e:
+        log(f"Error flushing memory: {e}", "ERROR", script="triggers.py")
+
+
 def force_sleep_mode():
     global IS_ASSISTANT_AWAKE
     IS_ASSISTANT_AWAKE = False
+    _flush_memory("sleep")
 
 
 def greet():
@@ -1,6 +1,8 @@
 from datetime import datetime
+from collections import deque
 import json
 import os
+import threading
 
 class Colors:
     """ANSI color codes for console output"""
@@ -66,12 +68,35 @@ def log_command_execution(module_name, args):
         message = f"Executing {module_name}()"
     log(message, "COMMAND")
 
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets'))
+_asset_cache = {}
+_asset_cache_lock = threading.Lock()
+
+def load_asset(name):
+    """Return the parsed JSON of an assets/ file, re-reading it only when its mtime changes.
+    The returned object is shared between callers and must not be modified."""
+    path = os.path.join(ASSETS_DIR, name)
+    stat = os.stat(path)
+    mtime = (stat.st_mtime_ns, stat.st_size)
+    with _asset_cache_lock:
+        cached = _asset_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    with _asset_cache_lock:
+        _asset_cache[path] = (mtime, data)
+    return data
+
+def get_asset_version(name):
+    """Return a value that changes whenever the asset file changes (mtime and size)"""
+    stat = os.stat(os.path.join(ASSETS_DIR, name))
+    return (stat.st_mtime_ns, stat.st_size)
+
 def get_settings():
     """Return the settings as a dict mapping setting-id to value, for compatibility with old code."""
     try:
-        settings_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/settings.json'))
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings_list = json.load(f)
+        settings_list = load_asset('settings.json')
         # Convert to dict: {setting-id: value}
         return {s['setting-id']: s['value'] for s in settings_list if 'setting-id' in s and 'value' in s}
     except Exception as e:
@@ -81,7 +106,8 @@ def get_settings():
 def log_finetune_example(user_prompt, assistant_response):
     """
     Appends a training example to log.jsonl in OpenAI fine-tuning format.
-    Each line: {"messages": [{"role": "user", "content": ...}, {"role": "assistant", "content": ...}]}
+    Each line: {"messages": [{"role": "user", "content": ...}, {"role": "assistant", "content": ...}], "timestamp": ...}
+    The timestamp (local time) lets prefetch.py learn when each module is used.
     """
     import json
     import os
@@ -90,7 +116,8 @@ def log_finetune_example(user_prompt, assistant_response):
         "messages": [
             {"role": "user", "content": user_prompt},
             {"role": "assistant", "content": assistant_response}
-        ]
+        ],
+        "timestamp": datetime.now().isoformat(timespec='seconds')
     }
     with open(log_path, 'a', encoding='utf-8') as f:
         f.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -103,3 +130,55 @@ def update_tts_cost(cost_cents):
         triggers.TOTAL_COST_CENTS = triggers.TOTAL_TOKEN_COST_CENTS + triggers.TOTAL_TTS_COST_CENTS
     except Exception as e:
         log(f"Error updating TTS cost: {e}", "ERROR", script="utils.py")
+
+# --- Session metrics (in-memory, reset on restart) ---
+METRIC_WINDOW = 500  # Samples kept per metric for percentile estimates
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def record_metric(name, value):
+    """Record a numeric sample for a named metric"""
+    with _metrics_lock:
+        metric = _metrics.setdefault(name, {"count": 0, "total": 0.0, "samples": deque(maxlen=METRIC_WINDOW)})
+        metric["count"] += 1
+        metric["total"] += value
+        metric["samples"].append(value)
+
+def get_metric_summary(name):
+    """Return count, total, mean, p50 and p95 for a metric, or None if nothing was recorded"""
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if not metric or not metric["count"]:
+            return None
+        samples = sorted(metric["samples"])
+        count, total = metric["count"], metric["total"]
+    return {
+        "count": count,
+        "total": total,
+        "mean": total / count,
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+# --- Short-lived data caches of the modules (weather, news, agenda), filled ahead of time by prefetch.py ---
+_data_cache = {}  # namespace -> {key: (stored at, value)}
+_data_cache_lock = threading.Lock()
+
+def get_cached_data(namespace, key, ttl):
+    """Return the value cached under namespace/key if younger than ttl seconds, else None"""
+    import time
+    with _data_cache_lock:
+        entry = _data_cache.get(namespace, {}).get(key)
+    hit = entry is not None and time.time() - entry[0] < ttl
+    record_metric(f"data_cache_hit:{namespace}", 1.0 if hit else 0.0)
+    return entry[1] if hit else None
+
+def set_cached_data(namespace, key, value):
+    import time
+    with _data_cache_lock:
+        _data_cache.setdefault(namespace, {})[key] = (time.time(), value)
+
+def invalidate_cached_data(namespace):
+    """Drop every entry of a namespace (the underlying data changed)"""
+    with _data_cache_lock:
+        _data_cache.pop(namespace, None)
@@ -0,0 +1,277 @@
+# vector_memory.py
+# Long-term recall: every exchange is kept with an embedding, and the ones most relevant to the request are
+# brought back into the prompt ("recalled"), long after the 300-word summary of memory.py has dropped them.
+# Storage (assets/memory_store/) is append-only: exchanges.jsonl holds the texts, vectors.f32 the unit-length
+# float32 embeddings, one row per exchange, read through a NumPy memmap. A row's vector is written before its text,
+# and both files are cut back to their common rows on load, so an interrupted append cannot shift the rows. Search is a brute-force cosine scan,
+# a single matrix-vector product (about 10 ms for 100k exchanges at 256 dimensions).
+# Embedding backends (memory-embedder setting):
+#   - "hashing": deterministic local embedding of hashed words and word pairs; offline, instant, no API cost
+#   - "api": the OpenAI-compatible embeddings endpoint of the "embeddings" role (see http_client.py)
+# Changing the backend re-embeds the stored exchanges on first use.
+#   python src/vector_memory.py "what music did I listen to" [--top-k 3]
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+from utils import log, get_settings, record_metric
+
+STORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/memory_store'))
+EXCHANGES_PATH = os.path.join(STORE_DIR, 'exchanges.jsonl')
+VECTORS_PATH = os.path.join(STORE_DIR, 'vectors.f32')
+META_PATH = os.path.join(STORE_DIR, 'meta.json')
+DEFAULT_EMBEDDER = "hashing"
+DEFAULT_TOP_K = 3
+HASHING_DIMENSIONS = 256
+API_EMBEDDING_MODEL = "text-embedding-3-small"
+MIN_SCORES = {"hashing": 0.2, "api": 0.3}  # Cosine similarity below which an exchange is not worth recalling
+REBUILD_BATCH = 64
+
+_lock = threading.Lock()
+_exchanges = None      # Stored exchanges, row order
+_matrix = None         # memmap of the vectors (rows x dimensions)
+_meta = None           # {"embedder", "dimensions"}
+
+
+def _embed_hashing(texts):
+    """Signed hashed bag of words and word pairs, normalized: texts sharing words get similar vectors"""
+    vectors = np.zeros((len(texts), HASHING_DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        for i in range(len(words)):
+            for n in (1, 2):
+                digest = hashlib.md5(" ".join(words[i:i + n]).encode('utf-8')).digest()
+                vectors[row, int.from_bytes(digest[:4], 'little') % HASHING_DIMENSIONS] += 1.0 if digest[4] & 1 else -1.0
+    return vectors
+
+
+def _embed_api(texts):
+    from http_client import send_openai_request
+    response = send_openai_request('embeddings', {"model": API_EMBEDDING_MODEL, "input": list(texts)})
+    if not response or not response.get('data'):
+        raise RuntimeError("embeddings request failed")
+    ordered = sorted(response['data'], key=lambda item: item.get('index', 0))
+    return np.asarray([item['embedding'] for item in ordered], dtype=np.float32)
+
+
+EMBEDDERS = {
+    "hashing": _embed_hashing,
+    "api": _embed_api,
+}
+
+
+def get_embedder_name():
+    settings = get_settings() or {}
+    name = settings.get('memory-embedder', DEFAULT_EMBEDDER)
+    return name if name in EMBEDDERS else DEFAULT_EMBEDDER
+
+
+def get_top_k():
+    settings = get_settings() or {}
+    try:
+        return int(settings.get('vector-memory-top-k', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        return DEFAULT_TOP_K
+
+
+def embed(texts, embedder=None):
+    """Return unit-length float32 embeddings (one row per text) from the configured backend"""
+    vectors = EMBEDDERS[embedder or get_embedder_name()](texts)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _exchange_text(exchange):
+    return f"{exchange['user']}\n{exchange['reply']}"
+
+
+def _write_meta_locked(meta):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(META_PATH, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def _map_locked():
+    """(Re)map the vector file over the rows that have a stored exchange"""
+    global _matrix
+    rows = len(_exchanges)
+    if not rows or not _meta:
+        _matrix = None
+        return
+    _matrix = np.memmap(VECTORS_PATH, dtype=np.float32, mode='r', shape=(rows, _meta["dimensions"]))
+
+
+def _rebuild_locked(embedder):
+    """Re-embed every stored exchange with another backend"""
+    global _meta
+    start = time.perf_counter()
+    temp_path = VECTORS_PATH + ".tmp"
+    dimensions = None
+    with open(temp_path, 'wb') as f:
+        for i in range(0, len(_exchanges), REBUILD_BATCH):
+            vectors = embed([_exchange_text(e) for e in _exchanges[i:i + REBUILD_BATCH]], embedder)
+            dimensions = vectors.shape[1]
+            f.write(vectors.astype(np.float32).tobytes())
+    os.replace(temp_path, VECTORS_PATH)
+    _meta = {"embedder": embedder, "dimensions": dimensions}
+    _write_meta_locked(_meta)
+    log(f"Vector memory re-embedded {len(_exchanges)} exchanges with '{embedder}' "
+        f"in {time.perf_counter() - start:.1f}s", "CONTEXT")
+
+
+def _read_exchanges():
+    """Return (stored exchanges, whether every line was read), stopping at a line cut short by an interrupted append"""
+    exchanges = []
+    with open(EXCHANGES_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                exchanges.append(json.loads(line))
+            except ValueError:
+                return exchanges, False
+    return exchanges, True
+
+
+def _truncate_locked(rows):
+    """Cut both files back to their first rows exchanges (what an interrupted append left half-written)"""
+    temp_path = EXCHANGES_PATH + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(exchange, ensure_ascii=False) + '\n' for exchange in _exchanges[:rows])
+    os.replace(temp_path, EXCHANGES_PATH)
+    os.truncate(VECTORS_PATH, rows * 4 * _meta["dimensions"])
+    log(f"Vector memory store repaired: cut back to {rows} complete exchanges", "CONTEXT")
+
+
+def _load_locked():
+    """Load the stored exchanges once; the files are cut back to the rows that have both a text and a vector"""
+    global _exchanges, _meta
+    if _exchanges is not None:
+        return
+    _exchanges = []
+    _meta = None
+    try:
+        with open(META_PATH, 'r', encoding='utf-8') as f:
+            _meta = json.load(f)
+        _exchanges, complete = _read_exchanges()
+        row_bytes = 4 * _meta["dimensions"]
+        vector_bytes = os.path.getsize(VECTORS_PATH)
+        rows = min(len(_exchanges), vector_bytes // row_bytes)
+        if not complete or len(_exchanges) != rows or vector_bytes != rows * row_bytes:
+            _truncate_locked(rows)
+        _exchanges = _exchanges[:rows]
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError) as e:
+        log(f"Vector memory store unreadable ({e}); starting a new one", "ERROR", script="vector_memory.py")
+        _exchanges, _meta = [], None
+    embedder = get_embedder_name()
+    if _exchanges and _meta and _meta.get("embedder") != embedder:
+        _rebuild_locked(embedder)
+    _map_locked()
+
+
+def _reply_text(assistant_response):
+    """What the assistant said (its speak commands), falling back to the modules it ran"""
+    from commands import parse_command_response
+    commands_list, _, _ = parse_command_response(assistant_response)
+    commands_list = [c for c in commands_list if isinstance(c, dict)]
+    spoken = [str((c.get("args") or {}).get("text", "")) for c in commands_list if c.get("module") == "speak"]
+    modules = [c.get("module") for c in commands_list if c.get("module") not in (None, "speak")]
+    reply = " ".join(text for text in spoken if text)
+    if modules:
+        reply += f" [{', '.join(modules)}]"
+    return reply.strip()
+
+
+def add_exchange(user_text, assistant_response):
+    """Append an exchange and its embedding to the store"""
+    global _meta
+    exchange = {"user": user_text.strip(), "reply": _reply_text(assistant_response),
+                "time": datetime.now().isoformat(timespec='minutes')}
+    embedder = get_embedder_name()
+    vector = embed([_exchange_text(exchange)], embedder)[0]  # Outside the lock: may be a network call
+    with _lock:
+        _load_locked()
+        if _meta is None or (_meta.get("embedder"), _meta.get("dimensions")) != (embedder, len(vector)):
+            if _exchanges:
+                _rebuild_locked(embedder)
+            else:
+                _meta = {"embedder": embedder, "dimensions": len(vector)}
+                _write_meta_locked(_meta)
+                open(VECTORS_PATH, 'wb').close()
+                open(EXCHANGES_PATH, 'w', encoding='utf-8').close()
+        with open(VECTORS_PATH, 'ab') as f:
+            f.write(vector.astype(np.float32).tobytes())
+        with open(EXCHANGES_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(exchange, ensure_ascii=False) + '\n')
+        _exchanges.append(exchange)
+        _map_locked()
+
+
+def search(query, top_k=None, skip_latest=0):
+    """Return up to top_k stored exchanges most similar to the query (oldest first), ignoring the skip_latest
+    newest ones (already in the prompt verbatim) and anything below the backend's MIN_SCORES"""
+    top_k = get_top_k() if top_k is None else top_k
+    if top_k <= 0 or not query:
+        return []
+    start = time.perf_counter()
+    with _lock:
+        _load_locked()
+        candidates = len(_exchanges) - skip_latest
+        if candidates <= 0 or _matrix is None:
+            return []
+        embedder = _meta["embedder"]
+    query_vector = embed([query], embedder)[0]
+    with _lock:
+        if _matrix is None or _meta["embedder"] != embedder:
+            return []  # Cleared or re-embedded meanwhile
+        scores = np.asarray(_matrix[:candidates] @ query_vector)
+        exchanges = _exchanges
+    best = np.argpartition(-scores, min(top_k, candidates) - 1)[:top_k]
+    rows = sorted(int(row) for row in best if scores[row] >= MIN_SCORES.get(embedder, 0.0))
+    record_metric("vector_memory_search_s", time.perf_counter() - start)
+    return [{**exchanges[row], "relevance": round(float(scores[row]), 2)} for row in rows]
+
+
+def recall_for_prompt(user_text, skip_latest=0):
+    """Return the prompt's "recalled" section: relevant older exchanges as {"time", "user", "reply"}"""
+    try:
+        return [{key: exchange[key] for key in ("time", "user", "reply")}
+                for exchange in search(user_text, skip_latest=skip_latest)]
+    except Exception as e:
+        log(f"Vector memory search failed: {e}", "ERROR", script="vector_memory.py")
+        return []
+
+
+def clear():
+    """Delete the store (memory is wiped)"""
+    global _exchanges, _matrix, _meta
+    with _lock:
+        _exchanges, _matrix, _meta = [], None, None
+        for path in (EXCHANGES_PATH, VECTORS_PATH, META_PATH):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the long-term vector memory.")
+    parser.add_argument('query')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args(argv)
+    results = search(args.query, args.top_k)
+    print(f"{len(_exchanges or [])} exchanges stored ({(_meta or {}).get('embedder', 'none')} embeddings)")
+    for exchange in results:
+        print(f"  [{exchange['relevance']:.2f}] {exchange['time']}  {exchange['user']} -> {exchange['reply']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# test_memory.py
+# Batched summaries: concurrent flushes queue a single summary, and exchanges recorded while it runs are
+# summarized right after it when a flush was asked for meanwhile (idle timer, sleep).
+#   python -m pytest -q tests
+
+import os
+import sys
+import json
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import memory  # noqa: E402
+
+SUMMARY_DELAY = 0.3
+
+
+def test_flushes_during_a_summary_are_not_lost(monkeypatch, tmp_path):
+    monkeypatch.setattr(memory, "MEMORY_PATH", str(tmp_path / "memory.json"))
+    monkeypatch.setattr(memory, "_settings", lambda: (memory.DEFAULT_MEMORY_MODEL, 99))
+    summarized = []
+    started = threading.Event()
+
+    def slow_summary(previous, exchanges, model=None):
+        started.set()
+        time.sleep(SUMMARY_DELAY)
+        summarized.append([exchange["user"] for exchange in exchanges])
+        return {"summary": f"{len(summarized)} summaries"}
+    monkeypatch.setattr(memory, "summarize_memory", slow_summary)
+
+    for i in range(3):
+        memory.record_exchange(f"request {i}", "[]")
+    barrier = threading.Barrier(2)
+
+    def flush():
+        barrier.wait()
+        memory.flush("idle")
+    threads = [threading.Thread(target=flush) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started.wait(2)
+    memory.record_exchange("request 3", "[]")  # Recorded while the summary runs
+    memory.flush("sleep")
+    deadline = time.time() + 5
+    while memory._flushing.is_set() and time.time() < deadline:
+        time.sleep(0.05)
+    memory._cancel_timer()
+
+    assert summarized[0] == ["request 0", "request 1", "request 2"]
+    assert summarized[1:] == [["request 3"]]  # The concurrent flush did not summarize the same exchanges twice
+    with open(memory.MEMORY_PATH, 'r', encoding='utf-8') as f:
+        assert json.load(f)["unsummarized"] == 0
@@ -0,0 +1,89 @@
+# test_remote_transcribe.py
+# Routing across local transcribe_server.py worker processes: least-loaded first, a failing decode moves on to
+# the next worker, no usable worker hands the utterance back for local decoding.
+#   python -m pytest -q tests
+
+import os
+import sys
+import time
+import socket
+import subprocess
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import remote_transcribe  # noqa: E402
+
+STUB = os.path.join(os.path.dirname(__file__), 'transcribe_worker_stub.py')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def start_worker():
+    processes = []
+
+    def start(name, *flags):
+        port = _free_port()
+        processes.append(subprocess.Popen([sys.executable, STUB, '--port', str(port), '--name', name, *flags],
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            try:
+                requests.get(f"{url}/health", timeout=0.5)
+                return url
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        raise RuntimeError(f"worker {name} did not start")
+
+    yield start
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@pytest.fixture
+def audio_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(remote_transcribe, "_down_until", {})
+    monkeypatch.setattr(remote_transcribe, "_health_misses", {})
+    path = tmp_path / "utterance.wav"
+    path.write_bytes(b"RIFF0000WAVE")
+    return str(path)
+
+
+def _use_workers(monkeypatch, workers):
+    monkeypatch.setattr(remote_transcribe, "get_workers", lambda: workers)
+
+
+def test_least_loaded_worker_transcribes(start_worker, audio_file, monkeypatch):
+    busy = start_worker("busy", "--in-flight", "3")
+    idle = start_worker("idle")
+    _use_workers(monkeypatch, [busy, idle])
+    assert remote_transcribe.rank_workers([busy, idle]) == [idle, busy]
+    assert remote_transcribe.transcribe_remote(audio_file) == "decoded by idle"
+
+
+def test_failed_decode_moves_to_next_worker(start_worker, audio_file, monkeypatch):
+    broken = start_worker("broken", "--fail")
+    healthy = start_worker("healthy", "--in-flight", "1")
+    _use_workers(monkeypatch, [broken, healthy])
+    assert remote_transcribe.transcribe_remote(audio_file) == "decoded by healthy"
+    assert broken in remote_transcribe._down_until
+
+
+def test_no_usable_worker_falls_back_to_local(start_worker, audio_file, monkeypatch):
+    broken = start_worker("broken", "--fail")
+    unreachable = f"http://127.0.0.1:{_free_port()}"
+    _use_workers(monkeypatch, [broken, unreachable])
+    assert remote_transcribe.transcribe_remote(audio_file) is None
+    # A single missed health poll skips the worker for this utterance only
+    assert unreachable not in remote_transcribe._down_until
+    for _ in range(remote_transcribe.MAX_HEALTH_MISSES - 1):
+        remote_transcribe.rank_workers([unreachable])
+    assert unreachable in remote_transcribe._down_until
@@ -0,0 +1,55 @@
+# test_resilience.py
+# Hedging races a duplicate only against a primary that is still pending; a primary that fails outright is
+# reported as a failure, not retried blindly nor blamed on the first-token deadline.
+#   python -m pytest -q tests
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import http_client  # noqa: E402
+import resilience   # noqa: E402
+
+
+def _collect(payload, status):
+    async def run():
+        return [delta async for delta in resilience.resilient_chat_stream(payload, status)]
+    return asyncio.run(run())
+
+
+def _use_streams(monkeypatch, stream):
+    opened = []
+
+    def fake_stream(payload, tool_calls=None, **kwargs):
+        opened.append(payload)
+        return stream()
+    monkeypatch.setattr(http_client, "stream_chat_content_async", fake_stream)
+    monkeypatch.setattr(resilience, "get_hedge_delay", lambda: 0.05)
+    monkeypatch.setattr(resilience, "_breakers", {})
+    return opened
+
+
+def test_failed_primary_is_not_hedged(monkeypatch):
+    async def failing():
+        return
+        yield  # An HTTP error ends the stream without a delta
+
+    opened = _use_streams(monkeypatch, failing)
+    status = {}
+    assert _collect({"model": "test"}, status) == []
+    assert len(opened) == 1
+    assert status["error"] == "request failed"
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    async def slow():
+        await asyncio.sleep(0.2)
+        yield "[]"
+
+    opened = _use_streams(monkeypatch, slow)
+    status = {}
+    assert _collect({"model": "test"}, status) == ["[]"]
+    assert len(opened) == 2
+    assert "error" not in status
@@ -0,0 +1,56 @@
+# test_response_cache.py
+# A cached memory-dependent plan (spotify, browse, exit...) must survive the per-turn rewrite of memory.json by
+# memory.record_exchange, and only expire from the context when the memory summary itself changes.
+#   python -m pytest -q tests
+
+import os
+import sys
+import json
+import shutil
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import utils           # noqa: E402
+import memory          # noqa: E402
+import response_cache  # noqa: E402
+
+ASSETS = ("settings.json", "intents.json")
+REQUEST = "play my focus playlist on spotify"
+RESPONSE = json.dumps([{"module": "speak", "args": {"text": "Playing your focus playlist."}},
+                       {"module": "spotify", "args": {"action": "play", "search": "focus playlist"}}])
+
+
+def _use_assets_copy(monkeypatch, tmp_path):
+    for name in ASSETS:
+        shutil.copy(os.path.join(utils.ASSETS_DIR, name), tmp_path / name)
+    (tmp_path / "memory.json").write_text(json.dumps({"summary": "Tristan likes jazz.", "recent": [],
+                                                      "unsummarized": 0}), encoding='utf-8')
+    monkeypatch.setattr(utils, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(memory, "MEMORY_PATH", str(tmp_path / "memory.json"))
+    monkeypatch.setattr(memory, "_settings", lambda: (memory.DEFAULT_MEMORY_MODEL, 99))  # No summary in the test
+    response_cache.clear()
+
+
+def _record(user_text, content):
+    memory.record_exchange(user_text, content)
+    memory._cancel_timer()
+
+
+def test_repeated_request_hits_after_memory_rewrite(monkeypatch, tmp_path):
+    _use_assets_copy(monkeypatch, tmp_path)
+    assert response_cache.lookup(REQUEST) is None
+    response_cache.store(REQUEST, RESPONSE)
+    _record(REQUEST, RESPONSE)  # The turn that stored the entry
+    assert response_cache.lookup(REQUEST) == RESPONSE
+    _record(REQUEST, RESPONSE)  # The cached replay is remembered too
+    assert response_cache.lookup(REQUEST) == RESPONSE
+
+
+def test_summary_change_invalidates_memory_dependent_entries(monkeypatch, tmp_path):
+    _use_assets_copy(monkeypatch, tmp_path)
+    response_cache.store(REQUEST, RESPONSE)
+    with memory._file_lock:
+        stored = memory._read_locked()
+        stored["summary"] = "Tristan likes jazz and is working late tonight."
+        memory._write_locked(stored)
+    assert response_cache.lookup(REQUEST) is None
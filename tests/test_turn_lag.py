@@ -0,0 +1,76 @@
+# test_turn_lag.py
+# The event loop keeps reading audio while a turn runs: one LLM turn through triggers.prompt_manager, with a slow
+# streaming LLM and a slow (blocking) tokenizer, must never hold the loop longer than one audio frame.
+#   python -m pytest -q tests
+
+import os
+import sys
+import json
+import time
+import types
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Audio hardware (microphone, wake word engine, speakers) is not part of this test
+for name in ("pvporcupine", "pyaudio"):
+    sys.modules.setdefault(name, types.ModuleType(name))
+_sounds = types.ModuleType("sounds")
+_sounds.IS_ASSISTANT_SPEAKING = False
+_sounds.play_sound_effect = lambda path: None
+_sounds.interrupt_speech = lambda: None
+_sounds.mark_turn_start = lambda: None
+sys.modules.setdefault("sounds", _sounds)
+
+import tokens          # noqa: E402
+import prompt_builder  # noqa: E402
+import resilience      # noqa: E402
+import commands        # noqa: E402
+import session         # noqa: E402
+import triggers        # noqa: E402
+
+TOKENIZER_DELAY = 0.05  # Seconds per count_tokens call
+FIRST_TOKEN_DELAY = 0.3
+CHUNK_DELAY = 0.02
+RESPONSE = json.dumps([{"module": "speak", "args": {"text": "Here is a joke about latency."}}])
+
+
+def slow_count_tokens(text, *args, **kwargs):
+    time.sleep(TOKENIZER_DELAY)  # Blocks whichever thread calls it
+    return len(str(text)) // 4
+
+
+async def slow_chat_stream(payload, status=None):
+    await asyncio.sleep(FIRST_TOKEN_DELAY)
+    for i in range(0, len(RESPONSE), 8):
+        yield RESPONSE[i:i + 8]
+        await asyncio.sleep(CHUNK_DELAY)
+
+
+def test_turn_does_not_stall_event_loop(monkeypatch):
+    spoken = []
+    monkeypatch.setattr(tokens, "count_tokens", slow_count_tokens)
+    monkeypatch.setattr(prompt_builder, "count_tokens", slow_count_tokens)
+    monkeypatch.setattr(resilience, "resilient_chat_stream", slow_chat_stream)
+    monkeypatch.setitem(commands.MODULE_CACHE, "speak", types.SimpleNamespace(run=lambda text, **kwargs: spoken.append(text)))
+    monkeypatch.setattr(triggers, "log_finetune_example", lambda user_text, content: None)
+    monkeypatch.setattr(triggers, "_remember_exchange", lambda user_text, content: None)
+    monkeypatch.setattr(triggers, "should_exit", False)
+    session.reset("test")
+
+    async def turn():
+        monitor = asyncio.create_task(triggers._loop_lag_monitor())
+        await asyncio.sleep(0.05)
+        triggers._turn_started()
+        try:
+            await triggers.prompt_manager("tell me a joke about latency")
+            lag = triggers._turn_max_lag
+        finally:
+            triggers._turn_finished()
+            triggers.should_exit = True
+            await monitor
+        return lag
+
+    lag = asyncio.run(turn())
+    assert spoken == ["Here is a joke about latency."]
+    assert lag * 1000 < triggers.FRAME_DURATION_MS
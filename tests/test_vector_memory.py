@@ -0,0 +1,62 @@
+# test_vector_memory.py
+# An append interrupted between the vector and the text of a row must not shift the rows of later exchanges.
+#   python -m pytest -q tests
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import vector_memory  # noqa: E402
+
+EXCHANGES = [
+    ("what music did I listen to yesterday", "You listened to Miles Davis."),
+    ("remind me what my sister's name is", "Your sister is called Claire."),
+    ("how far is the moon", "About 384,000 kilometers."),
+]
+
+
+def _answer(text):
+    return json.dumps([{"module": "speak", "args": {"text": text}}])
+
+
+def _use_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector_memory, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_memory, "EXCHANGES_PATH", str(tmp_path / "exchanges.jsonl"))
+    monkeypatch.setattr(vector_memory, "VECTORS_PATH", str(tmp_path / "vectors.f32"))
+    monkeypatch.setattr(vector_memory, "META_PATH", str(tmp_path / "meta.json"))
+    monkeypatch.setattr(vector_memory, "get_embedder_name", lambda: "hashing")
+    monkeypatch.setattr(vector_memory, "_exchanges", None)
+    monkeypatch.setattr(vector_memory, "_matrix", None)
+    monkeypatch.setattr(vector_memory, "_meta", None)
+
+
+def _restart():
+    vector_memory._exchanges, vector_memory._matrix, vector_memory._meta = None, None, None
+
+
+def _top_reply(query):
+    results = vector_memory.search(query, top_k=1)
+    return results[0]["reply"] if results else None
+
+
+def test_interrupted_appends_do_not_shift_rows(monkeypatch, tmp_path):
+    _use_store(monkeypatch, tmp_path)
+    for user, reply in EXCHANGES[:2]:
+        vector_memory.add_exchange(user, _answer(reply))
+    # A crash left a text line without its vector, then half a vector row and half a text line
+    with open(vector_memory.EXCHANGES_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"user": "orphan", "reply": "orphan", "time": "2024-01-01T00:00"}) + '\n')
+    _restart()
+    vector_memory.add_exchange(EXCHANGES[2][0], _answer(EXCHANGES[2][1]))
+    with open(vector_memory.VECTORS_PATH, 'ab') as f:
+        f.write(b'\0' * 100)
+    with open(vector_memory.EXCHANGES_PATH, 'a', encoding='utf-8') as f:
+        f.write('{"user": "cut sh')
+    _restart()
+    assert _top_reply("how far away is the moon") == EXCHANGES[2][1]
+    assert _top_reply("what is my sister called") == EXCHANGES[1][1]
+    with open(vector_memory.EXCHANGES_PATH, 'r', encoding='utf-8') as f:
+        assert [json.loads(line)["user"] for line in f] == [user for user, _ in EXCHANGES]
+    assert os.path.getsize(vector_memory.VECTORS_PATH) == 3 * 4 * vector_memory.HASHING_DIMENSIONS
@@ -0,0 +1,38 @@
+# transcribe_worker_stub.py
+# A transcribe_server.py worker process whose Whisper decode is replaced, for test_remote_transcribe.py
+#   python tests/transcribe_worker_stub.py --port 5056 --name a [--fail] [--in-flight 2]
+
+import os
+import sys
+import types
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.modules.setdefault("whisper", types.ModuleType("whisper"))  # Only the decode below runs
+
+import transcribe        # noqa: E402
+import transcribe_server  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--name', required=True)
+    parser.add_argument('--fail', action='store_true', help="Every decode raises, as a broken model would")
+    parser.add_argument('--in-flight', type=int, default=0, help="Load reported by /health besides real requests")
+    args = parser.parse_args(argv)
+
+    def decode_local(audio_path, model_name=None):
+        if args.fail:
+            raise RuntimeError("decode failed")
+        return f"decoded by {args.name}"
+
+    transcribe.load_whisper_model = lambda model_name=None: object()
+    transcribe.decode_local = decode_local
+    transcribe_server._in_flight = args.in_flight
+    transcribe_server.serve('127.0.0.1', args.port, 'tiny.en')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())